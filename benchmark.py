@@ -0,0 +1,829 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Python to JavaScript converter.
+
+Times each RepositoryFetcher fetch mode against the same repository folder
+so the listing strategies can be compared on wall-clock time and request count,
+and measures per-sample conversion latency for each agent run completion mode.
+
+The e2e benchmark generates a synthetic sample repository and runs the fetch,
+convert and save stages against the in-process fake GitHub and agents services,
+writing throughput, per-sample latency percentiles and peak RSS to a JSON
+report; compare diffs two such reports, e.g. from two commits.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+import converter
+from converter import (CONVERSION_ENGINES, DEFAULT_FETCH_CONCURRENCY, FETCH_MODES, RUN_COMPLETION_MODES,
+                       AgentManager, ProjectClientHolder, PythonToJsConverter, RepositoryFetcher,
+                       convert_text_async)
+from fake_agents_service import FakeAgentsService
+from fake_github_service import FakeGitHubService
+
+# Polling once per second, as every conversion did before backoff polling and streaming
+BASELINE_COMPLETION_MODE = 'poll-fixed'
+
+SIZE_DISTRIBUTIONS = ('fixed', 'uniform', 'lognormal')
+REPORT_VERSION = 1
+# Any owner and repository resolve to the fake GitHub service's snapshot
+SYNTHETIC_REPO_URL = 'https://github.com/benchmark/samples/tree/main'
+DEFAULT_REGRESSION_THRESHOLD = 10.0
+# Report metrics compared by compare, and whether a higher value is better
+COMPARED_METRICS = {
+    'seconds': False,
+    'files_per_second': True,
+    'samples_per_second': True,
+    'p50': False,
+    'p95': False,
+    'p99': False,
+    'peak_rss_mb': False,
+}
+
+_SAMPLE_HEADER = '''"""
+Synthetic sample {number} generated by benchmark.py.
+"""
+
+import os
+
+from azure.ai.agents.models import ListSortOrder
+from azure.ai.projects import AIProjectClient
+from azure.identity import DefaultAzureCredential
+'''
+
+_SAMPLE_STEP = '''
+
+def step_{step}(project_client):
+    agent = project_client.agents.create_agent(
+        model=os.environ["MODEL_DEPLOYMENT_NAME"],
+        name="sample-agent-{step}",
+        instructions="You are a helpful agent",
+    )
+    thread = project_client.agents.threads.create()
+    project_client.agents.messages.create(thread_id=thread.id, role="user", content="Hello {step}")
+    run = project_client.agents.runs.create_and_process(thread_id=thread.id, agent_id=agent.id)
+    if run.status == "failed":
+        print(f"Run failed: {{run.last_error}}")
+    for message in project_client.agents.messages.list(thread_id=thread.id, order=ListSortOrder.ASCENDING):
+        print(f"{{message.role}}: {{message.content}}")
+    project_client.agents.delete_agent(agent.id)
+'''
+
+_SAMPLE_MAIN = '''
+
+if __name__ == "__main__":
+    with AIProjectClient(
+        endpoint=os.environ["PROJECT_ENDPOINT"],
+        credential=DefaultAzureCredential(),
+    ) as project_client:
+{calls}
+'''
+
+
+async def benchmark_fetch(repo_url: str, modes: List[str], repeat: int = 3,
+                          concurrency: int = DEFAULT_FETCH_CONCURRENCY, api_url: Optional[str] = None,
+                          raw_url: Optional[str] = None) -> List[Dict]:
+    """
+    Fetch the same folder with each mode and record timings.
+    
+    Args:
+        repo_url: GitHub repository URL to fetch
+        modes: Fetch modes to compare
+        repeat: Number of runs per mode
+        concurrency: Fetch concurrency passed to RepositoryFetcher
+        api_url: Optional GitHub API base URL, e.g. of fake_github_service.py
+        raw_url: Optional raw file download base URL
+    
+    Returns:
+        One result dictionary per mode
+    """
+    results = []
+    
+    for mode in modes:
+        timings = []
+        request_count = 0
+        rate_limited_count = 0
+        file_count = 0
+        
+        for _ in range(repeat):
+            async with RepositoryFetcher(mode, concurrency, api_url=api_url, raw_url=raw_url) as fetcher:
+                start = time.perf_counter()
+                samples = await fetcher.fetch_python_samples(repo_url)
+                timings.append(time.perf_counter() - start)
+                request_count = fetcher.request_count
+                rate_limited_count = fetcher.rate_limited_count
+                file_count = len(samples)
+        
+        results.append({
+            'mode': mode,
+            'files': file_count,
+            'requests': request_count,
+            'rate_limited': rate_limited_count,
+            'runs': repeat,
+            'mean_seconds': statistics.mean(timings),
+            'min_seconds': min(timings),
+            'max_seconds': max(timings),
+        })
+    
+    return results
+
+
+@contextlib.contextmanager
+def _fixed_poll_interval(seconds: float):
+    """Temporarily make converter poll runs at a fixed interval."""
+    saved = converter.POLL_INITIAL_DELAY, converter.POLL_MAX_DELAY
+    converter.POLL_INITIAL_DELAY = converter.POLL_MAX_DELAY = seconds
+    try:
+        yield
+    finally:
+        converter.POLL_INITIAL_DELAY, converter.POLL_MAX_DELAY = saved
+
+
+async def benchmark_run_completion(sample_path: str, js_library: str, api_docs_url: str,
+                                   modes: List[str], repeat: int = 3) -> List[Dict]:
+    """
+    Convert the same sample with each run completion mode and record per-sample latency.
+    
+    All modes share one project client and agent, so the timings only differ in
+    how the end of the run is detected. Results include the mean latency saved
+    compared to the fixed one-second polling baseline when it is measured.
+    
+    Args:
+        sample_path: Python file to convert
+        js_library: JavaScript library name to use
+        api_docs_url: API documentation URL passed to the agent
+        modes: Run completion modes to compare, optionally including the baseline
+        repeat: Number of conversions per mode
+    
+    Returns:
+        One result dictionary per mode
+    """
+    with open(sample_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    
+    results = []
+    async with ProjectClientHolder() as holder, AgentManager(holder) as agent_manager:
+        agents_client, agent_id = await agent_manager.get_agent()
+        
+        for mode in modes:
+            timings = []
+            for _ in range(repeat):
+                with _fixed_poll_interval(1.0) if mode == BASELINE_COMPLETION_MODE else contextlib.nullcontext():
+                    start = time.perf_counter()
+                    await convert_text_async(
+                        text, js_library, api_docs_url, agents_client=agents_client, agent_id=agent_id,
+                        run_completion='poll' if mode == BASELINE_COMPLETION_MODE else mode
+                    )
+                    timings.append(time.perf_counter() - start)
+            
+            results.append({
+                'mode': mode,
+                'runs': repeat,
+                'mean_seconds': statistics.mean(timings),
+                'min_seconds': min(timings),
+                'max_seconds': max(timings),
+            })
+    
+    baseline = next((r for r in results if r['mode'] == BASELINE_COMPLETION_MODE), None)
+    for result in results:
+        result['saved_seconds'] = baseline['mean_seconds'] - result['mean_seconds'] if baseline else None
+    
+    return results
+
+
+def _sample_line_count(rng: random.Random, distribution: str, mean_lines: int) -> int:
+    """Draw a sample length in lines from the size distribution."""
+    if distribution == 'fixed':
+        return mean_lines
+    if distribution == 'uniform':
+        return rng.randint(1, 2 * mean_lines - 1)
+    # Long-tailed like real sample folders; mu is chosen so the mean is mean_lines
+    sigma = 1.0
+    return max(1, round(rng.lognormvariate(math.log(mean_lines) - sigma ** 2 / 2, sigma)))
+
+
+def generate_sample(number: int, lines: int) -> str:
+    """Build a synthetic agents sample of roughly the given number of lines."""
+    header = _SAMPLE_HEADER.format(number=number)
+    step_lines = _SAMPLE_STEP.count('\n')
+    steps = max(1, round((lines - header.count('\n')) / (step_lines + 1)))
+    calls = '\n'.join(f"        step_{step}(project_client)" for step in range(steps))
+    return header + ''.join(_SAMPLE_STEP.format(step=step) for step in range(steps)) + _SAMPLE_MAIN.format(calls=calls)
+
+
+def generate_sample_tree(root: str, files: int, mean_lines: int = 80, distribution: str = 'lognormal',
+                         depth: int = 2, fanout: int = 3, seed: int = 0) -> Dict:
+    """
+    Write a synthetic repository of Python samples.
+    
+    Each sample is placed at a random depth from 0 to depth, in one of fanout
+    directories per level, and its length is drawn from the size distribution.
+    The same arguments always generate the same tree.
+    
+    Args:
+        root: Directory to create the samples in
+        files: Number of samples
+        mean_lines: Mean sample length in lines
+        distribution: Sample size distribution, one of SIZE_DISTRIBUTIONS
+        depth: Maximum directory nesting depth
+        fanout: Directories per nesting level
+        seed: Random seed
+    
+    Returns:
+        Dictionary describing the generated tree
+    """
+    if distribution not in SIZE_DISTRIBUTIONS:
+        raise ValueError(f"Unknown size distribution: {distribution}")
+    rng = random.Random(seed)
+    total_bytes = 0
+    sizes = []
+    
+    for number in range(files):
+        parts = [f"group_{level}_{rng.randrange(fanout)}" for level in range(rng.randint(0, depth))]
+        directory = Path(root, *parts)
+        directory.mkdir(parents=True, exist_ok=True)
+        data = generate_sample(number, _sample_line_count(rng, distribution, mean_lines)).encode('utf-8')
+        (directory / f"sample_{number:05d}.py").write_bytes(data)
+        total_bytes += len(data)
+        sizes.append(len(data))
+    
+    return {
+        'files': files,
+        'bytes': total_bytes,
+        'min_bytes': min(sizes, default=0),
+        'max_bytes': max(sizes, default=0),
+        'mean_lines': mean_lines,
+        'distribution': distribution,
+        'depth': depth,
+        'fanout': fanout,
+        'seed': seed,
+    }
+
+
+def _percentiles(values: List[float]) -> Dict:
+    """Return the p50, p95 and p99 of values, or None for each when there are none."""
+    if len(values) < 2:
+        value = values[0] if values else None
+        return {'p50': value, 'p95': value, 'p99': value}
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return {'p50': cuts[49], 'p95': cuts[94], 'p99': cuts[98]}
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far, or None where it cannot be read."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _git_commit() -> Optional[str]:
+    """Return the checked out commit of this tree, marked dirty when it has local changes."""
+    try:
+        cwd = os.path.dirname(os.path.abspath(__file__))
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=cwd, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=cwd,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+
+@contextlib.contextmanager
+def _converter_output(verbose: bool):
+    """Hide the converter's progress output unless verbose."""
+    if verbose:
+        yield
+        return
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+async def benchmark_end_to_end(tree_options: Dict, tree_dir: Optional[str] = None, repeat: int = 1,
+                               fetch_mode: str = 'tree', fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+                               convert_workers: int = 4, engine: str = 'agent', github_latency: float = 0.0,
+                               page_size: int = 0, agent_latency: float = 0.1, tokens_per_second: float = 2000.0,
+                               verbose: bool = False) -> Dict:
+    """
+    Generate a synthetic sample repository and benchmark the fetch, convert and save stages.
+    
+    The fake GitHub and agents services run in this process, so the peak RSS
+    includes them as well as the converter. The fetch stage lists and downloads
+    every sample with RepositoryFetcher; the convert and save stages run the full
+    pipeline into a fresh output directory, timing each sample from being fetched
+    to being written.
+    
+    A run in which any sample fails to convert is reported with valid set to
+    False and no end-to-end throughput, since failures return without doing the
+    work being measured.
+    
+    Args:
+        tree_options: Keyword arguments for generate_sample_tree
+        tree_dir: Directory to generate the samples in (default: a temporary directory)
+        repeat: Number of runs of each stage
+        fetch_mode: RepositoryFetcher fetch mode
+        fetch_concurrency: Maximum concurrent GitHub requests
+        convert_workers: Samples converted concurrently
+        engine: Conversion engine
+        github_latency: Seconds the fake GitHub service waits per request
+        page_size: Contents listing page size of the fake GitHub service
+        agent_latency: Seconds before the fake agents service starts each reply
+        tokens_per_second: Reply rate of the fake agents service
+        verbose: Show the converter's progress output
+    
+    Returns:
+        Benchmark report dictionary
+    """
+    work_dir = tempfile.mkdtemp(prefix='converter-benchmark-')
+    try:
+        root = tree_dir or os.path.join(work_dir, 'samples')
+        if tree_dir and os.path.isdir(tree_dir) and os.listdir(tree_dir):
+            raise ValueError(f"Sample tree directory is not empty: {tree_dir}")
+        print(f"Generating {tree_options['files']} synthetic samples in {root}")
+        tree = generate_sample_tree(root, **tree_options)
+        
+        async with FakeGitHubService(root, latency=github_latency, page_size=page_size) as github, \
+                FakeAgentsService(latency=agent_latency, tokens_per_second=tokens_per_second,
+                                  seed=tree_options.get('seed')) as agents:
+            api_url = await github.start()
+            endpoint = await agents.start()
+            os.environ.setdefault('MODEL_DEPLOYMENT_NAME', 'fake')
+            
+            fetch_timings = []
+            for _ in range(repeat):
+                async with RepositoryFetcher(fetch_mode, fetch_concurrency, api_url=api_url,
+                                             raw_url=f"{api_url}/raw") as fetcher:
+                    start = time.perf_counter()
+                    with _converter_output(verbose):
+                        samples = await fetcher.fetch_python_samples(SYNTHETIC_REPO_URL)
+                    fetch_timings.append(time.perf_counter() - start)
+                    fetch_requests = fetcher.request_count
+            fetch_seconds = statistics.mean(fetch_timings)
+            fetch_stage = {
+                'seconds': fetch_seconds,
+                'files': len(samples),
+                'files_per_second': len(samples) / fetch_seconds if fetch_seconds else None,
+                'requests': fetch_requests,
+                'peak_rss_mb': _peak_rss_mb(),
+            }
+            print(f"Fetched {len(samples)} samples in {fetch_seconds:.2f}s")
+            del samples
+            
+            pipeline_timings = []
+            sample_timings = []
+            failed = 0
+            async with ProjectClientHolder(endpoint) as holder:
+                for run in range(repeat):
+                    sample_converter = PythonToJsConverter(
+                        fetch_mode=fetch_mode,
+                        fetch_concurrency=fetch_concurrency,
+                        convert_workers=convert_workers,
+                        client_holder=holder,
+                        engine=engine,
+                        github_api_url=api_url,
+                        github_raw_url=f"{api_url}/raw"
+                    )
+                    output_dir = os.path.join(work_dir, f"output-{run}")
+                    with _converter_output(verbose):
+                        start = time.perf_counter()
+                        written = await sample_converter.convert_samples_to_path(
+                            SYNTHETIC_REPO_URL, '@azure/ai-agents', None, output_dir
+                        )
+                        pipeline_timings.append(time.perf_counter() - start)
+                    sample_timings.extend(sample_converter.sample_timings)
+                    failed = max(failed, sample_converter.failed_count)
+                    shutil.rmtree(output_dir, ignore_errors=True)
+        
+        pipeline_seconds = statistics.mean(pipeline_timings)
+        peak_rss = _peak_rss_mb()
+        print(f"Converted and saved {written} samples in {pipeline_seconds:.2f}s")
+        if failed:
+            print(f"Error: {failed} of {written} samples failed to convert; the run is not a valid measurement")
+        stages = {
+            'fetch': fetch_stage,
+            'convert': {
+                'samples': written,
+                'failed': failed,
+                **_percentiles([timing['convert_seconds'] for timing in sample_timings]),
+            },
+            'save': {
+                'samples': written,
+                **_percentiles([timing['save_seconds'] for timing in sample_timings]),
+            },
+            'end_to_end': {
+                'seconds': pipeline_seconds,
+                'samples': written,
+                'failed': failed,
+                'samples_per_second': written / pipeline_seconds if pipeline_seconds and not failed else None,
+                **_percentiles([timing['latency_seconds'] for timing in sample_timings]),
+                'peak_rss_mb': peak_rss,
+            },
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    return {
+        'version': REPORT_VERSION,
+        'commit': _git_commit(),
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {
+            'runs': repeat,
+            'fetch_mode': fetch_mode,
+            'fetch_concurrency': fetch_concurrency,
+            'convert_workers': convert_workers,
+            'engine': engine,
+            'github_latency': github_latency,
+            'page_size': page_size,
+            'agent_latency': agent_latency,
+            'tokens_per_second': tokens_per_second,
+        },
+        'tree': tree,
+        'valid': not failed,
+        'stages': stages,
+    }
+
+
+def compare_reports(base: Dict, new: Dict, threshold: float = DEFAULT_REGRESSION_THRESHOLD) -> List[Dict]:
+    """
+    Compare the stage metrics of two e2e benchmark reports.
+    
+    Args:
+        base: Baseline report
+        new: Report to compare with the baseline
+        threshold: Percentage by which a metric must get worse to count as a regression
+    
+    Returns:
+        One dictionary per metric present in both reports
+        
+    Raises:
+        ValueError: When either report is marked as not valid
+    """
+    for name, report in (('base', base), ('new', new)):
+        if not report.get('valid', True):
+            raise ValueError(f"The {name} report is not a valid measurement: samples failed to convert")
+    if base.get('settings') != new.get('settings') or base.get('tree') != new.get('tree'):
+        print("Warning: the reports were made with different settings or sample trees")
+    
+    rows = []
+    for stage, base_metrics in base['stages'].items():
+        new_metrics = new['stages'].get(stage, {})
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old_value, new_value = base_metrics.get(metric), new_metrics.get(metric)
+            if old_value is None or new_value is None:
+                continue
+            change = (new_value - old_value) * 100 / old_value if old_value else 0.0
+            rows.append({
+                'stage': stage,
+                'metric': metric,
+                'base': old_value,
+                'new': new_value,
+                'change_percent': change,
+                'regressed': (-change if higher_is_better else change) > threshold,
+            })
+    return rows
+
+
+def print_end_to_end_report(report: Dict):
+    """Print an e2e benchmark report as a table."""
+    tree = report['tree']
+    print(f"\nCommit: {report['commit'] or 'unknown'}")
+    print(f"Tree: {tree['files']} samples, {tree['bytes']} bytes, {tree['distribution']} sizes, depth {tree['depth']}")
+    if not report.get('valid', True):
+        print(f"INVALID: {report['stages']['end_to_end']['failed']} samples failed to convert")
+    print(f"\n{'stage':<11} {'seconds':>8} {'per s':>8} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'rss MB':>8}")
+    for stage, metrics in report['stages'].items():
+        values = [metrics.get('seconds'), metrics.get('files_per_second', metrics.get('samples_per_second')),
+                  metrics.get('p50'), metrics.get('p95'), metrics.get('p99'), metrics.get('peak_rss_mb')]
+        print(f"{stage:<11} " + ' '.join(f"{value:>8.3f}" if value is not None else f"{'-':>8}" for value in values))
+
+
+def print_comparison(rows: List[Dict], base: Dict, new: Dict):
+    """Print the rows of compare_reports as a table."""
+    print(f"\nBase: {base['commit'] or 'unknown'}")
+    print(f"New:  {new['commit'] or 'unknown'}")
+    print(f"\n{'stage':<11} {'metric':<18} {'base':>10} {'new':>10} {'change':>8}")
+    for row in rows:
+        flag = '  REGRESSED' if row['regressed'] else ''
+        print(f"{row['stage']:<11} {row['metric']:<18} {row['base']:>10.3f} {row['new']:>10.3f} "
+              f"{row['change_percent']:>+7.1f}%{flag}")
+
+
+def print_completion_results(results: List[Dict]):
+    """Print run completion benchmark results as a table."""
+    print(f"\n{'mode':<12} {'mean s':>8} {'min s':>8} {'max s':>8} {'saved s':>8}")
+    for result in results:
+        saved = f"{result['saved_seconds']:>8.2f}" if result['saved_seconds'] is not None else f"{'-':>8}"
+        print(
+            f"{result['mode']:<12} {result['mean_seconds']:>8.2f} {result['min_seconds']:>8.2f} "
+            f"{result['max_seconds']:>8.2f} {saved}"
+        )
+
+
+def print_results(results: List[Dict]):
+    """Print benchmark results as a table."""
+    print(f"\n{'mode':<10} {'files':>6} {'requests':>9} {'limited':>8} {'mean s':>8} {'min s':>8} {'max s':>8}")
+    for result in results:
+        print(
+            f"{result['mode']:<10} {result['files']:>6} {result['requests']:>9} {result['rate_limited']:>8} "
+            f"{result['mean_seconds']:>8.2f} {result['min_seconds']:>8.2f} {result['max_seconds']:>8.2f}"
+        )
+
+
+async def main():
+    """Main benchmark CLI function."""
+    parser = argparse.ArgumentParser(description='Benchmark the converter')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    
+    fetch_parser = subparsers.add_parser('fetch', help='Compare the repository fetch modes')
+    
+    fetch_parser.add_argument(
+        'repo_url',
+        help='URL to GitHub repository subfolder containing Python samples'
+    )
+    
+    fetch_parser.add_argument(
+        '--modes',
+        nargs='+',
+        choices=FETCH_MODES,
+        default=list(FETCH_MODES),
+        help='Fetch modes to compare (default: all)'
+    )
+    
+    fetch_parser.add_argument(
+        '--fetch-concurrency',
+        type=int,
+        default=DEFAULT_FETCH_CONCURRENCY,
+        help=f'Maximum concurrent GitHub requests (default: {DEFAULT_FETCH_CONCURRENCY})'
+    )
+    
+    fetch_parser.add_argument(
+        '--github-api-url',
+        help='GitHub API base URL, e.g. of fake_github_service.py'
+    )
+    
+    fetch_parser.add_argument(
+        '--github-raw-url',
+        help='Raw file download base URL'
+    )
+    
+    completion_parser = subparsers.add_parser(
+        'completion',
+        help='Compare per-sample latency of the agent run completion modes'
+    )
+    
+    completion_parser.add_argument(
+        'sample',
+        help='Python file to convert'
+    )
+    
+    completion_parser.add_argument(
+        '--library', '-l',
+        default='@azure/ai-agents',
+        help='JavaScript library to use (default: @azure/ai-agents)'
+    )
+    
+    completion_parser.add_argument(
+        '--docs', '-d',
+        default='',
+        help='URL to JavaScript library API documentation'
+    )
+    
+    completion_parser.add_argument(
+        '--modes',
+        nargs='+',
+        choices=(BASELINE_COMPLETION_MODE,) + RUN_COMPLETION_MODES,
+        default=[BASELINE_COMPLETION_MODE, *RUN_COMPLETION_MODES],
+        help='Run completion modes to compare (default: all, including the fixed polling baseline)'
+    )
+    
+    e2e_parser = subparsers.add_parser(
+        'e2e',
+        help='Run fetch, convert and save on a synthetic repository against local stand-ins'
+    )
+    
+    e2e_parser.add_argument(
+        '--files',
+        type=int,
+        default=200,
+        help='Number of synthetic samples (default: 200)'
+    )
+    
+    e2e_parser.add_argument(
+        '--mean-lines',
+        type=int,
+        default=80,
+        help='Mean sample length in lines (default: 80)'
+    )
+    
+    e2e_parser.add_argument(
+        '--size-distribution',
+        choices=SIZE_DISTRIBUTIONS,
+        default='lognormal',
+        help='Sample size distribution (default: lognormal)'
+    )
+    
+    e2e_parser.add_argument(
+        '--depth',
+        type=int,
+        default=2,
+        help='Maximum directory nesting depth (default: 2)'
+    )
+    
+    e2e_parser.add_argument(
+        '--fanout',
+        type=int,
+        default=3,
+        help='Directories per nesting level (default: 3)'
+    )
+    
+    e2e_parser.add_argument(
+        '--seed',
+        type=int,
+        default=0,
+        help='Random seed of the sample tree (default: 0)'
+    )
+    
+    e2e_parser.add_argument(
+        '--tree-dir',
+        help='Generate the samples in this empty directory and keep them (default: a temporary directory)'
+    )
+    
+    e2e_parser.add_argument(
+        '--fetch-mode',
+        choices=FETCH_MODES,
+        default='tree',
+        help='Fetch mode (default: tree)'
+    )
+    
+    e2e_parser.add_argument(
+        '--fetch-concurrency',
+        type=int,
+        default=DEFAULT_FETCH_CONCURRENCY,
+        help=f'Maximum concurrent GitHub requests (default: {DEFAULT_FETCH_CONCURRENCY})'
+    )
+    
+    e2e_parser.add_argument(
+        '--convert-workers',
+        type=int,
+        default=4,
+        help='Samples converted concurrently (default: 4)'
+    )
+    
+    e2e_parser.add_argument(
+        '--engine',
+        choices=CONVERSION_ENGINES,
+        default='agent',
+        help='Conversion engine (default: agent)'
+    )
+    
+    e2e_parser.add_argument(
+        '--github-latency',
+        type=float,
+        default=0.0,
+        help='Seconds the fake GitHub service waits per request (default: 0)'
+    )
+    
+    e2e_parser.add_argument(
+        '--page-size',
+        type=int,
+        default=0,
+        help='Contents listing page size of the fake GitHub service (default: unpaginated)'
+    )
+    
+    e2e_parser.add_argument(
+        '--agent-latency',
+        type=float,
+        default=0.1,
+        help='Seconds before the fake agents service starts each reply (default: 0.1)'
+    )
+    
+    e2e_parser.add_argument(
+        '--tokens-per-second',
+        type=float,
+        default=2000.0,
+        help='Reply rate of the fake agents service (default: 2000)'
+    )
+    
+    e2e_parser.add_argument(
+        '--verbose', '-v',
+        action='store_true',
+        help="Show the converter's progress output"
+    )
+    
+    compare_parser = subparsers.add_parser('compare', help='Compare two e2e benchmark reports')
+    
+    compare_parser.add_argument(
+        'base',
+        help='Baseline JSON report'
+    )
+    
+    compare_parser.add_argument(
+        'new',
+        help='JSON report to compare with the baseline'
+    )
+    
+    compare_parser.add_argument(
+        '--threshold',
+        type=float,
+        default=DEFAULT_REGRESSION_THRESHOLD,
+        help=f'Percentage a metric may get worse before it counts as a regression '
+             f'(default: {DEFAULT_REGRESSION_THRESHOLD:g})'
+    )
+    
+    for subparser, default_repeat in ((fetch_parser, 3), (completion_parser, 3), (e2e_parser, 1)):
+        subparser.add_argument(
+            '--repeat',
+            type=int,
+            default=default_repeat,
+            help=f'Runs per mode (default: {default_repeat})'
+        )
+        
+        subparser.add_argument(
+            '--json',
+            help='Also write the results to this JSON file'
+        )
+    
+    args = parser.parse_args()
+    
+    if args.benchmark == 'compare':
+        with open(args.base, 'r', encoding='utf-8') as f:
+            base = json.load(f)
+        with open(args.new, 'r', encoding='utf-8') as f:
+            new = json.load(f)
+        try:
+            rows = compare_reports(base, new, args.threshold)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 1
+        print_comparison(rows, base, new)
+        return 1 if any(row['regressed'] for row in rows) else 0
+    
+    if args.benchmark == 'fetch':
+        results = await benchmark_fetch(args.repo_url, args.modes, args.repeat, args.fetch_concurrency,
+                                        args.github_api_url, args.github_raw_url)
+        print_results(results)
+    elif args.benchmark == 'completion':
+        results = await benchmark_run_completion(args.sample, args.library, args.docs, args.modes, args.repeat)
+        print_completion_results(results)
+    else:
+        tree_options = {
+            'files': args.files,
+            'mean_lines': args.mean_lines,
+            'distribution': args.size_distribution,
+            'depth': args.depth,
+            'fanout': args.fanout,
+            'seed': args.seed,
+        }
+        results = await benchmark_end_to_end(
+            tree_options,
+            tree_dir=args.tree_dir,
+            repeat=args.repeat,
+            fetch_mode=args.fetch_mode,
+            fetch_concurrency=args.fetch_concurrency,
+            convert_workers=args.convert_workers,
+            engine=args.engine,
+            github_latency=args.github_latency,
+            page_size=args.page_size,
+            agent_latency=args.agent_latency,
+            tokens_per_second=args.tokens_per_second,
+            verbose=args.verbose
+        )
+        print_end_to_end_report(results)
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    
+    if args.benchmark == 'e2e' and not results['valid']:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -6,132 +6,1068 @@ A command-line tool that converts Python code samples to JavaScript,
 designed for porting repository samples to use JavaScript libraries.
 """
 
+import abc
 import argparse
+import ast
+import builtins
+import contextlib
 import asyncio
 import aiohttp
+import functools
+import hashlib
+import io
+import ipaddress
 import json
+import keyword
+import math
 import os
+import re
 import sys
+import tarfile
+import threading
+import tokenize
 import zipfile
+from collections import deque
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
-from urllib.parse import urlparse
+from typing import AsyncIterator, List, Dict, Optional, TextIO, Tuple
+from urllib.parse import quote, urlparse
 import tempfile
 import shutil
+import sqlite3
 import os, time
-from azure.ai.projects import AIProjectClient
-from azure.identity import DefaultAzureCredential
-from azure.ai.agents.models import ListSortOrder
+import random
+from azure.core.exceptions import HttpResponseError
+from azure.core.pipeline.policies import HeadersPolicy
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.ai.projects.aio import AIProjectClient as AsyncAIProjectClient
+from azure.identity.aio import DefaultAzureCredential as AsyncDefaultAzureCredential
+from azure.ai.agents.models import (AgentStreamEvent, ListSortOrder, MessageDeltaChunk, MessageRole, ThreadMessage,
+                                    ThreadRun)
+from example_converter import AdvancedPythonToJsConverter
 
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
-class RepositoryFetcher:
-    """Fetches Python samples from GitHub repositories."""
+
+GITHUB_API_URL = 'https://api.github.com'
+GITHUB_RAW_URL = 'https://raw.githubusercontent.com'
+FETCH_MODES = ('tree', 'contents', 'archive')
+DEFAULT_FETCH_CONCURRENCY = 8
+MAX_RATE_LIMIT_RETRIES = 5
+MAX_RATE_LIMIT_WAIT = 300
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'python-to-js-converter')
+DEFAULT_HTTP_CACHE_MB = 64
+DEFAULT_BLOB_CACHE_MB = 256
+DEFAULT_RESULT_CACHE_MB = 64
+DEFAULT_QUEUE_SIZE = 8
+DEFAULT_BATCH_TOKENS = 0
+BATCH_SAMPLE_MAX_TOKENS = 600
+DEFAULT_MAX_SAMPLE_TOKENS = 6000
+TOKEN_ENCODING = 'o200k_base'
+DEFAULT_API_METHODS_TOP_K = 8
+MAX_THROTTLE_RETRIES = 5
+DEFAULT_CLIENT_POOL_SIZE = 16
+TOKEN_REFRESH_MARGIN = 300
+RUN_COMPLETION_MODES = ('stream', 'poll')
+POLL_INITIAL_DELAY = 0.1
+POLL_MAX_DELAY = 1.0
+CONVERSION_ENGINES = ('agent', 'rules', 'hybrid')
+DEFAULT_MIN_RULES_CONFIDENCE = 1.0
+AGENT_NAME = "python-to-js-converter"
+AGENT_INSTRUCTIONS = "You are an expert Python to JavaScript code converter that can use reference API documentation for JS libraries to find appropriate methods corresponding to Python methods for the given code."
+
+
+def git_blob_sha(data: bytes) -> str:
+    """Compute the git blob SHA-1 of file contents, as reported by the GitHub APIs."""
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+class HttpCache:
+    """
+    On-disk cache of GitHub responses keyed by URL.
     
-    def __init__(self):
+    Each entry keeps the response body next to its ETag/Last-Modified
+    validators so later fetches can be sent as conditional requests; a 304
+    is answered from disk and does not count against GitHub's rate limit.
+    As in BlobCache, file modification times track last use, and the least
+    recently used entries are evicted once the cache grows past ``max_bytes``;
+    listings pinned to old commits are never requested again and age out.
+    """
+    
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_HTTP_CACHE_MB * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.total_bytes = sum(path.stat().st_size for path in self._iter_entry_files())
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+    
+    def _iter_entry_files(self):
+        # In-progress writes end in .tmp and are skipped
+        return (path for path in self.cache_dir.iterdir() if path.suffix in ('.body', '.json'))
+    
+    def _entry_path(self, url: str, headers: Optional[Dict[str, str]]) -> Path:
+        # The Accept header changes the representation, so it is part of the key
+        accept = (headers or {}).get('Accept', '')
+        key = hashlib.sha256(f"{accept} {url}".encode('utf-8')).hexdigest()
+        return self.cache_dir / key
+    
+    def load(self, url: str, headers: Optional[Dict[str, str]] = None) -> Optional[Tuple[Dict[str, str], bytes, str]]:
+        """Return (conditional request headers, cached body, cached Link header) for url, or None."""
+        entry_path = self._entry_path(url, headers)
+        try:
+            meta = json.loads(entry_path.with_suffix('.json').read_text(encoding='utf-8'))
+            body = entry_path.with_suffix('.body').read_bytes()
+            os.utime(entry_path.with_suffix('.json'))
+        except (OSError, ValueError):
+            return None
+        
+        validators = {}
+        if meta.get('etag'):
+            validators['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            validators['If-Modified-Since'] = meta['last_modified']
+        if not validators:
+            return None
+        return validators, body, meta.get('link') or ''
+    
+    def store(self, url: str, headers: Optional[Dict[str, str]], response_headers, body: bytes):
+        """Cache a 200 response if it carries validators."""
+        etag = response_headers.get('ETag')
+        last_modified = response_headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        
+        entry_path = self._entry_path(url, headers)
+        meta = {'url': url, 'etag': etag, 'last_modified': last_modified, 'link': response_headers.get('Link')}
+        # Write the body first so a readable .json always has a matching .body
+        for suffix, data in (('.body', body), ('.json', json.dumps(meta).encode('utf-8'))):
+            target_path = entry_path.with_suffix(suffix)
+            try:
+                self.total_bytes -= target_path.stat().st_size
+            except OSError:
+                pass
+            temp_path = entry_path.with_suffix(suffix + '.tmp')
+            temp_path.write_bytes(data)
+            os.replace(temp_path, target_path)
+            self.total_bytes += len(data)
+        
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+    
+    def _evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = {}
+        for path in self._iter_entry_files():
+            stat = path.stat()
+            last_used, size, paths = entries.get(path.stem, (0.0, 0, []))
+            entries[path.stem] = (max(last_used, stat.st_mtime), size + stat.st_size, paths + [path])
+        
+        for _, size, paths in sorted(entries.values(), key=lambda entry: entry[0]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            for path in paths:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            self.total_bytes -= size
+
+
+class BlobCache:
+    """
+    Content-addressed store of file bodies keyed by git blob SHA.
+    
+    Blobs live in a sharded directory (``ab/cdef...``), so identical files at
+    different paths or in different repositories are stored and downloaded once.
+    File modification times track last use, and the least recently used blobs
+    are evicted once the store grows past ``max_bytes``.
+    """
+    
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_BLOB_CACHE_MB * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.total_bytes = sum(blob.stat().st_size for blob in self._iter_blobs())
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+    
+    def _iter_blobs(self):
+        for shard in self.cache_dir.iterdir():
+            if shard.is_dir():
+                yield from (blob for blob in shard.iterdir() if not blob.name.endswith('.tmp'))
+    
+    def _blob_path(self, sha: str) -> Path:
+        return self.cache_dir / sha[:2] / sha[2:]
+    
+    def get(self, sha: str) -> Optional[bytes]:
+        """Return the cached blob for sha, marking it as recently used."""
+        blob_path = self._blob_path(sha)
+        try:
+            data = blob_path.read_bytes()
+            os.utime(blob_path)
+        except OSError:
+            return None
+        return data
+    
+    def put(self, data: bytes, sha: Optional[str] = None) -> str:
+        """Store a blob, returning its SHA; data that does not match an expected sha is not stored."""
+        actual_sha = git_blob_sha(data)
+        if sha and sha != actual_sha:
+            return actual_sha
+        
+        blob_path = self._blob_path(actual_sha)
+        if blob_path.exists():
+            os.utime(blob_path)
+            return actual_sha
+        
+        blob_path.parent.mkdir(exist_ok=True)
+        temp_path = blob_path.with_name(blob_path.name + '.tmp')
+        temp_path.write_bytes(data)
+        os.replace(temp_path, blob_path)
+        
+        self.total_bytes += len(data)
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+        return actual_sha
+    
+    def _evict(self):
+        """Delete least recently used blobs until the store fits in max_bytes."""
+        blobs = sorted(
+            ((blob.stat(), blob) for blob in self._iter_blobs()),
+            key=lambda item: item[0].st_mtime
+        )
+        for stat, blob in blobs:
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                blob.unlink()
+            except OSError:
+                continue
+            self.total_bytes -= stat.st_size
+
+
+class ConversionCache:
+    """
+    SQLite store of converted JavaScript keyed by conversion_cache_key().
+    
+    Each row records when it was last read, and the least recently used rows
+    are deleted once the stored code grows past ``max_bytes``, so re-running
+    the converter over unchanged samples costs no model calls.
+    """
+    
+    def __init__(self, db_path: str, max_bytes: int = DEFAULT_RESULT_CACHE_MB * 1024 * 1024):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._db = sqlite3.connect(db_path)
+        with self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS conversions ('
+                'key TEXT PRIMARY KEY, js_code TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)'
+            )
+        self.total_bytes = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM conversions').fetchone()[0]
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached JavaScript for key, marking it as recently used."""
+        row = self._db.execute('SELECT js_code FROM conversions WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        with self._db:
+            self._db.execute('UPDATE conversions SET last_used = ? WHERE key = ?', (time.time(), key))
+        return row[0]
+    
+    def put(self, key: str, js_code: str):
+        """Store the JavaScript converted for key."""
+        size = len(js_code.encode('utf-8'))
+        with self._db:
+            old = self._db.execute('SELECT size FROM conversions WHERE key = ?', (key,)).fetchone()
+            self._db.execute(
+                'INSERT OR REPLACE INTO conversions (key, js_code, size, last_used) VALUES (?, ?, ?, ?)',
+                (key, js_code, size, time.time())
+            )
+        self.total_bytes += size - (old[0] if old else 0)
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+    
+    def _evict(self):
+        """Delete least recently used rows until the store fits in max_bytes."""
+        rows = self._db.execute('SELECT key, size FROM conversions ORDER BY last_used').fetchall()
+        with self._db:
+            for key, size in rows:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                self._db.execute('DELETE FROM conversions WHERE key = ?', (key,))
+                self.total_bytes -= size
+    
+    def close(self):
+        self._db.close()
+
+
+def normalize_python_source(text: str) -> str:
+    """Normalize line endings and trailing whitespace so cosmetic edits keep the same cache key."""
+    lines = [line.rstrip() for line in text.replace('\r\n', '\n').replace('\r', '\n').split('\n')]
+    return '\n'.join(lines).strip('\n') + '\n'
+
+
+def conversion_cache_key(text: str, lib_name: str, ref_url: str, instructions: str = AGENT_INSTRUCTIONS,
+                         model: Optional[str] = None, preamble: Optional[str] = None,
+                         api_methods: Optional[List[Dict[str, str]]] = None) -> str:
+    """
+    Hash everything that determines a conversion's output.
+    
+    The key covers the prompt built from the normalized source, library, docs
+    URL, preamble and API methods (and so the prompt template), the agent
+    instructions and the model deployment.
+    """
+    model = model if model is not None else os.environ.get("MODEL_DEPLOYMENT_NAME", "")
+    prompt = _build_prompt(normalize_python_source(text), lib_name, ref_url, preamble, api_methods)
+    payload = json.dumps([prompt, instructions, model])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SampleSource(abc.ABC):
+    """
+    Base class for places Python samples can be read from.
+    
+    Sources are async context managers exposing ``iter_python_samples(repo_url)``,
+    an async iterator of dictionaries {name, content, path} that yields each
+    sample as soon as it has been read, in stable path order. Before the first
+    sample, root_path is set to the path of the requested folder, in the same
+    form as the sample paths ('' for the top level).
+    """
+    
+    root_path = ''
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+    
+    @abc.abstractmethod
+    def iter_python_samples(self, repo_url: str) -> AsyncIterator[Dict[str, str]]:
+        """Yield the Python samples found at repo_url as dictionaries {name, content, path}."""
+    
+    async def fetch_python_samples(self, repo_url: str) -> List[Dict[str, str]]:
+        """
+        Fetch all Python samples into a list.
+        
+        Args:
+            repo_url: Repository location understood by the source
+            
+        Returns:
+            List of dictionaries containing file info: {name, content, path}
+        """
+        return [sample async for sample in self.iter_python_samples(repo_url)]
+
+
+class RepositoryFetcher(SampleSource):
+    """
+    Fetches Python samples from GitHub repositories.
+    
+    Requests go to api_url and raw_url, which default to the GITHUB_API_URL and
+    GITHUB_RAW_URL environment variables and then to github.com, so GitHub
+    Enterprise Server or a local stand-in such as fake_github_service.py can be
+    used instead. Repository URLs may be on github.com or on api_url's host;
+    for an Enterprise Server api_url ending in /api/v3, raw_url defaults to the
+    server's /raw. Paginated listings are followed through their Link headers,
+    and rate-limited requests are retried once the limit resets.
+    """
+    
+    def __init__(self, fetch_mode: str = 'tree', concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+                 http_cache: Optional[HttpCache] = None, blob_cache: Optional[BlobCache] = None,
+                 api_url: Optional[str] = None, raw_url: Optional[str] = None):
+        if fetch_mode not in FETCH_MODES:
+            raise ValueError(f"Unknown fetch mode: {fetch_mode}")
+        if concurrency < 1:
+            raise ValueError("Fetch concurrency must be at least 1")
+        self.fetch_mode = fetch_mode
+        self.concurrency = concurrency
+        self.http_cache = http_cache
+        self.blob_cache = blob_cache
+        self.api_url = (api_url or os.environ.get('GITHUB_API_URL') or GITHUB_API_URL).rstrip('/')
+        raw_url = raw_url or os.environ.get('GITHUB_RAW_URL')
+        if not raw_url and self.api_url.endswith('/api/v3'):
+            # GitHub Enterprise Server serves raw files from /raw next to its /api/v3
+            raw_url = self.api_url[:-len('/api/v3')] + '/raw'
+        self.raw_url = (raw_url or GITHUB_RAW_URL).rstrip('/')
+        # Repository web URLs are on the API server's host, e.g. ghe.example.com for ghe.example.com/api/v3
+        api_host = urlparse(self.api_url).netloc
+        self.web_host = 'github.com' if api_host == 'api.github.com' else api_host
+        self.request_count = 0
+        self.not_modified_count = 0
+        self.blob_hit_count = 0
+        self.rate_limited_count = 0
+        self._blob_downloads = {}
         self.session = None
+        self._semaphore = None
     
     async def __aenter__(self):
+        # Size the pool to the semaphore so every permitted request gets a
+        # connection, and keep idle connections around between bursts.
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            limit_per_host=self.concurrency,
+            keepalive_timeout=30
+        )
         self.session = aiohttp.ClientSession(
+            connector=connector,
             headers={'User-Agent': 'Python-to-JS-Converter'}
         )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         if self.session:
             await self.session.close()
     
-    async def fetch_python_samples(self, repo_url: str) -> List[Dict[str, str]]:
+    async def iter_python_samples(self, repo_url: str) -> AsyncIterator[Dict[str, str]]:
         """
-        Fetch Python samples from a GitHub repository URL.
+        Fetch Python samples from a GitHub repository URL, yielding each as soon as it is downloaded.
         
         Args:
             repo_url: GitHub repository URL
             
-        Returns:
-            List of dictionaries containing file info: {name, content, path}
+        Yields:
+            Dictionaries containing file info: {name, content, path}
         """
         print(f"Fetching Python samples from: {repo_url}")
         
         try:
-            api_url = self._convert_to_api_url(repo_url)
-            print(f"API URL: {api_url}")
+            self.root_path = self._parse_github_url(repo_url)[3]
+            if self.fetch_mode == 'tree':
+                samples = self._iter_tree_contents(repo_url)
+            elif self.fetch_mode == 'archive':
+                samples = self._iter_archive_contents(repo_url)
+            else:
+                api_url = self._convert_to_api_url(repo_url)
+                print(f"API URL: {api_url}")
+                samples = self._iter_directory_contents(api_url)
             
-            python_files = []
-            await self._fetch_directory_contents(api_url, python_files)
+            count = 0
+            async for sample in samples:
+                count += 1
+                yield sample
             
-            print(f"Found {len(python_files)} Python files")
-            return python_files
+            print(f"Found {count} Python files ({self.request_count} HTTP requests, "
+                  f"{self.not_modified_count} served from cache, {self.blob_hit_count} blobs reused)")
+            if self.rate_limited_count:
+                print(f"Waited out {self.rate_limited_count} rate-limited GitHub requests")
             
         except Exception as e:
             print(f"Error fetching Python samples: {e}")
             raise
     
     def _convert_to_api_url(self, github_url: str) -> str:
-        """Convert GitHub URL to API URL."""
+        """Convert GitHub URL to a contents API URL on the configured API base."""
         url = github_url.strip()
+        if url.startswith(self.api_url + '/repos/'):
+            return url
         
-        if 'github.com' in url:
-            # Extract owner, repo, and path from URL
-            parts = url.replace('https://github.com/', '').replace('http://github.com/', '')
-            path_parts = parts.split('/')
-            
-            if len(path_parts) < 2:
-                raise ValueError("Invalid GitHub URL format")
+        owner, repo, ref, path = self._parse_github_url(url)
+        api_url = f"{self.api_url}/repos/{owner}/{repo}/contents"
+        if path:
+            api_url += f"/{path}"
+        if ref:
+            api_url += f"?ref={ref}"
+        return api_url
+    
+    def _parse_github_url(self, github_url: str) -> Tuple[str, str, Optional[str], str]:
+        """Split a GitHub URL into (owner, repo, ref, path); ref is None for the default branch."""
+        url = github_url.strip()
+        parsed = urlparse(url)
+        parts = [part for part in parsed.path.split('/') if part]
+        
+        # Checked by path, as api_url may share its host with repository web URLs
+        if url.startswith(self.api_url + '/repos/') or parsed.netloc == 'api.github.com':
+            # {api_url}/repos/{owner}/{repo}/contents/{path}?ref={ref}
+            if url.startswith(self.api_url + '/repos/'):
+                parts = [part for part in urlparse(url[len(self.api_url):]).path.split('/') if part]
+            if len(parts) < 3 or parts[0] != 'repos':
+                raise ValueError("Invalid GitHub API URL format")
+            ref_match = re.search(r'(?:^|&)ref=([^&]+)', parsed.query)
+            path = '/'.join(parts[4:]) if len(parts) > 3 and parts[3] == 'contents' else ''
+            return parts[1], parts[2], ref_match.group(1) if ref_match else None, path
+        
+        if parsed.netloc != self.web_host and 'github.com' not in parsed.netloc:
+            raise ValueError("Unsupported URL format. Please use a GitHub repository URL.")
+        
+        if len(parts) < 2:
+            raise ValueError("Invalid GitHub URL format")
+        
+        owner = parts[0]
+        repo = parts[1].replace('.git', '')
+        
+        # Handle tree/branch URLs
+        if len(parts) > 3 and parts[2] == 'tree':
+            return owner, repo, parts[3], '/'.join(parts[4:])
+        
+        return owner, repo, None, '/'.join(parts[2:])
+    
+    async def _get_json(self, url: str, headers: Optional[Dict[str, str]] = None):
+        """GET a GitHub API URL and decode the JSON body."""
+        return json.loads(await self._get_text(url, headers))
+    
+    async def _get_json_list(self, url: str) -> List[Dict]:
+        """GET a GitHub API listing, following Link rel="next" headers across pages."""
+        items = []
+        while url:
+            body, link = await self._get_page(url)
+            page = json.loads(body.decode('utf-8'))
+            if not isinstance(page, list):
+                return page
+            items.extend(page)
+            url = _next_page_url(link)
+        return items
+    
+    async def _get_text(self, url: str, headers: Optional[Dict[str, str]] = None) -> str:
+        """GET a GitHub URL as UTF-8 text."""
+        return (await self._get_bytes(url, headers)).decode('utf-8')
+    
+    async def _get_bytes(self, url: str, headers: Optional[Dict[str, str]] = None,
+                         use_http_cache: bool = True) -> bytes:
+        """GET a GitHub URL, mapping error statuses to ValueError."""
+        return (await self._get_page(url, headers, use_http_cache))[0]
+    
+    async def _get_page(self, url: str, headers: Optional[Dict[str, str]] = None,
+                        use_http_cache: bool = True) -> Tuple[bytes, str]:
+        """
+        GET a GitHub URL and return its body and Link header.
+        
+        With an HTTP cache configured, a previously seen URL is revalidated with a
+        conditional request and a 304 response is served from the cache.
+        """
+        http_cache = self.http_cache if use_http_cache else None
+        request_headers = dict(headers or {})
+        cached = http_cache.load(url, headers) if http_cache else None
+        if cached:
+            request_headers.update(cached[0])
+        
+        async with self._request(url, request_headers) as response:
+            if response.status == 304 and cached:
+                self.not_modified_count += 1
+                return cached[1], cached[2]
+            _check_github_status(response.status)
+            if response.status != 200:
+                raise ValueError(f"HTTP {response.status}: {await response.text()}")
             
-            owner = path_parts[0]
-            repo = path_parts[1].replace('.git', '')
+            body = await response.read()
+            if http_cache:
+                http_cache.store(url, headers, response.headers, body)
+            return body, response.headers.get('Link', '')
+    
+    @contextlib.asynccontextmanager
+    async def _request(self, url: str, headers: Optional[Dict[str, str]] = None):
+        """
+        GET url within the fetch concurrency and yield the response.
+        
+        Rate-limited responses are retried after the wait GitHub asks for
+        (Retry-After, or until X-RateLimit-Reset), without holding a fetch slot
+        while waiting. Waits over MAX_RATE_LIMIT_WAIT are not retried.
+        """
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            async with self._semaphore:
+                self.request_count += 1
+                async with self.session.get(url, headers=headers) as response:
+                    delay = _get_rate_limit_delay(response)
+                    if delay is None or delay > MAX_RATE_LIMIT_WAIT or attempt == MAX_RATE_LIMIT_RETRIES:
+                        yield response
+                        return
             
-            # Handle tree/branch URLs
-            if len(path_parts) > 2 and path_parts[2] == 'tree':
-                # Skip 'tree' and branch name
-                api_path = '/' + '/'.join(path_parts[4:]) if len(path_parts) > 4 else ''
+            self.rate_limited_count += 1
+            print(f"GitHub rate limit reached, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+    
+    async def _iter_ordered(self, coros):
+        """
+        Run coroutines concurrently and yield their results in submission order.
+        
+        Only a window of twice the fetch concurrency is scheduled ahead of the
+        consumer, so memory stays bounded however many files there are.
+        """
+        window = self.concurrency * 2
+        pending = deque()
+        try:
+            for coro in coros:
+                pending.append(asyncio.ensure_future(coro))
+                if len(pending) >= window:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _download_file(self, download_url: str, name: str, path: str,
+                             sha: Optional[str] = None) -> List[Dict[str, str]]:
+        """Download one file; returns an empty list when it cannot be fetched."""
+        print(f"Found Python file: {name}")
+        
+        try:
+            if sha:
+                data = await self._download_blob(download_url, sha)
             else:
-                api_path = '/' + '/'.join(path_parts[2:]) if len(path_parts) > 2 else ''
-            
-            return f"https://api.github.com/repos/{owner}/{repo}/contents{api_path}"
+                data = await self._get_bytes(download_url)
+        except ValueError as e:
+            print(f"Warning: Failed to download {path}: {e}")
+            return []
         
-        if 'api.github.com' in url:
-            return url
+        return [{
+            'name': name,
+            'content': data.decode('utf-8', errors='replace'),
+            'path': path
+        }]
+    
+    async def _download_blob(self, download_url: str, sha: str) -> bytes:
+        """
+        Fetch a blob by SHA, from the blob cache when possible.
+        
+        Concurrent requests for the same SHA share one download.
+        """
+        if self.blob_cache:
+            data = self.blob_cache.get(sha)
+            if data is not None:
+                self.blob_hit_count += 1
+                return data
+        
+        download = self._blob_downloads.get(sha)
+        if download is None:
+            # The blob cache supersedes the HTTP cache for content-addressed files
+            download = asyncio.ensure_future(
+                self._get_bytes(download_url, use_http_cache=not self.blob_cache)
+            )
+            self._blob_downloads[sha] = download
+            download.add_done_callback(lambda _: self._blob_downloads.pop(sha, None))
+        else:
+            self.blob_hit_count += 1
+        # Shielded so a cancelled waiter does not cancel the download under the others
+        data = await asyncio.shield(download)
         
-        raise ValueError("Unsupported URL format. Please use a GitHub repository URL.")
+        if self.blob_cache:
+            self.blob_cache.put(data, sha)
+        return data
     
-    async def _fetch_directory_contents(self, api_url: str, python_files: List[Dict[str, str]]):
-        """Recursively fetch directory contents."""
-        try:
-            async with self.session.get(api_url) as response:
-                if response.status == 404:
-                    raise ValueError("Repository or path not found")
-                elif response.status == 403:
-                    raise ValueError("Access denied or rate limited")
-                elif response.status != 200:
-                    raise ValueError(f"HTTP {response.status}: {await response.text()}")
-                
-                files = await response.json()
-                
-                for file_info in files:
-                    if file_info['type'] == 'file' and file_info['name'].endswith('.py'):
-                        print(f"Found Python file: {file_info['name']}")
-                        
-                        # Fetch file content
-                        async with self.session.get(file_info['download_url']) as content_response:
-                            if content_response.status == 200:
-                                content = await content_response.text()
-                                python_files.append({
-                                    'name': file_info['name'],
-                                    'content': content,
-                                    'path': file_info['path']
-                                })
+    async def _iter_tree_contents(self, repo_url: str) -> AsyncIterator[Dict[str, str]]:
+        """
+        List the whole requested subtree with a single recursive Git Trees API call.
+        
+        The ref is resolved to a commit first so the listing and the file downloads
+        see the same snapshot. Falls back to the contents API walk when GitHub
+        truncates the tree response.
+        """
+        owner, repo, ref, path = self._parse_github_url(repo_url)
+        repo_api = f"{self.api_url}/repos/{owner}/{repo}"
+        
+        commit_sha = (await self._get_text(
+            f"{repo_api}/commits/{ref or 'HEAD'}",
+            headers={'Accept': 'application/vnd.github.sha'}
+        )).strip()
+        print(f"Resolved {ref or 'default branch'} to commit {commit_sha}")
+        
+        # A "<commit>:<path>" tree-ish names the subtree directly, without listing its parent
+        tree_ish = f"{commit_sha}:{quote(path)}" if path else commit_sha
+        tree = await self._get_json(f"{repo_api}/git/trees/{tree_ish}?recursive=1")
+        
+        if tree.get('truncated'):
+            print("Warning: Tree listing was truncated, falling back to directory walk")
+            api_url = f"{repo_api}/contents/{path}?ref={commit_sha}"
+            async for sample in self._iter_directory_contents(api_url):
+                yield sample
+            return
+        
+        prefix = f"{path}/" if path else ''
+        downloads = (
+            self._download_file(
+                f"{self.raw_url}/{owner}/{repo}/{commit_sha}/{prefix}{entry['path']}",
+                entry['path'].rsplit('/', 1)[-1],
+                prefix + entry['path'],
+                entry['sha']
+            )
+            for entry in tree['tree']
+            if entry['type'] == 'blob' and entry['path'].endswith('.py')
+        )
+        
+        async for result in self._iter_ordered(downloads):
+            for sample in result:
+                yield sample
+    
+    async def _iter_archive_contents(self, repo_url: str) -> AsyncIterator[Dict[str, str]]:
+        """
+        Download the repository tarball once and keep the Python files under the requested path.
+        
+        The response body is fed through tarfile in stream mode on a worker thread,
+        so the archive is never written to disk or held in memory as a whole.
+        Members are handed back through a bounded queue as they are extracted.
+        """
+        owner, repo, ref, path = self._parse_github_url(repo_url)
+        tarball_url = f"{self.api_url}/repos/{owner}/{repo}/tarball"
+        if ref:
+            tarball_url += f"/{ref}"
+        
+        loop = asyncio.get_running_loop()
+        async with self._request(tarball_url) as response:
+            _check_github_status(response.status)
+            if response.status != 200:
+                raise ValueError(f"HTTP {response.status}: {await response.text()}")
+            
+            queue = asyncio.Queue(maxsize=self.concurrency)
+            stop = threading.Event()
+            
+            def emit(member) -> bool:
+                if stop.is_set():
+                    return False
+                asyncio.run_coroutine_threadsafe(queue.put(member), loop).result()
+                return True
+            
+            stream = _AsyncStreamReader(response.content, loop)
+            reader = loop.run_in_executor(None, _read_python_members, stream, path, emit)
+            try:
+                while True:
+                    getter = asyncio.ensure_future(queue.get())
+                    await asyncio.wait([getter, reader], return_when=asyncio.FIRST_COMPLETED)
+                    if not getter.done():
+                        # The reader finished (or failed) without a final member
+                        getter.cancel()
+                        reader.result()
+                        break
+                    member = getter.result()
+                    if member is None:
+                        break
                     
-                    elif file_info['type'] == 'dir':
-                        # Recursively fetch from subdirectories
-                        try:
-                            await self._fetch_directory_contents(file_info['url'], python_files)
-                        except Exception as e:
-                            print(f"Warning: Failed to fetch from subdirectory {file_info['name']}: {e}")
+                    file_path, content = member
+                    file_name = file_path.rsplit('/', 1)[-1]
+                    print(f"Found Python file: {file_name}")
+                    yield {
+                        'name': file_name,
+                        'content': content,
+                        'path': file_path
+                    }
+                await reader
+            finally:
+                # Unblock the reader thread if the consumer stopped early
+                stop.set()
+                while not reader.done():
+                    while not queue.empty():
+                        queue.get_nowait()
+                    await asyncio.wait([reader], timeout=0.05)
+    
+    async def _iter_directory_contents(self, api_url: str) -> AsyncIterator[Dict[str, str]]:
+        """
+        Recursively fetch directory contents.
         
+        File downloads and subdirectory listings run concurrently (bounded by the
+        fetch semaphore) while samples are yielded in listing order.
+        """
+        try:
+            files = await self._get_json_list(api_url)
         except Exception as e:
             print(f"Error fetching directory contents: {e}")
             raise
+        
+        async for sample in self._iter_listing(files):
+            yield sample
+    
+    async def _iter_listing(self, files: List[Dict[str, str]]) -> AsyncIterator[Dict[str, str]]:
+        """Yield the samples of one contents API listing, descending into subdirectories."""
+        pending = (
+            self._download_file(
+                file_info['download_url'],
+                file_info['name'],
+                file_info['path'],
+                file_info.get('sha')
+            )
+            if file_info['type'] == 'file' else self._list_subdirectory(file_info)
+            for file_info in files
+            if file_info['type'] == 'dir' or
+            (file_info['type'] == 'file' and file_info['name'].endswith('.py'))
+        )
+        
+        async for result in self._iter_ordered(pending):
+            if isinstance(result, tuple):
+                # A subdirectory listing: ('dir', entries)
+                async for sample in self._iter_listing(result[1]):
+                    yield sample
+            else:
+                for sample in result:
+                    yield sample
+    
+    async def _list_subdirectory(self, dir_info: Dict[str, str]) -> Tuple[str, List[Dict[str, str]]]:
+        """List a subdirectory ahead of time, skipping it on failure."""
+        try:
+            return 'dir', await self._get_json_list(dir_info['url'])
+        except Exception as e:
+            print(f"Warning: Failed to fetch from subdirectory {dir_info['name']}: {e}")
+            return 'dir', []
+
+
+def _check_github_status(status: int):
+    """Raise ValueError for GitHub's not found and forbidden statuses."""
+    if status == 404:
+        raise ValueError("Repository or path not found")
+    elif status in (403, 429):
+        raise ValueError("Access denied or rate limited")
+
+
+def _get_rate_limit_delay(response) -> Optional[float]:
+    """Return the seconds to wait before retrying a rate-limited GitHub response, or None if it was not rate limited."""
+    if response.status not in (403, 429):
+        return None
+    retry_after = response.headers.get('Retry-After')
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            return 60.0
+    if response.headers.get('X-RateLimit-Remaining') == '0':
+        reset = response.headers.get('X-RateLimit-Reset')
+        try:
+            return max(0.0, float(reset) - time.time()) + 1 if reset else 60.0
+        except ValueError:
+            return 60.0
+    return None
+
+
+def _next_page_url(link_header: str) -> Optional[str]:
+    """Return the rel="next" URL of a Link header, if any."""
+    match = re.search(r'<([^>]+)>\s*;\s*rel="next"', link_header or '')
+    return match.group(1) if match else None
+
+
+class _AsyncStreamReader:
+    """Blocking file-like view of an aiohttp body, for use from a worker thread."""
+    
+    def __init__(self, content: aiohttp.StreamReader, loop: asyncio.AbstractEventLoop):
+        self.content = content
+        self.loop = loop
+    
+    def read(self, size: int = -1) -> bytes:
+        return asyncio.run_coroutine_threadsafe(self.content.read(size), self.loop).result()
+
+
+def _read_python_members(fileobj, path: str, emit) -> None:
+    """
+    Stream a GitHub tarball and emit (path, content) for the .py files under path.
+    
+    GitHub archives are ordered by path, so reading stops as soon as the
+    requested subtree has been passed, or when emit returns False. A final
+    None is emitted once the archive is exhausted.
+    """
+    prefix = f"{path.strip('/')}/" if path.strip('/') else ''
+    seen_prefix = False
+    
+    with tarfile.open(fileobj=fileobj, mode='r|gz') as archive:
+        for member in archive:
+            # Member names are prefixed with a "{owner}-{repo}-{sha}/" root directory
+            _, _, member_path = member.name.partition('/')
+            if not member_path.startswith(prefix):
+                if seen_prefix:
+                    break
+                continue
+            seen_prefix = True
+            
+            if member.isfile() and member_path.endswith('.py'):
+                content = archive.extractfile(member).read().decode('utf-8', errors='replace')
+                if not emit((member_path, content)):
+                    return
+    
+    emit(None)
+
+
+class LocalDirectorySource(SampleSource):
+    """Reads Python samples from a directory on the local file system, such as a git checkout."""
+    
+    async def iter_python_samples(self, repo_url: str) -> AsyncIterator[Dict[str, str]]:
+        """
+        Read Python samples below a local directory.
+        
+        Args:
+            repo_url: Local directory path (optionally a file:// URL)
+            
+        Yields:
+            Dictionaries containing file info: {name, content, path}
+        """
+        print(f"Reading Python samples from: {repo_url}")
+        
+        root = Path(_strip_file_scheme(repo_url)).resolve()
+        if not root.is_dir():
+            raise ValueError("Repository or path not found")
+        
+        # Report paths relative to the enclosing checkout, like the GitHub sources do
+        base = next((parent for parent in (root, *root.parents) if (parent / '.git').exists()), root)
+        self.root_path = root.relative_to(base).as_posix() if root != base else ''
+        
+        # Listing and reading run in worker threads so a large tree never blocks the event loop
+        file_paths = await asyncio.to_thread(self._list_python_files, root)
+        for file_path in file_paths:
+            print(f"Found Python file: {file_path.name}")
+            yield {
+                'name': file_path.name,
+                'content': await asyncio.to_thread(self._read_file, file_path),
+                'path': file_path.relative_to(base).as_posix()
+            }
+        print(f"Found {len(file_paths)} Python files")
+    
+    def _list_python_files(self, directory: Path) -> List[Path]:
+        """List the Python files below a directory in name order, without following directory symlinks."""
+        with os.scandir(directory) as scan:
+            entries = sorted(scan, key=lambda entry: entry.name)
+        
+        file_paths = []
+        for entry in entries:
+            if entry.name.startswith('.') or entry.name == '__pycache__':
+                continue
+            
+            # A symlink back up the tree would otherwise recurse forever
+            if entry.is_dir(follow_symlinks=False):
+                file_paths.extend(self._list_python_files(Path(entry.path)))
+            elif entry.is_file() and entry.name.endswith('.py'):
+                file_paths.append(Path(entry.path))
+        return file_paths
+    
+    @staticmethod
+    def _read_file(file_path: Path) -> str:
+        with open(file_path, 'rb') as f:
+            return f.read().decode('utf-8', errors='replace')
+
+
+class GitRepositorySource(SampleSource):
+    """
+    Reads Python samples straight from a local bare git repository.
+    
+    Files are listed with ``git ls-tree`` and read through a single
+    ``git cat-file --batch`` process. Paths follow the GitHub URL layout:
+    ``/srv/mirrors/repo.git/tree/<ref>/<subpath>`` or ``/srv/mirrors/repo.git/<subpath>``
+    for HEAD.
+    """
+    
+    @staticmethod
+    def split_path(repo_url: str) -> Optional[Tuple[str, str, str]]:
+        """Split a path into (git_dir, ref, subpath), or None when it is not inside a git directory."""
+        if '://' in repo_url and not repo_url.startswith('file://'):
+            return None
+        path = Path(_strip_file_scheme(repo_url))
+        # The parents of a relative path end with '.', which is only a candidate when named explicitly
+        candidates = [path, *(parent for parent in path.parents if parent != Path('.'))]
+        
+        for candidate in candidates:
+            if (candidate / 'HEAD').is_file() and (candidate / 'objects').is_dir() and (candidate / 'refs').is_dir():
+                rest = list(path.relative_to(candidate).parts)
+                ref = 'HEAD'
+                if len(rest) > 1 and rest[0] == 'tree':
+                    ref, rest = rest[1], rest[2:]
+                return str(candidate), ref, '/'.join(rest)
+        
+        return None
+    
+    async def iter_python_samples(self, repo_url: str) -> AsyncIterator[Dict[str, str]]:
+        """
+        Read Python samples from a bare git repository.
+        
+        Args:
+            repo_url: Path to the git directory, optionally followed by tree/<ref>/<subpath>
+            
+        Yields:
+            Dictionaries containing file info: {name, content, path}
+        """
+        print(f"Reading Python samples from git repository: {repo_url}")
+        
+        location = self.split_path(repo_url)
+        if not location:
+            raise ValueError("Not a git repository")
+        git_dir, ref, subpath = location
+        self.root_path = subpath.strip('/')
+        
+        listing = await self._run_git(git_dir, 'ls-tree', '-r', '-z', ref, '--', subpath or '.')
+        blobs = []
+        for record in listing.split(b'\0'):
+            if not record:
+                continue
+            info, _, file_path = record.decode('utf-8').partition('\t')
+            _, object_type, sha = info.split()
+            if object_type == 'blob' and file_path.endswith('.py'):
+                blobs.append((sha, file_path))
+        
+        process = await asyncio.create_subprocess_exec(
+            'git', '--git-dir', git_dir, 'cat-file', '--batch',
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE
+        )
+        try:
+            for sha, file_path in blobs:
+                file_name = file_path.rsplit('/', 1)[-1]
+                print(f"Found Python file: {file_name}")
+                yield {
+                    'name': file_name,
+                    'content': (await self._read_blob(process, sha)).decode('utf-8', errors='replace'),
+                    'path': file_path
+                }
+        finally:
+            process.stdin.close()
+            await process.wait()
+        
+        print(f"Found {len(blobs)} Python files")
+    
+    async def _read_blob(self, process: asyncio.subprocess.Process, sha: str) -> bytes:
+        """Ask a running ``git cat-file --batch`` process for one object."""
+        process.stdin.write(f"{sha}\n".encode('ascii'))
+        await process.stdin.drain()
+        
+        header = (await process.stdout.readline()).split()
+        if len(header) != 3:
+            raise ValueError(f"Failed to read git object {sha}")
+        return (await process.stdout.readexactly(int(header[2]) + 1))[:-1]
+    
+    async def _run_git(self, git_dir: str, *args: str) -> bytes:
+        process = await asyncio.create_subprocess_exec(
+            'git', '--git-dir', git_dir, *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await process.communicate()
+        if process.returncode != 0:
+            raise ValueError(f"git {args[0]} failed: {stderr.decode('utf-8', errors='replace').strip()}")
+        return stdout
+
+
+def sample_output_name(sample_path: str, root_path: str = '') -> str:
+    """
+    Name of a sample's converted file: its path below root_path with a .js extension.
+    
+    Keeping the subdirectories apart means same-named samples in different
+    folders never overwrite each other's output.
+    """
+    if root_path and sample_path.startswith(root_path.rstrip('/') + '/'):
+        sample_path = sample_path[len(root_path.rstrip('/')) + 1:]
+    return (sample_path[:-3] if sample_path.endswith('.py') else sample_path) + '.js'
+
+
+def _strip_file_scheme(repo_url: str) -> str:
+    return repo_url[len('file://'):] if repo_url.startswith('file://') else repo_url
+
+
+def open_sample_source(repo_url: str, **fetch_options) -> SampleSource:
+    """
+    Pick the sample source for a repository location.
+    
+    Bare git repositories and local directories are read without any network
+    access; everything else is treated as a GitHub URL and fetched with
+    RepositoryFetcher, which receives fetch_options.
+    """
+    if GitRepositorySource.split_path(repo_url):
+        return GitRepositorySource()
+    if os.path.isdir(_strip_file_scheme(repo_url)):
+        return LocalDirectorySource()
+    return RepositoryFetcher(**fetch_options)
 
 
 class ApiDocParser:
@@ -249,88 +1185,900 @@ class ApiDocParser:
         return mappings.get(js_library, mappings['default'])
 
 
-class PythonToJsConverter:
-    """Main converter class that orchestrates the conversion process."""
+class ApiIndex:
+    """
+    Index of the API methods discovered for a run, for picking the ones relevant to a sample.
     
-    def __init__(self):
-        self.repo_fetcher = None
-        self.api_parser = None
+    Method names are split into lowercase words (``createAgent`` -> create, agent)
+    and matched against the identifiers used in the Python code. A method
+    scores highly when its whole name matches an identifier (``create_agent``
+    matches ``createAgent``) and otherwise by the rarity-weighted words it
+    shares with the code.
+    """
     
-    async def convert_samples(self, repo_url: str, js_library: str, api_docs_url: Optional[str] = None) -> List[Dict[str, str]]:
-        """
-        Convert Python samples from a repository to JavaScript.
-        
-        Args:
-            repo_url: GitHub repository URL containing Python samples
-            js_library: JavaScript library name to use
-            api_docs_url: Optional URL to API documentation
-            
-        Returns:
-            List of converted samples with metadata
-        """
-        print(f"Starting conversion process...")
-        print(f"Repository: {repo_url}")
-        print(f"JavaScript Library: {js_library}")
-        print(f"API Documentation: {api_docs_url or 'None provided'}")
+    def __init__(self, api_methods: List[Dict[str, str]]):
+        self.methods = api_methods
+        self._names = [_squash_identifier(method['name']) for method in api_methods]
+        self._terms = [_identifier_terms(method['name']) for method in api_methods]
+        document_counts = {}
+        for terms in self._terms:
+            for term in terms:
+                document_counts[term] = document_counts.get(term, 0) + 1
+        self._weights = {term: math.log(1 + len(api_methods) / count) for term, count in document_counts.items()}
+    
+    def select(self, python_code: str, top_k: int = DEFAULT_API_METHODS_TOP_K) -> List[Dict[str, str]]:
+        """Return up to top_k methods matching identifiers in python_code, best match first."""
+        identifiers = {name for name in re.findall(r'[A-Za-z_][A-Za-z0-9_]*', python_code)
+                       if not keyword.iskeyword(name)}
+        names = {_squash_identifier(name) for name in identifiers}
+        terms = set().union(*(_identifier_terms(name) for name in identifiers)) if identifiers else set()
         
-        converted_samples = []
+        scored = []
+        for position, method in enumerate(self.methods):
+            score = sum(self._weights[term] for term in self._terms[position] & terms)
+            if self._names[position] in names:
+                score += 10
+            if score > 0:
+                scored.append((-score, position, method))
+        return [method for _, _, method in sorted(scored, key=lambda item: item[:2])[:top_k]]
+
+
+def _squash_identifier(name: str) -> str:
+    return name.replace('_', '').lower()
+
+
+def _identifier_terms(name: str) -> set:
+    """Split a snake_case or camelCase identifier into its lowercase words."""
+    return {word.lower() for word in re.findall(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+', name) if len(word) > 1}
+
+
+class ConversionThrottledError(Exception):
+    """Raised when the conversion service rejects a request because of rate limiting."""
+    
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _get_throttle_delay(error: Exception) -> Optional[float]:
+    """Return the service's suggested retry delay for a throttling error (0 if none), or None if error is not throttling."""
+    if isinstance(error, ConversionThrottledError):
+        return error.retry_after or 0.0
+    
+    if isinstance(error, HttpResponseError) and error.status_code in (429, 503):
+        retry_after = error.response.headers.get('Retry-After') if error.response is not None else None
+        try:
+            return float(retry_after) if retry_after else 0.0
+        except ValueError:
+            return 0.0
+    
+    return None
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit for conversions.
+    
+    In adaptive mode the limit is halved whenever the service throttles a request
+    and grows back by one after a full limit's worth of successful conversions
+    (additive increase, multiplicative decrease), never exceeding max_limit.
+    """
+    
+    def __init__(self, max_limit: int, adaptive: bool = False):
+        self.max_limit = max_limit
+        self.limit = max_limit
+        self.adaptive = adaptive
+        self.active = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+    
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+    
+    async def release(self, throttled: bool = False):
+        async with self._condition:
+            self.active -= 1
+            if self.adaptive:
+                if throttled:
+                    self.limit = max(1, self.limit // 2)
+                    self._successes = 0
+                elif self.limit < self.max_limit:
+                    self._successes += 1
+                    if self._successes >= self.limit:
+                        self.limit += 1
+                        self._successes = 0
+            self._condition.notify_all()
+
+
+class CachedTokenCredential:
+    """
+    Async credential wrapper that caches access tokens until shortly before they expire.
+    
+    DefaultAzureCredential probes its whole credential chain and may start a
+    CLI subprocess for every token request; the wrapper pays that cost once per
+    scope set and hands out the cached token to every client sharing it.
+    """
+    
+    def __init__(self, credential, refresh_margin: int = TOKEN_REFRESH_MARGIN):
+        self._credential = credential
+        self.refresh_margin = refresh_margin
+        self._tokens = {}
+        self._lock = asyncio.Lock()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+    
+    async def get_token(self, *scopes, claims: Optional[str] = None, tenant_id: Optional[str] = None, **kwargs):
+        """Return a cached token for scopes, requesting a new one when it is about to expire."""
+        if claims:
+            # A claims challenge needs a fresh token
+            return await self._credential.get_token(*scopes, claims=claims, tenant_id=tenant_id, **kwargs)
         
-        async with RepositoryFetcher() as repo_fetcher, ApiDocParser() as api_parser:
-            # Step 1: Fetch Python samples
-            python_samples = await repo_fetcher.fetch_python_samples(repo_url)
+        key = (scopes, tenant_id)
+        async with self._lock:
+            token = self._tokens.get(key)
+            if token is None or token.expires_on - self.refresh_margin <= time.time():
+                token = await self._credential.get_token(*scopes, tenant_id=tenant_id, **kwargs)
+                self._tokens[key] = token
+            return token
+    
+    async def close(self):
+        """Close the wrapped credential."""
+        self._tokens.clear()
+        await self._credential.close()
+
+
+def project_client_options(endpoint: str) -> Dict:
+    """
+    Return extra AIProjectClient options needed for endpoint.
+    
+    Azure clients only send bearer tokens over TLS. Plain http:// endpoints on
+    a loopback host, such as a local fake_agents_service.py, are sent a fixed
+    Authorization header instead, so no token is ever requested for them. Any
+    other endpoint keeps the normal Azure authentication.
+    """
+    parsed = urlparse(endpoint)
+    if parsed.scheme != 'http' or not _is_loopback_host(parsed.hostname):
+        return {}
+    return {'authentication_policy': HeadersPolicy({'Authorization': 'Bearer local'})}
+
+
+def _is_loopback_host(host: Optional[str]) -> bool:
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host or '').is_loopback
+    except ValueError:
+        return False
+
+
+class ProjectClientHolder:
+    """
+    Long-lived async AIProjectClient shared by every conversion in the process.
+    
+    The client, its token-caching credential and a pooled aiohttp transport are
+    created on first use and kept until close(), so credential probing, token
+    acquisition and TLS handshakes happen once per run instead of once per
+    sample. Use get_client_holder() for the process-wide instance.
+    """
+    
+    def __init__(self, endpoint: Optional[str] = None, pool_size: int = DEFAULT_CLIENT_POOL_SIZE):
+        self.endpoint = endpoint
+        self.pool_size = pool_size
+        self._session = None
+        self._credential = None
+        self._project_client = None
+        self._lock = asyncio.Lock()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+    
+    async def get_agents_client(self):
+        """Return the shared async agents client, opening the project client on first use."""
+        async with self._lock:
+            if self._project_client is None:
+                self._open()
+        return self._project_client.agents
+    
+    def _open(self):
+        connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.pool_size, keepalive_timeout=30)
+        # Same session settings the Azure transport uses when it owns the session
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            auto_decompress=False,
+            trust_env=True,
+        )
+        endpoint = self.endpoint or os.environ["PROJECT_ENDPOINT"]
+        self._credential = CachedTokenCredential(AsyncDefaultAzureCredential())
+        self._project_client = AsyncAIProjectClient(
+            endpoint=endpoint,
+            credential=self._credential,
+            transport=AioHttpTransport(session=self._session, session_owner=False),
+            **project_client_options(endpoint),
+        )
+    
+    async def close(self):
+        """Close the client, credential and connection pool."""
+        try:
+            if self._project_client:
+                await self._project_client.close()
+            if self._credential:
+                await self._credential.close()
+        finally:
+            if self._session:
+                await self._session.close()
+            self._project_client = self._credential = self._session = None
+
+
+_client_holder = None
+
+
+def get_client_holder() -> ProjectClientHolder:
+    """
+    Return the process-wide ProjectClientHolder, creating it on first call.
+    
+    It is used by convert_text_async() and convert_text_stream() when no
+    agents_client is passed, and nothing closes it automatically: callers of
+    those functions should ``await get_client_holder().close()`` before their
+    event loop ends. PythonToJsConverter and AgentManager do not use it.
+    """
+    global _client_holder
+    if _client_holder is None:
+        _client_holder = ProjectClientHolder()
+    return _client_holder
+
+
+class AgentManager:
+    """
+    Owns the converter agent for one conversion run.
+    
+    The agent is created on first use and shared by every sample instead of being
+    created and deleted around each conversion. With keep_agent, an agent left by
+    an earlier run with the same name, model and instructions hash is reused, and
+    the agent is kept for the next run instead of being deleted on close. The
+    agents client comes from client_holder and outlives the manager; without
+    one, the manager opens its own holder and closes it on close.
+    """
+    
+    def __init__(self, client_holder: Optional[ProjectClientHolder] = None, keep_agent: bool = False,
+                 name: str = None, instructions: str = None):
+        self._owns_client_holder = client_holder is None
+        self.client_holder = client_holder or ProjectClientHolder()
+        self.keep_agent = keep_agent
+        self.name = name or AGENT_NAME
+        self.instructions = instructions or AGENT_INSTRUCTIONS
+        self.instructions_hash = hashlib.sha256(self.instructions.encode('utf-8')).hexdigest()[:16]
+        self.agents_client = None
+        self.agent_id = None
+        self._owns_agent = False
+        self._lock = asyncio.Lock()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+    
+    async def get_agent(self):
+        """Return (agents_client, agent_id), creating or looking up the agent on first use."""
+        async with self._lock:
+            if self.agent_id is None:
+                await self._open()
+        return self.agents_client, self.agent_id
+    
+    async def _open(self):
+        self.agents_client = await self.client_holder.get_agents_client()
+        model = os.environ["MODEL_DEPLOYMENT_NAME"]
+        
+        if self.keep_agent:
+            async for agent in self.agents_client.list_agents():
+                if (agent.name == self.name and agent.model == model and
+                        (agent.metadata or {}).get('instructions_sha256') == self.instructions_hash):
+                    print(f"Reusing agent, agent ID: {agent.id}")
+                    self.agent_id = agent.id
+                    return
+        
+        agent = await self.agents_client.create_agent(
+            model=model,
+            name=self.name,
+            instructions=self.instructions,
+            metadata={'instructions_sha256': self.instructions_hash},
+        )
+        print(f"Created agent, agent ID: {agent.id}")
+        self.agent_id = agent.id
+        self._owns_agent = True
+    
+    async def close(self):
+        """Delete the agent if this run created it, and close the client holder if the manager opened it."""
+        try:
+            if self.agent_id and self._owns_agent and not self.keep_agent:
+                await self.agents_client.delete_agent(self.agent_id)
+                print("Deleted agent")
+        finally:
+            self.agents_client = None
+            self.agent_id = None
+            self._owns_agent = False
+            if self._owns_client_holder:
+                await self.client_holder.close()
+
+
+class PythonToJsConverter:
+    """
+    Main converter class that orchestrates the conversion process.
+    
+    Without client_holder, the converter opens its own ProjectClientHolder and
+    closes it at the end of every convert_samples() or convert_samples_to_path()
+    call. Conversions started outside a run, such as stream_single_sample(),
+    reopen it; close it with close() or by using the converter as an async
+    context manager. A client_holder that is passed in is never closed.
+    """
+    
+    def __init__(self, fetch_mode: str = 'tree', fetch_concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+                 http_cache_dir: Optional[str] = None, http_cache_mb: int = DEFAULT_HTTP_CACHE_MB,
+                 blob_cache_dir: Optional[str] = None,
+                 blob_cache_mb: int = DEFAULT_BLOB_CACHE_MB, convert_workers: int = 1,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, adaptive_jobs: bool = False,
+                 keep_agent: bool = False, client_holder: Optional[ProjectClientHolder] = None,
+                 run_completion: str = 'stream', stream_output: Optional[TextIO] = None,
+                 result_cache_path: Optional[str] = None, result_cache_mb: int = DEFAULT_RESULT_CACHE_MB,
+                 refresh_results: bool = False, incremental: bool = True,
+                 batch_tokens: int = DEFAULT_BATCH_TOKENS, max_sample_tokens: int = DEFAULT_MAX_SAMPLE_TOKENS,
+                 api_methods_top_k: int = DEFAULT_API_METHODS_TOP_K, engine: str = 'agent',
+                 min_confidence: float = DEFAULT_MIN_RULES_CONFIDENCE, github_api_url: Optional[str] = None,
+                 github_raw_url: Optional[str] = None):
+        if convert_workers < 1 or queue_size < 1:
+            raise ValueError("Convert workers and queue size must be at least 1")
+        if run_completion not in RUN_COMPLETION_MODES:
+            raise ValueError(f"Unknown run completion mode: {run_completion}")
+        if engine not in CONVERSION_ENGINES:
+            raise ValueError(f"Unknown conversion engine: {engine}")
+        self.fetch_mode = fetch_mode
+        self.fetch_concurrency = fetch_concurrency
+        self.github_api_url = github_api_url
+        self.github_raw_url = github_raw_url
+        self.http_cache_dir = http_cache_dir
+        self.http_cache_mb = http_cache_mb
+        self.blob_cache_dir = blob_cache_dir
+        self.blob_cache_mb = blob_cache_mb
+        self.convert_workers = convert_workers
+        self.queue_size = queue_size
+        self.adaptive_jobs = adaptive_jobs
+        self.keep_agent = keep_agent
+        self._owns_client_holder = client_holder is None
+        self.client_holder = client_holder or ProjectClientHolder()
+        self.run_completion = run_completion
+        self.stream_output = stream_output
+        self.result_cache_path = result_cache_path
+        self.result_cache_mb = result_cache_mb
+        self.refresh_results = refresh_results
+        self.result_cache_hits = 0
+        self.failed_count = 0
+        self.incremental = incremental
+        self.unchanged_count = 0
+        self.batch_tokens = batch_tokens
+        self.batched_count = 0
+        self.max_sample_tokens = max_sample_tokens
+        self.api_methods_top_k = api_methods_top_k
+        self.engine = engine
+        self.min_confidence = min_confidence
+        self.rules_count = 0
+        self.patched_count = 0
+        self.regenerated_count = 0
+        # Backends a sample can be converted with; 'hybrid' picks one per sample
+        self._backends = {
+            'agent': self._convert_with_agent,
+            'rules': self._convert_with_rules,
+            'patch': self._convert_with_patches,
+        }
+        self.source_tokens = 0
+        self.prompt_source_tokens = 0
+        self.sample_timings = []
+        self._result_cache = None
+        self._manifest = None
+        self._preamble = None
+        self._api_index = None
+        self._limiter = None
+        self._agent_manager = None
+        self.repo_fetcher = None
+        self.api_parser = None
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+    
+    async def close(self):
+        """Close the client holder if the converter opened it."""
+        if self._owns_client_holder:
+            await self.client_holder.close()
+    
+    async def convert_samples(self, repo_url: str, js_library: str, api_docs_url: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        Convert Python samples from a repository to JavaScript.
+        
+        Args:
+            repo_url: GitHub repository URL, local directory or bare git repository containing Python samples
+            js_library: JavaScript library name to use
+            api_docs_url: Optional URL to API documentation
             
-            if not python_samples:
-                print("No Python samples found in the repository")
-                return []
+        Returns:
+            List of converted samples with metadata
+        """
+        converted_samples = []
+        await self._run_pipeline(repo_url, js_library, api_docs_url, converted_samples.append)
+        return converted_samples
+    
+    async def convert_samples_to_path(self, repo_url: str, js_library: str, api_docs_url: Optional[str],
+                                      output_path: str) -> int:
+        """
+        Convert Python samples and write each one to a ZIP file or directory as soon as it is ready.
+        
+        Unlike convert_samples, converted code is not accumulated, so memory use is
+        bounded by the pipeline queue depths rather than the repository size.
+        
+        When incremental, a manifest written next to the output records each
+        sample's path, blob SHA and output hash. Samples unchanged since the
+        previous run carry their earlier output forward instead of being
+        converted again, and samples removed from the source drop out.
+        
+        Samples that fail to convert are written as an error comment with
+        their Python code and counted in failed_count.
+        
+        Args:
+            repo_url: GitHub repository URL, local directory or bare git repository containing Python samples
+            js_library: JavaScript library name to use
+            api_docs_url: Optional URL to API documentation
+            output_path: Output .zip file or directory path
             
-            # Step 2: Parse API documentation if provided
-            api_methods = []
-            if api_docs_url:
-                api_methods = await api_parser.parse_api_methods(api_docs_url)
+        Returns:
+            Number of samples written
+        """
+        manifest = None
+        if self.incremental:
+            manifest = OutputManifest(output_path, {
+                'js_library': js_library,
+                'api_docs_url': api_docs_url or "",
+                'model': os.environ.get("MODEL_DEPLOYMENT_NAME", ""),
+                'instructions_sha256': hashlib.sha256(AGENT_INSTRUCTIONS.encode('utf-8')).hexdigest(),
+                'engine': self.engine,
+                'min_confidence': self.min_confidence if self.engine == 'hybrid' else None,
+                # Everything else that shapes the requests or splits the samples
+                'preamble_sha256': hashlib.sha256(build_conversion_preamble(
+                    js_library, api_docs_url or "", ApiDocParser().get_common_mappings(js_library)
+                ).encode('utf-8')).hexdigest(),
+                'api_methods_top_k': self.api_methods_top_k,
+                'max_sample_tokens': self.max_sample_tokens,
+                'batch_tokens': self.batch_tokens,
+            })
+            manifest.load()
+        
+        self.unchanged_count = 0
+        self._manifest = manifest
+        with open_sample_writer(output_path) as writer:
+            try:
+                count = await self._run_pipeline(repo_url, js_library, api_docs_url, writer.write)
+            finally:
+                # Release the previous output before the writer replaces it
+                self._manifest = None
+                if manifest is not None:
+                    manifest.close()
+        
+        if manifest is not None:
+            manifest.save()
+            if self.unchanged_count:
+                print(f"Carried forward {self.unchanged_count} unchanged samples")
+        return count
+    
+    async def _run_pipeline(self, repo_url: str, js_library: str, api_docs_url: Optional[str], sink) -> int:
+        """
+        Run the fetch -> convert -> write pipeline, passing converted samples to sink in input order.
+        
+        The stages are connected by bounded queues: fetching runs at the fetch
+        concurrency, conversion in convert_workers tasks (throttled further by the
+        adaptive limiter when enabled) and writing in a single task. At most
+        queue_size * 2 + convert_workers samples are between the fetch and write
+        stages at any time.
+        
+        Per-sample timings of the run (seconds converting, seconds in sink and
+        seconds from being fetched to leaving sink) are kept in sample_timings.
+        
+        Returns:
+            Number of samples passed to sink
+        """
+        print(f"Starting conversion process...")
+        print(f"Repository: {repo_url}")
+        print(f"JavaScript Library: {js_library}")
+        print(f"API Documentation: {api_docs_url or 'None provided'}")
+        
+        http_cache = HttpCache(self.http_cache_dir, self.http_cache_mb * 1024 * 1024) if self.http_cache_dir else None
+        blob_cache = BlobCache(self.blob_cache_dir, self.blob_cache_mb * 1024 * 1024) if self.blob_cache_dir else None
+        
+        sample_source = open_sample_source(
+            repo_url,
+            fetch_mode=self.fetch_mode,
+            concurrency=self.fetch_concurrency,
+            http_cache=http_cache,
+            blob_cache=blob_cache,
+            api_url=self.github_api_url,
+            raw_url=self.github_raw_url
+        )
+        
+        fetch_queue = asyncio.Queue(maxsize=self.queue_size)
+        write_queue = asyncio.Queue(maxsize=self.queue_size)
+        # Released by the writer, so a slow head-of-line sample cannot make the
+        # reordering buffer grow without bound
+        in_flight = asyncio.Semaphore(self.queue_size * 2 + self.convert_workers)
+        counts = {'fetched': 0, 'written': 0}
+        fetched_at = {}
+        convert_seconds = {}
+        self.sample_timings = []
+        self._limiter = AdaptiveLimiter(self.convert_workers, self.adaptive_jobs)
+        self.result_cache_hits = 0
+        self.failed_count = 0
+        self.batched_count = 0
+        self.rules_count = 0
+        self.patched_count = self.regenerated_count = 0
+        self.source_tokens = self.prompt_source_tokens = 0
+        
+        # The converter is listed first so its client holder is closed after the agent is deleted
+        async with self, sample_source as repo_fetcher, ApiDocParser() as api_parser, \
+                AgentManager(self.client_holder, keep_agent=self.keep_agent) as agent_manager:
+            # One agent serves every sample of the run; it is removed on exit, even on Ctrl-C
+            self._agent_manager = agent_manager
+            self.repo_fetcher = repo_fetcher
+            if self.result_cache_path and self.engine != 'rules':
+                self._result_cache = ConversionCache(self.result_cache_path, self.result_cache_mb * 1024 * 1024)
             
-            # Step 3: Convert each sample
-            for i, sample in enumerate(python_samples, 1):
-                print(f"Converting sample {i}/{len(python_samples)}: {sample['name']}")
-                if sample['name'] == "__init__.py":
-                    continue
-                
-                try:
-                    js_code = await self.convert_single_sample(
-                        sample['content'], 
-                        js_library, 
-                        api_docs_url,
-                        api_methods
-                    )
+            # Parse API documentation if provided, while the first samples are fetched
+            async def prepare_run():
+                # The rules engine never reads the API docs, so they are not fetched for it
+                api_methods = [] if self.engine == 'rules' else await api_parser.parse_api_methods(api_docs_url)
+                # Built once, so every request of the run starts with the same bytes
+                self._preamble = build_conversion_preamble(
+                    js_library, api_docs_url or "", api_parser.get_common_mappings(js_library)
+                )
+                self._api_index = ApiIndex(api_methods)
+                return api_methods
+            
+            api_methods_task = asyncio.ensure_future(prepare_run())
+            
+            async def fetch_stage():
+                async for sample in repo_fetcher.iter_python_samples(repo_url):
+                    await in_flight.acquire()
+                    fetched_at[counts['fetched']] = time.perf_counter()
+                    await fetch_queue.put((counts['fetched'], sample))
+                    counts['fetched'] += 1
+                for _ in range(self.convert_workers):
+                    await fetch_queue.put(None)
+            
+            async def convert_stage():
+                api_methods = await api_methods_task
+                held = deque()
+                while True:
+                    item = held.popleft() if held else await fetch_queue.get()
+                    if item is None:
+                        break
+                    index, sample = item
+                    start = time.perf_counter()
                     
-                    converted_samples.append({
-                        'original_name': sample['name'],
-                        'original_path': sample['path'],
-                        'js_name': sample['name'].replace('.py', '.js'),
-                        'js_code': js_code,
-                        'python_code': sample['content']
-                    })
+                    if self._is_batchable(sample):
+                        # Pack small samples that are already fetched into one run, without
+                        # waiting for more; the first one that does not fit is held back
+                        batch = [item]
+                        tokens = count_tokens(sample['content'])
+                        while not fetch_queue.empty():
+                            next_item = fetch_queue.get_nowait()
+                            if (next_item is None or not self._is_batchable(next_item[1]) or
+                                    tokens + count_tokens(next_item[1]['content']) > self.batch_tokens):
+                                held.append(next_item)
+                                break
+                            batch.append(next_item)
+                            tokens += count_tokens(next_item[1]['content'])
+                        
+                        if len(batch) > 1:
+                            results = await self._convert_fetched_batch(batch, js_library, api_docs_url, api_methods)
+                            for result in results:
+                                convert_seconds[result[0]] = time.perf_counter() - start
+                                await write_queue.put(result)
+                            continue
                     
-                except Exception as e:
-                    print(f"Error converting {sample['name']}: {e}")
-                    # Include failed conversion with error comment
-                    error_js = f"// Error converting {sample['name']}: {e}\n// Original Python code:\n/*\n{sample['content']}\n*/"
-                    converted_samples.append({
-                        'original_name': sample['name'],
-                        'original_path': sample['path'],
-                        'js_name': sample['name'].replace('.py', '.js'),
-                        'js_code': error_js,
-                        'python_code': sample['content']
-                    })
+                    converted = await self._convert_fetched_sample(sample, index + 1, js_library, api_docs_url, api_methods)
+                    convert_seconds[index] = time.perf_counter() - start
+                    await write_queue.put((index, converted))
+            
+            async def write_stage():
+                pending = {}
+                next_index = 0
+                while True:
+                    item = await write_queue.get()
+                    if item is None:
+                        break
+                    pending[item[0]] = item[1]
+                    while next_index in pending:
+                        converted = pending.pop(next_index)
+                        if converted:
+                            start = time.perf_counter()
+                            sink(converted)
+                            end = time.perf_counter()
+                            counts['written'] += 1
+                            self.sample_timings.append({
+                                'path': converted['original_path'],
+                                'convert_seconds': convert_seconds[next_index],
+                                'save_seconds': end - start,
+                                'latency_seconds': end - fetched_at[next_index],
+                            })
+                        fetched_at.pop(next_index)
+                        convert_seconds.pop(next_index)
+                        next_index += 1
+                        in_flight.release()
+            
+            async def produce():
+                await _gather_stages([fetch_stage()] + [convert_stage() for _ in range(self.convert_workers)])
+                await write_queue.put(None)
+            
+            try:
+                await _gather_stages([produce(), write_stage()])
+            finally:
+                api_methods_task.cancel()
+                self._agent_manager = None
+                self._preamble = None
+                self._api_index = None
+                if self._result_cache is not None:
+                    self._result_cache.close()
+                    self._result_cache = None
         
-        print(f"Conversion completed: {len(converted_samples)} samples processed")
-        return converted_samples
+        if not counts['fetched']:
+            print("No Python samples found in the repository")
+        
+        print(f"Conversion completed: {counts['written']} samples processed")
+        if self.failed_count:
+            print(f"Failed to convert {self.failed_count} samples")
+        if self.result_cache_hits:
+            print(f"Reused {self.result_cache_hits} cached conversions")
+        if self.batched_count:
+            print(f"Converted {self.batched_count} small samples in batched runs")
+        if self.rules_count and self.engine == 'hybrid':
+            print(f"Converted {self.rules_count} samples with the rules engine, "
+                  f"{counts['written'] - self.rules_count} with the agent")
+        if self.patched_count or self.regenerated_count:
+            print(f"Patched {self.patched_count} rules drafts with the agent, "
+                  f"regenerated {self.regenerated_count} in full")
+        if self.source_tokens:
+            saved = self.source_tokens - self.prompt_source_tokens
+            print(f"Sample prompt tokens: {self.prompt_source_tokens} sent for {self.source_tokens} in the sources "
+                  f"({saved} saved, {saved * 100 / self.source_tokens:.1f}%)")
+        return counts['written']
+    
+    async def _convert_fetched_sample(self, sample: Dict[str, str], index: int, js_library: str,
+                                      api_docs_url: Optional[str], api_methods: List[Dict[str, str]]) -> Optional[Dict[str, str]]:
+        """Convert one fetched sample into its output record; package markers are skipped."""
+        print(f"Converting sample {index}: {sample['name']}")
+        if sample['name'] == "__init__.py":
+            return None
+        
+        js_code, blob_sha, cache_key = self._reuse_previous_result(sample, js_library, api_docs_url, api_methods)
+        if js_code is not None:
+            return self._finish_sample(sample, blob_sha, js_code)
+        return await self._convert_individually(sample, blob_sha, cache_key, js_library, api_docs_url, api_methods)
+    
+    async def _convert_fetched_batch(self, items: List[Tuple[int, Dict[str, str]]], js_library: str,
+                                     api_docs_url: Optional[str],
+                                     api_methods: List[Dict[str, str]]) -> List[Tuple[int, Optional[Dict[str, str]]]]:
+        """
+        Convert several small fetched samples in one agent run.
+        
+        Samples with a previous result are resolved first; if the batch reply
+        cannot be split back into one section per remaining sample, those samples
+        are converted individually.
+        
+        Returns:
+            (index, output record) pairs for every item
+        """
+        results = []
+        pending = []
+        for index, sample in items:
+            print(f"Converting sample {index + 1}: {sample['name']}")
+            js_code, blob_sha, cache_key = self._reuse_previous_result(sample, js_library, api_docs_url, api_methods)
+            if js_code is not None:
+                results.append((index, self._finish_sample(sample, blob_sha, js_code)))
+            else:
+                pending.append((index, sample, blob_sha, cache_key))
+        
+        js_codes = None
+        if len(pending) > 1:
+            for _, sample, _, _ in pending:
+                self._count_prompt_tokens(sample['content'], [compact_python_source(sample['content'])])
+            try:
+                js_codes = await self._call_with_retries(lambda: self.convert_sample_batch(
+                    [sample['content'] for _, sample, _, _ in pending], js_library, api_docs_url, api_methods
+                ))
+            except Exception as e:
+                print(f"Error converting batch of {len(pending)} samples: {e}")
+            if js_codes is None:
+                print(f"Converting {len(pending)} batched samples individually")
+            else:
+                self.batched_count += len(pending)
+        
+        for position, (index, sample, blob_sha, cache_key) in enumerate(pending):
+            if js_codes is not None:
+                converted = self._finish_sample(sample, blob_sha, js_codes[position], cache_key)
+            else:
+                converted = await self._convert_individually(sample, blob_sha, cache_key, js_library,
+                                                             api_docs_url, api_methods)
+            results.append((index, converted))
+        return results
+    
+    def _is_batchable(self, sample: Dict[str, str]) -> bool:
+        """Whether a sample is small enough to share an agent run with others."""
+        return (self.batch_tokens > 0 and sample['name'] != "__init__.py" and
+                count_tokens(sample['content']) <= min(BATCH_SAMPLE_MAX_TOKENS, self.batch_tokens) and
+                self._engine_for(sample['content']) == 'agent')
+    
+    def _reuse_previous_result(self, sample: Dict[str, str], js_library: str, api_docs_url: Optional[str],
+                               api_methods: List[Dict[str, str]]) -> Tuple[Optional[str], str, Optional[str]]:
+        """
+        Look a sample up in the previous output's manifest and the result cache.
+        
+        Returns:
+            Tuple of the reused JavaScript (None when it must be converted), the
+            sample's blob SHA and its result cache key (None without a cache)
+        """
+        blob_sha = git_blob_sha(sample['content'].encode('utf-8'))
+        if self._manifest is not None and not self.refresh_results:
+            js_code = self._manifest.carry_forward(sample['path'], blob_sha)
+            if js_code is not None:
+                self.unchanged_count += 1
+                return js_code, blob_sha, None
+        
+        cache_key = None
+        if self._result_cache is not None:
+            cache_key = conversion_cache_key(
+                sample['content'], js_library, api_docs_url or "", preamble=self._preamble,
+                api_methods=self._relevant_api_methods(sample['content'], api_methods)
+            )
+            if not self.refresh_results:
+                js_code = self._result_cache.get(cache_key)
+                if js_code is not None:
+                    self.result_cache_hits += 1
+                    return js_code, blob_sha, None
+        return None, blob_sha, cache_key
+    
+    async def _convert_individually(self, sample: Dict[str, str], blob_sha: str, cache_key: Optional[str],
+                                    js_library: str, api_docs_url: Optional[str],
+                                    api_methods: List[Dict[str, str]]) -> Dict[str, str]:
+        """
+        Convert a sample in its own agent run, turning a failure into an error comment.
+        
+        Samples whose compacted source exceeds max_sample_tokens are split at
+        top-level functions and classes; the parts are converted in turn and
+        their JavaScript is joined in order. Samples routed to the rules engine
+        are converted whole, locally.
+        """
+        engine = self._engine_for(sample['content'])
+        if engine == 'rules':
+            parts = None
+        else:
+            parts = split_python_source(compact_python_source(sample['content']), self.max_sample_tokens)
+            self._count_prompt_tokens(sample['content'], parts)
+        try:
+            if parts is None:
+                js_code = await self._convert_with_rules(sample['content'], js_library, api_docs_url, None)
+                self.rules_count += 1
+                # Only full agent conversions go into the result cache
+                cache_key = None
+            elif len(parts) == 1:
+                js_code = await self._convert_with_retries(
+                    sample['content'], 
+                    js_library, 
+                    api_docs_url,
+                    api_methods,
+                    engine
+                )
+                if engine == 'patch':
+                    # A patched rules draft is not what the agent would return for the key
+                    cache_key = None
+            else:
+                print(f"Splitting {sample['name']} into {len(parts)} parts")
+                js_parts = []
+                for part in parts:
+                    js_parts.append(await self._convert_with_retries(part, js_library, api_docs_url, api_methods))
+                js_code = '\n\n'.join(js_parts)
+            
+        except Exception as e:
+            print(f"Error converting {sample['name']}: {e}")
+            # Include failed conversion with error comment
+            js_code = f"// Error converting {sample['name']}: {e}\n// Original Python code:\n/*\n{sample['content']}\n*/"
+            return self._finish_sample(sample, blob_sha, js_code, failed=True)
+        
+        return self._finish_sample(sample, blob_sha, js_code, cache_key)
+    
+    def _relevant_api_methods(self, python_code: str, api_methods: Optional[List[Dict[str, str]]]) -> List[Dict[str, str]]:
+        """Select the discovered API methods worth sending along with python_code."""
+        if not api_methods or self.api_methods_top_k <= 0:
+            return []
+        if self._api_index is None or self._api_index.methods is not api_methods:
+            self._api_index = ApiIndex(api_methods)
+        return self._api_index.select(python_code, self.api_methods_top_k)
+    
+    def _count_prompt_tokens(self, python_code: str, prompt_parts: List[str]):
+        """Add a sample's original and compacted token counts to the run's totals."""
+        self.source_tokens += count_tokens(python_code)
+        self.prompt_source_tokens += sum(count_tokens(part) for part in prompt_parts)
+    
+    def _finish_sample(self, sample: Dict[str, str], blob_sha: str, js_code: str, cache_key: Optional[str] = None,
+                       failed: bool = False) -> Dict[str, str]:
+        """Store a newly converted sample's result and build its output record."""
+        if failed:
+            self.failed_count += 1
+        js_name = sample_output_name(sample['path'], self.repo_fetcher.root_path if self.repo_fetcher else '')
+        # An empty reply is never a valid conversion; keep it out of the cache so it is retried
+        if cache_key and js_code.strip() and not failed:
+            self._result_cache.put(cache_key, js_code)
+        
+        if self._manifest is not None:
+            # Failed samples are recorded without an output hash so the next run retries them
+            self._manifest.record(sample['path'], blob_sha, js_name, js_code if js_code.strip() and not failed else None)
+        
+        return {
+            'original_name': sample['name'],
+            'original_path': sample['path'],
+            'js_name': js_name,
+            'js_code': js_code,
+            'python_code': sample['content']
+        }
+    
+    async def _convert_with_retries(self, python_code: str, js_library: str, api_docs_url: Optional[str],
+                                    api_methods: List[Dict[str, str]], engine: str = 'agent') -> str:
+        """Convert a single sample with the agent (or the 'patch' backend) through _call_with_retries."""
+        backend = self._backends[engine]
+        return await self._call_with_retries(
+            lambda: backend(python_code, js_library, api_docs_url, api_methods)
+        )
+    
+    async def _call_with_retries(self, convert):
+        """
+        Await convert() while holding a limiter slot.
+        
+        In adaptive mode throttled conversions shrink the concurrency limit and are
+        retried after the service's Retry-After hint or an exponential backoff.
+        """
+        limiter = self._limiter or AdaptiveLimiter(1)
+        
+        for attempt in range(MAX_THROTTLE_RETRIES + 1):
+            await limiter.acquire()
+            throttled = False
+            try:
+                return await convert()
+            except Exception as e:
+                delay = _get_throttle_delay(e)
+                if delay is None or not limiter.adaptive or attempt == MAX_THROTTLE_RETRIES:
+                    raise
+                throttled = True
+            finally:
+                await limiter.release(throttled)
+            
+            delay = delay or min(60.0, 2 ** attempt) + random.uniform(0, 1)
+            print(f"Conversion throttled, retrying in {delay:.1f}s (concurrency limit now {limiter.limit})")
+            await asyncio.sleep(delay)
     
     async def convert_single_sample(self, python_code: str, js_library: str, api_docs_url: Optional[str], api_methods: List[Dict[str, str]]) -> str:
         """
         Convert a single Python code sample to JavaScript.
         
-        This method delegates to the convert_text function which should be implemented
-        with the actual conversion logic.
+        This method delegates to the backend of the converter's engine: the
+        agent, the offline rules engine, or for 'hybrid' the rules engine when it
+        is confident about the sample and otherwise the agent patching the rules
+        engine's draft.
         
         Args:
             python_code: Python source code to convert
@@ -341,38 +2089,609 @@ class PythonToJsConverter:
         Returns:
             Converted JavaScript code
         """
-        return convert_text(python_code, js_library, api_docs_url or "")
+        backend = self._backends[self._engine_for(python_code)]
+        return await backend(python_code, js_library, api_docs_url, api_methods)
+    
+    def _engine_for(self, python_code: str) -> str:
+        """Name the backend that converts python_code: 'agent', 'rules' or 'patch'."""
+        if self.engine != 'hybrid':
+            return self.engine
+        return 'rules' if rules_confidence(python_code) >= self.min_confidence else 'patch'
+    
+    async def _convert_with_rules(self, python_code: str, js_library: str, api_docs_url: Optional[str],
+                                  api_methods: Optional[List[Dict[str, str]]]) -> str:
+        """Convert a sample locally with the rules engine."""
+        return convert_text_rules(python_code, js_library, api_docs_url or "")
+    
+    async def _convert_with_patches(self, python_code: str, js_library: str, api_docs_url: Optional[str],
+                                    api_methods: List[Dict[str, str]]) -> str:
+        """
+        Convert a sample by having the agent patch the rules engine's draft.
+        
+        The agent replies with SEARCH/REPLACE edits for the parts the rules got
+        wrong, which is far less output than the whole file. When the edits do
+        not apply cleanly the sample is regenerated in full.
+        """
+        if not self._agent_manager:
+            return await self._convert_with_agent(python_code, js_library, api_docs_url, api_methods)
+        
+        draft = convert_text_rules(python_code, js_library, api_docs_url or "")
+        agents_client, agent_id = await self._agent_manager.get_agent()
+        js_code = await patch_text_async(
+            python_code, draft, js_library, api_docs_url or "", agents_client, agent_id,
+            run_completion=self.run_completion, preamble=self._preamble,
+            api_methods=self._relevant_api_methods(python_code, api_methods)
+        )
+        if js_code is None:
+            print("Patches did not apply to the rules draft, regenerating in full")
+            self.regenerated_count += 1
+            return await self._convert_with_agent(python_code, js_library, api_docs_url, api_methods)
+        
+        self.patched_count += 1
+        if self.stream_output is not None:
+            self.stream_output.write(js_code + '\n')
+            self.stream_output.flush()
+        return js_code
+    
+    async def _convert_with_agent(self, python_code: str, js_library: str, api_docs_url: Optional[str],
+                                  api_methods: List[Dict[str, str]]) -> str:
+        """
+        Convert a sample with the agent.
+        
+        This awaits the agents service through convert_text_async without
+        blocking the event loop. When stream_output is set, the code is streamed
+        instead and echoed to it as it is generated.
+        """
+        if self.stream_output is not None:
+            chunks = []
+            async for chunk in self.stream_single_sample(python_code, js_library, api_docs_url, api_methods):
+                chunks.append(chunk)
+                self.stream_output.write(chunk)
+                self.stream_output.flush()
+            self.stream_output.write('\n')
+            return ''.join(chunks)
+        
+        if self._agent_manager:
+            agents_client, agent_id = await self._agent_manager.get_agent()
+            return await convert_text_async(
+                python_code, js_library, api_docs_url or "",
+                agents_client=agents_client, agent_id=agent_id, run_completion=self.run_completion,
+                preamble=self._preamble, api_methods=self._relevant_api_methods(python_code, api_methods)
+            )
+        return await convert_text_async(
+            python_code, js_library, api_docs_url or "",
+            agents_client=await self.client_holder.get_agents_client(), run_completion=self.run_completion,
+            api_methods=self._relevant_api_methods(python_code, api_methods)
+        )
+    
+    async def convert_sample_batch(self, python_codes: List[str], js_library: str, api_docs_url: Optional[str],
+                                   api_methods: List[Dict[str, str]]) -> Optional[List[str]]:
+        """
+        Convert several Python samples in a single agent run.
+        
+        Args:
+            python_codes: Python source code of each sample
+            js_library: JavaScript library name
+            api_docs_url: API documentation URL
+            api_methods: List of discovered API methods
+            
+        Returns:
+            Converted JavaScript code per sample, or None when the reply could not be split
+        """
+        agents_client, agent_id = await self._agent_manager.get_agent()
+        js_codes = await convert_batch_async(
+            python_codes, js_library, api_docs_url or "", agents_client, agent_id,
+            run_completion=self.run_completion, preamble=self._preamble,
+            api_methods=self._relevant_api_methods('\n'.join(python_codes), api_methods)
+        )
+        if js_codes is not None and self.stream_output is not None:
+            for js_code in js_codes:
+                self.stream_output.write(js_code + '\n')
+            self.stream_output.flush()
+        return js_codes
+    
+    async def stream_single_sample(self, python_code: str, js_library: str, api_docs_url: Optional[str] = None,
+                                   api_methods: Optional[List[Dict[str, str]]] = None) -> AsyncIterator[str]:
+        """
+        Convert a single Python code sample, yielding JavaScript chunks as they are generated.
+        
+        Use this to forward a conversion straight into a file or HTTP response;
+        outside a conversion run a temporary agent is created for the sample.
+        
+        Args:
+            python_code: Python source code to convert
+            js_library: JavaScript library name
+            api_docs_url: API documentation URL
+            api_methods: List of discovered API methods
+            
+        Yields:
+            Chunks of converted JavaScript code
+        """
+        if self._agent_manager:
+            agents_client, agent_id = await self._agent_manager.get_agent()
+        else:
+            agents_client, agent_id = await self.client_holder.get_agents_client(), None
+        
+        async for chunk in convert_text_stream(python_code, js_library, api_docs_url or "",
+                                               agents_client=agents_client, agent_id=agent_id,
+                                               preamble=self._preamble,
+                                               api_methods=self._relevant_api_methods(python_code, api_methods)):
+            yield chunk
     
     def save_samples_to_zip(self, samples: List[Dict[str, str]], output_path: str):
         """Save converted samples to a ZIP file."""
         print(f"Saving {len(samples)} samples to {output_path}")
         
-        with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for sample in samples:
-                zipf.writestr(sample['js_name'], sample['js_code'])
+        with ZipSampleWriter(output_path) as writer:
+            for sample in samples:
+                writer.write(sample)
+        
+        print(f"ZIP file created: {output_path}")
+    
+    def save_samples_to_directory(self, samples: List[Dict[str, str]], output_dir: str):
+        """Save converted samples to a directory."""
+        print(f"Saving {len(samples)} samples to {output_dir}")
+        
+        with DirectorySampleWriter(output_dir) as writer:
+            for sample in samples:
+                writer.write(sample)
+        
+        print(f"Samples saved to directory: {output_dir}")
+
+
+async def _gather_stages(coros):
+    """Run pipeline stages together; if one fails the others are cancelled."""
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+class ZipSampleWriter:
+    """
+    Writes converted samples into a ZIP file as they arrive.
+    
+    The archive is built in a temporary file created on the first write and moved
+    over output_path on close, so the previous output stays readable until then;
+    a run that wrote nothing leaves an empty archive. When the with block exits
+    with an exception, the temporary file is deleted and the previous output is
+    kept as it was.
+    """
+    
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self._temp_path = output_path + '.tmp'
+        self._zipf = None
+        self._closed = False
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(commit=exc_type is None)
+    
+    def write(self, sample: Dict[str, str]):
+        if self._zipf is None:
+            self._zipf = zipfile.ZipFile(self._temp_path, 'w', zipfile.ZIP_DEFLATED)
+        self._zipf.writestr(sample['js_name'], sample['js_code'])
+    
+    def close(self, commit: bool = True):
+        """Finish the archive and replace output_path with it, or discard it when not commit."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._zipf is None:
+            if not commit:
+                return
+            # Samples of the previous archive that are gone must not outlive it
+            self._zipf = zipfile.ZipFile(self._temp_path, 'w', zipfile.ZIP_DEFLATED)
+        self._zipf.close()
+        self._zipf = None
+        if commit:
+            os.replace(self._temp_path, self.output_path)
+        else:
+            os.remove(self._temp_path)
+
+
+class DirectorySampleWriter:
+    """Writes converted samples into a directory as they arrive."""
+    
+    def __init__(self, output_dir: str):
+        self.output_path = Path(output_dir)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def write(self, sample: Dict[str, str]):
+        js_path = self.output_path / sample['js_name']
+        js_path.parent.mkdir(parents=True, exist_ok=True)
+        js_path.write_text(sample['js_code'], encoding='utf-8')
+    
+    def close(self):
+        pass
+
+
+def open_sample_writer(output_path: str):
+    """Pick a ZIP or directory writer for an output path."""
+    if output_path.endswith('.zip'):
+        return ZipSampleWriter(output_path)
+    return DirectorySampleWriter(output_path)
+
+
+class OutputManifest:
+    """
+    Record of the samples in a ZIP or directory output, stored next to it as ``<output>.manifest.json``.
+    
+    Each entry maps a sample's source path to its blob SHA, output file name and
+    output SHA-256. A sample whose blob SHA is unchanged reuses its previous
+    output, provided the output still hashes to the recorded value. Outputs the
+    previous manifest lists but this run did not write are removed from directory
+    outputs, also when changed settings prevented reusing them (a ZIP output is
+    rewritten from scratch on every run).
+    """
+    
+    # 2: outputs are named by their path below the requested folder
+    VERSION = 2
+    
+    def __init__(self, output_path: str, settings: Dict[str, str]):
+        self.output_path = output_path.rstrip('/\\')
+        self.manifest_path = self.output_path + '.manifest.json'
+        self.settings = settings
+        self.previous = {}
+        self.entries = {}
+        self._recorded = {}
+        self._previous_zip = None
+    
+    def load(self):
+        """Load the previous run's entries; they are ignored if the conversion settings changed."""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        # What the previous run wrote is cleaned up on save even when it cannot be reused
+        self._recorded = data.get('files', {})
+        if data.get('version') == self.VERSION and data.get('settings') == self.settings:
+            self.previous = self._recorded
+    
+    def carry_forward(self, sample_path: str, blob_sha: str) -> Optional[str]:
+        """Return the previous output for an unchanged sample, or None when it must be converted."""
+        entry = self.previous.get(sample_path)
+        if not entry or entry['blob_sha'] != blob_sha:
+            return None
+        
+        js_code = self._read_previous_output(entry['js_name'])
+        if js_code is None or entry['output_sha256'] is None or hashlib.sha256(js_code.encode('utf-8')).hexdigest() != entry['output_sha256']:
+            return None
+        return js_code
+    
+    def _read_previous_output(self, js_name: str) -> Optional[str]:
+        try:
+            if self.output_path.endswith('.zip'):
+                if self._previous_zip is None:
+                    self._previous_zip = zipfile.ZipFile(self.output_path)
+                return self._previous_zip.read(js_name).decode('utf-8')
+            return (Path(self.output_path) / js_name).read_text(encoding='utf-8')
+        except (OSError, KeyError, UnicodeDecodeError, zipfile.BadZipFile):
+            return None
+    
+    def record(self, sample_path: str, blob_sha: str, js_name: str, js_code: Optional[str]):
+        """Record a sample written in this run; js_code is None when its conversion failed."""
+        self.entries[sample_path] = {
+            'blob_sha': blob_sha,
+            'js_name': js_name,
+            'output_sha256': hashlib.sha256(js_code.encode('utf-8')).hexdigest() if js_code is not None else None,
+        }
+    
+    def close(self):
+        """Release the previous ZIP output; call before the new output replaces it."""
+        if self._previous_zip is not None:
+            self._previous_zip.close()
+            self._previous_zip = None
+    
+    def save(self):
+        """Remove outputs this run no longer writes and write this run's manifest."""
+        if not self.output_path.endswith('.zip'):
+            current_names = {entry['js_name'] for entry in self.entries.values()}
+            for sample_path, entry in self._recorded.items():
+                if entry['js_name'] not in current_names:
+                    try:
+                        (Path(self.output_path) / entry['js_name']).unlink()
+                    except OSError:
+                        continue
+                    if sample_path in self.entries:
+                        print(f"Removed {entry['js_name']} (now written as {self.entries[sample_path]['js_name']})")
+                    else:
+                        print(f"Removed {entry['js_name']} (source {sample_path} no longer exists)")
+        
+        data = {'version': self.VERSION, 'settings': self.settings, 'files': self.entries}
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
+
+
+def convert_text(text: str, lib_name: str, ref_url: str) -> str:
+    """
+    Convert Python code text to JavaScript.
+    
+    Synchronous wrapper around convert_text_async for callers without an event
+    loop: it runs the conversion on a temporary agent and a client that is
+    closed before returning. Failed runs raise like the async version.
+    
+    Args:
+        text: Python source code to convert
+        lib_name: JavaScript library name to use
+        ref_url: URL to API reference documentation
+        
+    Returns:
+        Converted JavaScript code
+    """
+    async def convert():
+        async with ProjectClientHolder() as client_holder:
+            return await convert_text_async(text, lib_name, ref_url,
+                                            agents_client=await client_holder.get_agents_client())
+    
+    return asyncio.run(convert())
+
+
+async def convert_text_async(text: str, lib_name: str, ref_url: str, agents_client=None,
+                             agent_id: Optional[str] = None, run_completion: str = 'stream',
+                             preamble: Optional[str] = None, api_methods: Optional[List[Dict[str, str]]] = None) -> str:
+    """
+    Convert Python code text to JavaScript without blocking the event loop.
+    
+    Async counterpart of convert_text built on the async agents client: every
+    service call is awaited, so other fetches and conversions keep running
+    while the model generates.
+    
+    Args:
+        text: Python source code to convert
+        lib_name: JavaScript library name to use
+        ref_url: URL to API reference documentation
+        agents_client: Optional async agents client to reuse
+        agent_id: Optional existing agent to run; when omitted a temporary agent is created and deleted
+        run_completion: 'stream' to follow the run's server-sent events, or 'poll' to poll with backoff
+        preamble: Optional run preamble from build_conversion_preamble(); defaults to one without mappings
+        api_methods: Optional API methods relevant to this sample, e.g. from ApiIndex.select
         
-        print(f"ZIP file created: {output_path}")
+    Returns:
+        Converted JavaScript code
+    """
+    content = _build_prompt(text, lib_name, ref_url, preamble, api_methods)
+    if agents_client is not None and agent_id:
+        return await _run_agent_conversion(agents_client, agent_id, content, run_completion)
     
-    def save_samples_to_directory(self, samples: List[Dict[str, str]], output_dir: str):
-        """Save converted samples to a directory."""
-        output_path = Path(output_dir)
-        output_path.mkdir(parents=True, exist_ok=True)
+    # The process-wide client keeps its token and connections for later calls
+    agents_client = agents_client or await get_client_holder().get_agents_client()
+    
+    agent = await agents_client.create_agent(
+        model=os.environ["MODEL_DEPLOYMENT_NAME"],
+        name=AGENT_NAME,
+        instructions=AGENT_INSTRUCTIONS,
+    )
+    print(f"Created agent, agent ID: {agent.id}")
+    
+    try:
+        return await _run_agent_conversion(agents_client, agent.id, content, run_completion)
+    finally:
+        await agents_client.delete_agent(agent.id)
+        print("Deleted agent")
+
+
+async def convert_text_stream(text: str, lib_name: str, ref_url: str, agents_client=None,
+                              agent_id: Optional[str] = None, preamble: Optional[str] = None,
+                              api_methods: Optional[List[Dict[str, str]]] = None) -> AsyncIterator[str]:
+    """
+    Convert Python code text to JavaScript, yielding the code as the model generates it.
+    
+    Chunks are the text deltas of a streaming agent run, so the first one arrives
+    after the model's first-token latency instead of at the end of the run and can
+    be forwarded straight to a file or HTTP response.
+    
+    Args:
+        text: Python source code to convert
+        lib_name: JavaScript library name to use
+        ref_url: URL to API reference documentation
+        agents_client: Optional async agents client to reuse
+        agent_id: Optional existing agent to run; when omitted a temporary agent is created and deleted
+        preamble: Optional run preamble from build_conversion_preamble()
+        api_methods: Optional API methods relevant to this sample
         
-        print(f"Saving {len(samples)} samples to {output_path}")
+    Yields:
+        Chunks of converted JavaScript code
+    """
+    content = _build_prompt(text, lib_name, ref_url, preamble, api_methods)
+    if agents_client is not None and agent_id:
+        async for chunk in _stream_agent_conversion(agents_client, agent_id, content):
+            yield chunk
+        return
+    
+    agents_client = agents_client or await get_client_holder().get_agents_client()
+    
+    agent = await agents_client.create_agent(
+        model=os.environ["MODEL_DEPLOYMENT_NAME"],
+        name=AGENT_NAME,
+        instructions=AGENT_INSTRUCTIONS,
+    )
+    print(f"Created agent, agent ID: {agent.id}")
+    
+    try:
+        async for chunk in _stream_agent_conversion(agents_client, agent.id, content):
+            yield chunk
+    finally:
+        await agents_client.delete_agent(agent.id)
+        print("Deleted agent")
+
+
+def _poll_delays():
+    """Yield run polling delays, starting at POLL_INITIAL_DELAY and doubling up to POLL_MAX_DELAY."""
+    delay = POLL_INITIAL_DELAY
+    while True:
+        yield delay
+        delay = min(delay * 2, POLL_MAX_DELAY)
+
+
+async def _run_agent_conversion(agents_client, agent_id: str, content: str, run_completion: str = 'stream') -> str:
+    """Run one conversion request on an existing agent and return the reply text."""
+    if run_completion not in RUN_COMPLETION_MODES:
+        raise ValueError(f"Unknown run completion mode: {run_completion}")
+    
+    if run_completion == 'stream':
+        return ''.join([chunk async for chunk in _stream_agent_conversion(agents_client, agent_id, content)])
+    
+    thread_id = await _create_request_thread(agents_client, content)
+    run = await _poll_run(agents_client, thread_id, agent_id)
+    _check_run_failure(run)
+    
+    js_code = ""
+    async for msg in agents_client.messages.list(thread_id=thread_id, order=ListSortOrder.ASCENDING):
+        # The thread also holds the request itself
+        if msg.role == MessageRole.AGENT and msg.text_messages:
+            js_code = msg.text_messages[-1].text.value
+    return js_code
+
+
+async def _create_request_thread(agents_client, content: str) -> str:
+    """Create a thread holding the conversion request and return its ID."""
+    thread = await agents_client.threads.create()
+    print(f"Created thread, thread ID: {thread.id}")
+    
+    message = await agents_client.messages.create(thread_id=thread.id, role="user", content=content)
+    print(f"Created message, message ID: {message.id}")
+    return thread.id
+
+
+def _check_run_failure(run):
+    """Raise unless the run completed: ConversionThrottledError when it was rate limited, RuntimeError otherwise."""
+    if run.status == "failed":
+        print(f"Run error: {run.last_error}")
+        if run.last_error and run.last_error.code == 'rate_limit_exceeded':
+            # The message carries the wait, e.g. "Rate limit is exceeded. Try again in 20 seconds."
+            retry_after = re.search(r'(\d+) seconds?', run.last_error.message or "")
+            raise ConversionThrottledError(f"Run throttled: {run.last_error.message}",
+                                           float(retry_after.group(1)) if retry_after else None)
+        raise RuntimeError(f"Run failed: {run.last_error}")
+    if run.status != "completed":
+        raise RuntimeError(f"Run ended with status {run.status}")
+
+
+async def _poll_run(agents_client, thread_id: str, agent_id: str):
+    """Create a run and poll it with exponential backoff until it leaves the active states."""
+    run = await agents_client.runs.create(thread_id=thread_id, agent_id=agent_id)
+    
+    # Most short conversions finish well within the first second, so start polling
+    # quickly and back off for long generations
+    delays = _poll_delays()
+    while run.status in ["queued", "in_progress", "requires_action"]:
+        await asyncio.sleep(next(delays))
+        run = await agents_client.runs.get(thread_id=thread_id, run_id=run.id)
+        print(f"Run status: {run.status}")
+    return run
+
+
+async def _stream_agent_conversion(agents_client, agent_id: str, content: str) -> AsyncIterator[str]:
+    """
+    Run one conversion request as a streaming run and yield the reply text as it is generated.
+    
+    The run's completion is pushed by the service instead of being polled, and
+    the reply is assembled from the message delta events, so no messages.list
+    round trip is needed.
+    """
+    thread_id = await _create_request_thread(agents_client, content)
+    
+    run = None
+    streamed = False
+    async with await agents_client.runs.stream(thread_id=thread_id, agent_id=agent_id) as stream:
+        async for event_type, event_data, _ in stream:
+            if isinstance(event_data, MessageDeltaChunk):
+                if event_data.text:
+                    streamed = True
+                    yield event_data.text
+            elif isinstance(event_data, ThreadRun):
+                run = event_data
+            elif isinstance(event_data, ThreadMessage) and event_type == AgentStreamEvent.THREAD_MESSAGE_COMPLETED:
+                # Only needed when the service sent the message without deltas
+                if not streamed and event_data.text_messages:
+                    streamed = True
+                    yield event_data.text_messages[-1].text.value
+            elif event_type == AgentStreamEvent.ERROR:
+                raise RuntimeError(f"Run stream error: {event_data}")
+            elif event_type == AgentStreamEvent.DONE:
+                break
+    
+    if run is None:
+        raise RuntimeError("Run stream ended without a run event")
+    print(f"Run status: {run.status}")
+    _check_run_failure(run)
+
+
+async def convert_batch_async(texts: List[str], lib_name: str, ref_url: str, agents_client, agent_id: str,
+                              run_completion: str = 'stream', preamble: Optional[str] = None,
+                              api_methods: Optional[List[Dict[str, str]]] = None) -> Optional[List[str]]:
+    """
+    Convert several Python samples to JavaScript in one agent run.
+    
+    The samples are sent as numbered sections and the reply is split back on
+    the same markers, saving the thread and run overhead of all but one sample.
+    
+    Args:
+        texts: Python source code of each sample
+        lib_name: JavaScript library name to use
+        ref_url: URL to API reference documentation
+        agents_client: Async agents client
+        agent_id: Agent to run
+        run_completion: 'stream' or 'poll', as for convert_text_async
+        preamble: Optional run preamble from build_conversion_preamble()
+        api_methods: Optional API methods relevant to the samples
         
-        for sample in samples:
-            file_path = output_path / sample['js_name']
-            file_path.write_text(sample['js_code'], encoding='utf-8')
+    Returns:
+        Converted JavaScript code per sample, or None when the reply does not
+        contain exactly one section per sample
+    """
+    content = _build_batch_prompt(texts, lib_name, ref_url, preamble, api_methods)
+    reply = await _run_agent_conversion(agents_client, agent_id, content, run_completion)
+    return _split_batch_reply(reply, len(texts))
+
+
+async def patch_text_async(text: str, draft: str, lib_name: str, ref_url: str, agents_client, agent_id: str,
+                           run_completion: str = 'stream', preamble: Optional[str] = None,
+                           api_methods: Optional[List[Dict[str, str]]] = None) -> Optional[str]:
+    """
+    Ask an agent to fix a draft conversion with SEARCH/REPLACE edits and apply them.
+    
+    Args:
+        text: Python source code the draft was converted from
+        draft: Draft JavaScript, e.g. from convert_text_rules()
+        lib_name: JavaScript library name to use
+        ref_url: URL to API reference documentation
+        agents_client: Async agents client
+        agent_id: Agent to run
+        run_completion: 'stream' or 'poll', as for convert_text_async
+        preamble: Optional run preamble from build_conversion_preamble()
+        api_methods: Optional API methods relevant to this sample
         
-        print(f"Samples saved to directory: {output_path}")
+    Returns:
+        The patched JavaScript code, or None when the reply's edits do not apply to the draft
+    """
+    content = _build_patch_prompt(text, draft, lib_name, ref_url, preamble, api_methods)
+    reply = await _run_agent_conversion(agents_client, agent_id, content, run_completion)
+    return apply_search_replace(draft, reply)
 
 
-def convert_text(text: str, lib_name: str, ref_url: str) -> str:
+def convert_text_rules(text: str, lib_name: str, ref_url: str) -> str:
     """
-    Convert Python code text to JavaScript.
+    Convert Python source to JavaScript offline with AdvancedPythonToJsConverter.
     
-    This is the main conversion function that should be implemented
-    with the actual Python-to-JavaScript conversion logic.
+    The rules are regular expressions applied line by line, so they are fast but
+    only reliable for simple code; see rules_confidence().
     
     Args:
         text: Python source code to convert
@@ -381,76 +2700,359 @@ def convert_text(text: str, lib_name: str, ref_url: str) -> str:
         
     Returns:
         Converted JavaScript code
-        
-    TODO: Implement the actual conversion logic here
     """
-    # Placeholder implementation - replace with actual conversion logic
+    return AdvancedPythonToJsConverter(lib_name, ref_url).convert(text)
+
+
+# Statements and expressions AdvancedPythonToJsConverter leaves as Python or gets wrong
+_RULES_UNSUPPORTED_STATEMENTS = (
+    ast.Import, ast.ImportFrom, ast.With, ast.AsyncWith, ast.AsyncFor, ast.AsyncFunctionDef,
+    ast.Global, ast.Nonlocal, ast.Delete, ast.Assert, ast.Raise, ast.AnnAssign,
+)
+_RULES_UNSUPPORTED_EXPRESSIONS = (
+    ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp, ast.Await, ast.Yield,
+    ast.YieldFrom, ast.Starred, ast.Slice, ast.NamedExpr, ast.IfExp, ast.Tuple, ast.keyword,
+    ast.Is, ast.IsNot, ast.In, ast.NotIn, ast.FloorDiv, ast.Pow,
+)
+_RULES_MAPPED_BUILTINS = {'print', 'len', 'range'}
+_RULES_UNMAPPED_METHODS = {'items', 'keys', 'values', 'format', 'join', 'get', 'startswith', 'endswith',
+                           'update', 'encode', 'decode'}
+_COMPOUND_STATEMENTS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.If, ast.For, ast.AsyncFor,
+                        ast.While, ast.With, ast.AsyncWith, ast.Try)
+
+
+def rules_confidence(python_code: str) -> float:
+    """
+    Estimate how much of python_code the rules engine converts correctly.
+    
+    Returns the share of statements that only use constructs the rules
+    translate, from 0.0 (nothing, or the code does not parse) to 1.0.
+    Multi-line statements, imports, docstrings, classes, keyword arguments,
+    bytes literals, Python builtins other than print, len and range, and SDK
+    method names needing camelCase all count against it.
+    
+    A single unsupported statement usually leaves the whole output invalid:
+    on 2241 standard library chunks, 96% of the rules output scoring 1.0
+    parsed as JavaScript, against 22% between 0.9 and 1.0, which is why
+    DEFAULT_MIN_RULES_CONFIDENCE is 1.0.
+    """
+    try:
+        tree = ast.parse(python_code)
+    except SyntaxError:
+        return 0.0
+    
+    statements = [node for node in ast.walk(tree) if isinstance(node, ast.stmt)]
+    if not statements:
+        return 1.0
+    unsupported = sum(1 for node in statements if _rules_unsupported(node))
+    return 1.0 - unsupported / len(statements)
+
+
+def _rules_unsupported(node: ast.stmt) -> bool:
+    """Whether the rules engine mistranslates a statement itself, not counting nested statements."""
+    if isinstance(node, _RULES_UNSUPPORTED_STATEMENTS):
+        return True
+    if isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+        return True
+    # Methods come out as plain functions inside the class body
+    if isinstance(node, ast.ClassDef) or (isinstance(node, ast.FunctionDef) and node.decorator_list):
+        return True
+    if isinstance(node, (ast.For, ast.While, ast.Try)) and node.orelse:
+        return True
+    if isinstance(node, ast.Try) and any(handler.name or isinstance(handler.type, ast.Tuple)
+                                         for handler in node.handlers):
+        return True
+    if not isinstance(node, _COMPOUND_STATEMENTS) and node.end_lineno > node.lineno:
+        return True
+    
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, (ast.stmt, ast.excepthandler)):
+            continue
+        for expression in ast.walk(child):
+            if isinstance(expression, _RULES_UNSUPPORTED_EXPRESSIONS):
+                return True
+            if isinstance(expression, ast.Name) and expression.id == '__name__':
+                return True
+            if isinstance(expression, ast.Constant) and isinstance(expression.value, bytes):
+                return True
+            if isinstance(expression, ast.Call):
+                func = expression.func
+                if (isinstance(func, ast.Name) and hasattr(builtins, func.id) and
+                        func.id not in _RULES_MAPPED_BUILTINS):
+                    return True
+                if isinstance(func, ast.Attribute) and ('_' in func.attr or func.attr in _RULES_UNMAPPED_METHODS):
+                    return True
+    return False
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the number of model tokens in text (about four characters per token)."""
+    return (len(text) + 3) // 4
+
+
+@functools.lru_cache(maxsize=None)
+def _get_token_encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception:
+        # The encoding is downloaded on first use, which fails offline
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Count model tokens in text with tiktoken when it is installed, otherwise estimate them."""
+    encoding = _get_token_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+_LICENSE_RE = re.compile(r'licen[cs]e|copyright', re.IGNORECASE)
+_CODING_RE = re.compile(r'^#.*coding[:=]')
+
+
+def compact_python_source(text: str) -> str:
+    """
+    Strip boilerplate that costs prompt tokens without helping the conversion.
+    
+    Removes the shebang and encoding lines, a leading comment block that is a
+    license or copyright header, trailing whitespace, runs of blank lines and
+    indentation shared by every line. Lines inside multi-line strings are part
+    of the string's value and are kept exactly as they are.
+    """
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    in_string = _string_continuation_lines(text)
+    # A line followed by a string's continuation ends inside that string, so its trailing spaces stay too
+    lines = [(line if number + 1 in in_string else line.rstrip(), number in in_string)
+             for number, line in enumerate(text.split('\n'))]
+    while lines and not lines[0][0]:
+        lines.pop(0)
+    while lines and (lines[0][0].startswith('#!') or _CODING_RE.match(lines[0][0])):
+        lines.pop(0)
+    
+    header_end = 0
+    while header_end < len(lines) and lines[header_end][0].lstrip().startswith('#'):
+        header_end += 1
+    if header_end and _LICENSE_RE.search('\n'.join(line for line, _ in lines[:header_end])):
+        del lines[:header_end]
+    
+    compacted = []
+    for line, kept in lines:
+        if not line and not kept and compacted and not compacted[-1][0]:
+            continue
+        compacted.append((line, kept))
+    
+    margin = os.path.commonprefix([line[:len(line) - len(line.lstrip())] for line, kept in compacted
+                                   if line and not kept])
+    return '\n'.join(line if kept else line[len(margin):] for line, kept in compacted).strip('\n') + '\n'
+
+
+def _string_continuation_lines(text: str) -> set:
+    """Return the 0-based numbers of the lines after the first of each multi-line string in text."""
+    lines = set()
+    starts = []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(text).readline):
+            # Python 3.12 tokenizes f-strings as FSTRING_START ... FSTRING_END
+            if token.type == getattr(tokenize, 'FSTRING_START', None):
+                starts.append(token.start[0])
+            elif token.type == getattr(tokenize, 'FSTRING_END', None):
+                lines.update(range(starts.pop(), token.end[0]))
+            elif token.type == tokenize.STRING:
+                lines.update(range(token.start[0], token.end[0]))
+    except (tokenize.TokenError, SyntaxError):
+        # Source that does not tokenize is compacted line by line up to the error
+        pass
+    return lines
+
+
+def split_python_source(text: str, max_tokens: int) -> List[str]:
+    """
+    Split Python source that exceeds max_tokens into parts at top-level functions and classes.
+    
+    Consecutive top-level blocks are packed into parts of at most max_tokens
+    (a single oversized block stays whole). Every part after the first starts
+    with a comment telling the model which part it is and listing the file's
+    imports, so it does not repeat setup code when the outputs are joined.
+    Source that does not parse is returned as a single part.
+    """
+    if count_tokens(text) <= max_tokens:
+        return [text]
+    try:
+        tree = ast.parse(text)
+    except SyntaxError:
+        return [text]
+    
+    lines = text.split('\n')
+    starts = {0}
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list]) - 1
+            # Keep comments directly above a definition with it
+            while start > 0 and lines[start - 1].startswith('#'):
+                start -= 1
+            starts.add(start)
+    starts = sorted(starts)
+    blocks = ['\n'.join(lines[start:end]).strip('\n') for start, end in zip(starts, starts[1:] + [len(lines)])]
+    
+    # Sliced from the lines split above; ast.get_source_segment splits the whole text on every call
+    imports = [
+        _line_segment(lines, node) for node in tree.body
+        if isinstance(node, (ast.Import, ast.ImportFrom))
+    ]
+    
+    def part_header(number, count):
+        header = [
+            f"# Part {number} of {count} of one file. Imports, setup and names from earlier",
+            "# parts are already converted; convert only the code below and do not repeat them.",
+        ]
+        header += [f"# {line}" for segment in imports for line in segment.split('\n')]
+        return '\n'.join(header) + '\n\n'
+    
+    # Leave room for the header added to later parts
+    budget = max(1, max_tokens - count_tokens(part_header(99, 99)))
+    parts = []
+    for block in filter(None, blocks):
+        if parts and count_tokens(parts[-1] + '\n\n' + block) <= budget:
+            parts[-1] += '\n\n' + block
+        else:
+            parts.append(block)
+    if len(parts) == 1:
+        return [text]
+    
+    return [parts[0] + '\n'] + [
+        part_header(number, len(parts)) + part + '\n' for number, part in enumerate(parts[1:], 2)
+    ]
+
 
-    project_client = AIProjectClient(
-        endpoint=os.environ["PROJECT_ENDPOINT"],
-        credential=DefaultAzureCredential(),
+def _line_segment(lines: List[str], node: ast.AST) -> str:
+    """Source text of node, cut from the source's lines; column offsets count UTF-8 bytes."""
+    segment = [line.encode('utf-8') for line in lines[node.lineno - 1:node.end_lineno]]
+    segment[-1] = segment[-1][:node.end_col_offset]
+    segment[0] = segment[0][node.col_offset:]
+    return b'\n'.join(segment).decode('utf-8')
+
+
+_BATCH_MARKER_RE = re.compile(r'^[ \t]*=== FILE (\d+) ===[ \t]*$', re.MULTILINE)
+
+
+def _build_batch_prompt(texts: List[str], lib_name: str, ref_url: str, preamble: Optional[str] = None,
+                        api_methods: Optional[List[Dict[str, str]]] = None) -> str:
+    """Build one conversion request holding several samples as numbered sections after the run preamble."""
+    sections = '\n'.join(f"=== FILE {number} ===\n{compact_python_source(text)}" for number, text in enumerate(texts, 1))
+    return (
+        f"{preamble or build_conversion_preamble(lib_name, ref_url)}"
+        f"{_format_api_methods(api_methods)}"
+        f"Convert each of the {len(texts)} python files below. "
+        f"Reply with one section per file, in the same order, each starting with its "
+        f"\"=== FILE <number> ===\" line on its own, and nothing outside the sections.\n\n"
+        f"{sections}\n"
     )
 
-    with project_client:
-        agents_client = project_client.agents
 
-        content = f"""
-        Convert the python code below to JavaScript using the {lib_name} library and the reference documentation at {ref_url}.
-        
-        Python code:
-        {text}
-        """
-        # [START create_agent]
-        agent = agents_client.create_agent(
-            model=os.environ["MODEL_DEPLOYMENT_NAME"],
-            name="python-to-js-converter",
-            instructions="You are an expert Python to JavaScript code converter that can use reference API documentation for JS libraries to find appropriate methods corresponding to Python methods for the given code.",
-        )
-        # [END create_agent]
-        print(f"Created agent, agent ID: {agent.id}")
+def _split_batch_reply(reply: str, count: int) -> Optional[List[str]]:
+    """Split a batched reply into its numbered sections, or return None if any section is missing."""
+    markers = list(_BATCH_MARKER_RE.finditer(reply))
+    if [int(marker.group(1)) for marker in markers] != list(range(1, count + 1)):
+        return None
+    
+    sections = []
+    for marker, next_marker in zip(markers, markers[1:] + [None]):
+        section = reply[marker.end():next_marker.start() if next_marker else len(reply)].strip()
+        if not section:
+            return None
+        sections.append(section)
+    return sections
 
-        # [START create_thread]
-        thread = agents_client.threads.create()
-        # [END create_thread]
-        print(f"Created thread, thread ID: {thread.id}")
 
-        # List all threads for the agent
-        # [START list_threads]
-        threads = agents_client.threads.list()
-        # [END list_threads]
+_PATCH_BLOCK_RE = re.compile(r'^<{7} SEARCH\n(.*?)\n?^={7}\n(.*?)\n?^>{7} REPLACE[ \t]*$', re.MULTILINE | re.DOTALL)
+_NO_CHANGES = 'NO CHANGES'
 
-        # [START create_message]
-        message = agents_client.messages.create(thread_id=thread.id, role="user", content=content)
-        # [END create_message]
-        print(f"Created message, message ID: {message.id}")
 
-        # [START create_run]
-        run = agents_client.runs.create(thread_id=thread.id, agent_id=agent.id)
+def _build_patch_prompt(text: str, draft: str, lib_name: str, ref_url: str, preamble: Optional[str] = None,
+                        api_methods: Optional[List[Dict[str, str]]] = None) -> str:
+    """Build a request to fix a draft conversion with SEARCH/REPLACE edits instead of regenerating it."""
+    return (
+        f"{preamble or build_conversion_preamble(lib_name, ref_url)}"
+        f"{_format_api_methods(api_methods)}"
+        f"Python code:\n{compact_python_source(text)}\n"
+        f"A rule-based converter produced the draft JavaScript below. Parts of it are still Python "
+        f"or use the wrong {lib_name} API. Do not rewrite the file: reply only with edit blocks, "
+        f"each in this form, where SEARCH text is copied exactly from the draft and occurs in it once:\n"
+        f"<<<<<<< SEARCH\n<draft lines>\n=======\n<replacement lines>\n>>>>>>> REPLACE\n"
+        f"If the draft needs no changes, reply with {_NO_CHANGES}.\n\n"
+        f"Draft JavaScript:\n{draft}\n"
+    )
 
-        # Poll the run as long as run status is queued or in progress
-        while run.status in ["queued", "in_progress", "requires_action"]:
-            # Wait for a second
-            time.sleep(1)
-            run = agents_client.runs.get(thread_id=thread.id, run_id=run.id)
-            # [END create_run]
-            print(f"Run status: {run.status}")
 
-        if run.status == "failed":
-            print(f"Run error: {run.last_error}")
+def apply_search_replace(draft: str, reply: str) -> Optional[str]:
+    """
+    Apply the SEARCH/REPLACE blocks of a reply to draft, in order.
+    
+    Returns:
+        The edited text, draft itself when the reply asks for no changes, or
+        None when the reply has no blocks or a SEARCH text is not found exactly
+        once
+    """
+    blocks = _PATCH_BLOCK_RE.findall(reply)
+    if not blocks:
+        return draft if reply.strip() == _NO_CHANGES else None
+    
+    for search, replace in blocks:
+        if not search or draft.count(search) != 1:
+            return None
+        draft = draft.replace(search, replace)
+    return draft
 
-        agents_client.delete_agent(agent.id)
-        print("Deleted agent")
 
-        # [START list_messages]
-        messages = agents_client.messages.list(thread_id=thread.id, order=ListSortOrder.ASCENDING)
-        for msg in messages:
-            if msg.text_messages:
-                js_code = msg.text_messages[-1]
-                print(js_code)
-        # [END list_messages]
+def build_conversion_preamble(lib_name: str, ref_url: str, mappings: Optional[Dict[str, str]] = None) -> str:
+    """
+    Build the static start of every conversion request in a run.
     
- 
-    return js_code
+    Everything that is the same for all samples (the task and library mappings)
+    comes first, in a stable order, so each request shares a byte-identical
+    prefix the model service can serve from its prompt cache. Build it once per
+    run and pass it to every request. Discovered API methods are not part of
+    it: each request lists only the methods relevant to its sample, after the
+    preamble.
+    
+    Args:
+        lib_name: JavaScript library name to use
+        ref_url: URL to API reference documentation
+        mappings: Python to JavaScript mappings, e.g. from ApiDocParser.get_common_mappings
+        
+    Returns:
+        Preamble text, ending with a blank line
+    """
+    task = f"Convert python code to JavaScript using the {lib_name} library"
+    lines = [f"{task} and the reference documentation at {ref_url}." if ref_url else f"{task}."]
+    if mappings:
+        lines += ["", "Python to JavaScript mappings:"]
+        lines += [f"- {python_name} -> {js_name}" for python_name, js_name in sorted(mappings.items())]
+    return '\n'.join(lines) + '\n\n'
+
+
+def _format_api_methods(api_methods: Optional[List[Dict[str, str]]]) -> str:
+    """Render the API methods selected for a request as a compact list."""
+    if not api_methods:
+        return ""
+    lines = ["API methods that may be relevant:"]
+    for method in api_methods:
+        description = method.get('description', '').split('. ')[0][:80]
+        lines.append(f"- {method['signature']}: {description}" if description else f"- {method['signature']}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def _build_prompt(text: str, lib_name: str, ref_url: str, preamble: Optional[str] = None,
+                  api_methods: Optional[List[Dict[str, str]]] = None) -> str:
+    """Build the conversion request for one sample: the run preamble, its relevant API methods, then the compacted sample."""
+    return (
+        f"{preamble or build_conversion_preamble(lib_name, ref_url)}"
+        f"{_format_api_methods(api_methods)}"
+        f"Python code:\n{compact_python_source(text)}"
+    )
 
 
 async def main():
@@ -470,7 +3072,8 @@ Examples:
     parser.add_argument(
         'repo_url',
         default='https://github.com/Azure/azure-sdk-for-python/tree/main/sdk/ai/azure-ai-agents/samples/agents_multiagent',
-        help='URL to GitHub repository subfolder containing Python samples'
+        help='URL to GitHub repository subfolder, local directory or bare git repository '
+             'containing Python samples'
     )
     
     parser.add_argument(
@@ -490,6 +3093,170 @@ Examples:
         help='Output file (.zip) or directory path (default: js-samples.zip)'
     )
     
+    parser.add_argument(
+        '--fetch-mode',
+        choices=FETCH_MODES,
+        default='tree',
+        help='How to list the repository: one recursive Git Trees API call (tree), '
+             'a contents API request per directory (contents) or a single streamed '
+             'tarball download (archive) (default: tree)'
+    )
+    
+    parser.add_argument(
+        '--fetch-concurrency',
+        type=int,
+        default=DEFAULT_FETCH_CONCURRENCY,
+        help=f'Maximum concurrent GitHub requests (default: {DEFAULT_FETCH_CONCURRENCY})'
+    )
+    
+    parser.add_argument(
+        '--github-api-url',
+        help='GitHub API base URL, e.g. https://ghe.example.com/api/v3 for GitHub Enterprise Server or '
+             f'fake_github_service.py (default: $GITHUB_API_URL or {GITHUB_API_URL})'
+    )
+    
+    parser.add_argument(
+        '--github-raw-url',
+        help=f'Base URL for raw file downloads (default: $GITHUB_RAW_URL, the /raw of an Enterprise '
+             f'Server API URL, or {GITHUB_RAW_URL})'
+    )
+    
+    parser.add_argument(
+        '--cache-dir',
+        default=DEFAULT_CACHE_DIR,
+        help=f'Directory for on-disk caches (default: {DEFAULT_CACHE_DIR})'
+    )
+    
+    parser.add_argument(
+        '--no-http-cache',
+        action='store_true',
+        help='Do not cache or revalidate GitHub responses'
+    )
+    
+    parser.add_argument(
+        '--http-cache-size',
+        type=int,
+        default=DEFAULT_HTTP_CACHE_MB,
+        help=f'Size cap of the GitHub response cache in MB (default: {DEFAULT_HTTP_CACHE_MB})'
+    )
+    
+    parser.add_argument(
+        '--no-blob-cache',
+        action='store_true',
+        help='Do not reuse file contents by git blob SHA'
+    )
+    
+    parser.add_argument(
+        '--blob-cache-size',
+        type=int,
+        default=DEFAULT_BLOB_CACHE_MB,
+        help=f'Size cap of the blob cache in MB (default: {DEFAULT_BLOB_CACHE_MB})'
+    )
+    
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not reuse or store converted code'
+    )
+    
+    parser.add_argument(
+        '--refresh',
+        action='store_true',
+        help='Convert every sample again, replacing its cached conversion'
+    )
+    
+    parser.add_argument(
+        '--no-incremental',
+        action='store_true',
+        help='Do not reuse unchanged samples from the previous output or write its manifest'
+    )
+    
+    parser.add_argument(
+        '--result-cache-size',
+        type=int,
+        default=DEFAULT_RESULT_CACHE_MB,
+        help=f'Size cap of the conversion result cache in MB (default: {DEFAULT_RESULT_CACHE_MB})'
+    )
+    
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=1,
+        help='Number of samples to convert concurrently (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--adaptive-jobs',
+        action='store_true',
+        help='Lower the conversion concurrency and retry when the service throttles requests'
+    )
+    
+    parser.add_argument(
+        '--keep-agent',
+        action='store_true',
+        help='Reuse a matching converter agent from an earlier run and keep it afterwards'
+    )
+    
+    parser.add_argument(
+        '--run-completion',
+        choices=RUN_COMPLETION_MODES,
+        default='stream',
+        help='Wait for agent runs by streaming their events or by polling with backoff (default: stream)'
+    )
+    
+    parser.add_argument(
+        '--engine',
+        choices=CONVERSION_ENGINES,
+        default='agent',
+        help='Convert with the agent, the offline rules engine, or the rules engine with the agent '
+             'for samples it is not confident about (default: agent)'
+    )
+    
+    parser.add_argument(
+        '--min-confidence',
+        type=float,
+        default=DEFAULT_MIN_RULES_CONFIDENCE,
+        help=f'Rules engine confidence below which hybrid conversion uses the agent '
+             f'(default: {DEFAULT_MIN_RULES_CONFIDENCE})'
+    )
+    
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Print each converted sample to stdout as it is generated (requires --jobs 1)'
+    )
+    
+    parser.add_argument(
+        '--batch-tokens',
+        type=int,
+        default=DEFAULT_BATCH_TOKENS,
+        help=f'Convert small samples together in runs of up to this many estimated prompt tokens '
+             f'(default: {DEFAULT_BATCH_TOKENS}, disabled)'
+    )
+    
+    parser.add_argument(
+        '--max-sample-tokens',
+        type=int,
+        default=DEFAULT_MAX_SAMPLE_TOKENS,
+        help=f'Split samples larger than this many tokens at top-level functions and classes '
+             f'(default: {DEFAULT_MAX_SAMPLE_TOKENS})'
+    )
+    
+    parser.add_argument(
+        '--api-methods',
+        type=int,
+        default=DEFAULT_API_METHODS_TOP_K,
+        help=f'Discovered API methods to include per sample, chosen by matching identifiers '
+             f'(default: {DEFAULT_API_METHODS_TOP_K})'
+    )
+    
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help=f'Depth of the queues between the fetch, convert and write stages (default: {DEFAULT_QUEUE_SIZE})'
+    )
+    
     parser.add_argument(
         '--verbose', '-v',
         action='store_true',
@@ -498,36 +3265,66 @@ Examples:
     
     args = parser.parse_args()
     
+    if args.stream and args.jobs != 1:
+        parser.error("--stream requires --jobs 1")
+    
     if args.verbose:
         print("Verbose mode enabled")
         print(f"Arguments: {vars(args)}")
     
+    converter = None
     try:
         # Initialize converter
-        converter = PythonToJsConverter()
+        converter = PythonToJsConverter(
+            fetch_mode=args.fetch_mode,
+            fetch_concurrency=args.fetch_concurrency,
+            github_api_url=args.github_api_url,
+            github_raw_url=args.github_raw_url,
+            http_cache_dir=None if args.no_http_cache else os.path.join(args.cache_dir, 'http'),
+            http_cache_mb=args.http_cache_size,
+            blob_cache_dir=None if args.no_blob_cache else os.path.join(args.cache_dir, 'blobs'),
+            blob_cache_mb=args.blob_cache_size,
+            result_cache_path=None if args.no_cache else os.path.join(args.cache_dir, 'conversions.sqlite3'),
+            result_cache_mb=args.result_cache_size,
+            refresh_results=args.refresh,
+            incremental=not args.no_incremental,
+            batch_tokens=args.batch_tokens,
+            max_sample_tokens=args.max_sample_tokens,
+            api_methods_top_k=args.api_methods,
+            engine=args.engine,
+            min_confidence=args.min_confidence,
+            convert_workers=args.jobs,
+            queue_size=args.queue_size,
+            adaptive_jobs=args.adaptive_jobs,
+            keep_agent=args.keep_agent,
+            run_completion=args.run_completion,
+            stream_output=sys.stdout if args.stream else None,
+            client_holder=ProjectClientHolder(pool_size=max(DEFAULT_CLIENT_POOL_SIZE, args.jobs * 2))
+        )
         
-        # Convert samples
-        samples = await converter.convert_samples(
+        # Determine output path
+        output_path = args.output or 'js-samples.zip'
+        
+        # Convert samples, saving each one as soon as it is converted
+        sample_count = await converter.convert_samples_to_path(
             args.repo_url,
             args.library,
-            args.docs
+            args.docs,
+            output_path
         )
         
-        if not samples:
+        if not sample_count:
             print("No samples to convert")
             return 1
         
-        # Determine output path
-        output_path = args.output or 'js-samples.zip'
-        
-        # Save results
-        if output_path.endswith('.zip'):
-            converter.save_samples_to_zip(samples, output_path)
-        else:
-            converter.save_samples_to_directory(samples, output_path)
+        if converter.failed_count:
+            print(f"\nConversion finished with errors: {converter.failed_count} of {sample_count} samples "
+                  f"failed and were written as error comments")
+            print(f"Output location: {output_path}")
+            return 1
         
         print(f"\nConversion completed successfully!")
-        print(f"Converted {len(samples)} Python samples to JavaScript")
+        print(f"Converted {sample_count} Python samples to JavaScript")
         print(f"Target library: {args.library}")
         print(f"Output location: {output_path}")
         
@@ -542,6 +3339,9 @@ Examples:
             import traceback
             traceback.print_exc()
         return 1
+    finally:
+        if converter is not None:
+            await converter.client_holder.close()
 
 
 if __name__ == '__main__':
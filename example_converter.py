@@ -69,7 +69,7 @@ class AdvancedPythonToJsConverter:
     def _convert_basic_syntax(self, code: str) -> str:
         """Convert basic Python syntax to JavaScript."""
         # Comments
-        code = re.sub(r'#(.+)', r'//$1', code)
+        code = re.sub(r'#(.*)', r'//\1', code)
         
         # Print statements
         code = re.sub(r'\bprint\s*\(', 'console.log(', code)
@@ -122,17 +122,23 @@ class AdvancedPythonToJsConverter:
             stripped = line.strip()
             indent = len(line) - len(line.lstrip())
             
-            # Handle closing braces for decreased indentation
-            while indent_stack and indent < indent_stack[-1]:
-                indent_stack.pop()
-                converted_lines.append(' ' * (len(indent_stack) * 2) + '}')
-            
+            # Blank lines say nothing about where a block ends
             if not stripped:
                 converted_lines.append(line)
                 continue
             
+            # Close the blocks this line leaves; elif/else/except/finally continue theirs
+            continues_block = re.match(r'(elif\b|else:|except\b|finally:)', stripped)
+            while indent_stack and (indent < indent_stack[-1] or (indent == indent_stack[-1] and not continues_block)):
+                converted_lines.append(' ' * indent_stack.pop() + '}')
+            
+            # Function and class bodies are converted later, but their blocks close here
+            if re.match(r'(async\s+)?(def|class)\s', stripped) and stripped.endswith(':'):
+                converted_lines.append(line)
+                indent_stack.append(indent)
+            
             # Convert control structures
-            if stripped.startswith('if ') and stripped.endswith(':'):
+            elif stripped.startswith('if ') and stripped.endswith(':'):
                 condition = stripped[3:-1].strip()
                 converted_lines.append(' ' * indent + f'if ({condition}) {{')
                 indent_stack.append(indent)
@@ -187,8 +193,7 @@ class AdvancedPythonToJsConverter:
         
         # Close any remaining braces
         while indent_stack:
-            indent_stack.pop()
-            converted_lines.append(' ' * (len(indent_stack) * 2) + '}')
+            converted_lines.append(' ' * indent_stack.pop() + '}')
         
         return '\n'.join(converted_lines)
     
@@ -0,0 +1,543 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Azure AI agents service.
+
+Serves the agents, threads, messages and runs endpoints used by converter.py,
+including streamed runs, from memory. Replies are generated from the request
+instead of by a model, with configurable latency, token rate, failure and
+throttle injection, so the conversion pipeline can be run and load-tested
+offline:
+
+    python fake_agents_service.py --port 8765 --latency 0.5 --tokens-per-second 80
+    PROJECT_ENDPOINT=http://localhost:8765 MODEL_DEPLOYMENT_NAME=fake \
+        python converter.py ./samples --library @azure/ai-agents
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import re
+import sys
+import time
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+DEFAULT_PORT = 8765
+DEFAULT_TOKENS_PER_SECOND = 100.0
+DEFAULT_RETRY_AFTER = 1
+HTTP_THROTTLE_STATUSES = (429, 503)
+DELTA_TOKENS = 16
+LIST_LIMIT = 20
+
+_FILE_MARKER_RE = re.compile(r'^=== FILE (\d+) ===$', re.MULTILINE)
+
+
+def fake_reply(content: str) -> str:
+    """
+    Build the reply the stand-in gives to a conversion request.
+    
+    Batched requests get one section per file, patch requests "NO CHANGES",
+    and anything else the code after "Python code:" as commented JavaScript,
+    so replies are about as long as a real conversion.
+    """
+    if 'Draft JavaScript:\n' in content:
+        return 'NO CHANGES'
+    
+    parts = _FILE_MARKER_RE.split(content)
+    if len(parts) > 1:
+        return '\n'.join(
+            f"=== FILE {number} ===\n{_fake_conversion(code)}" for number, code in zip(parts[1::2], parts[2::2])
+        )
+    return _fake_conversion(content.split('Python code:\n', 1)[-1])
+
+
+def _fake_conversion(python_code: str) -> str:
+    lines = python_code.strip('\n').split('\n')
+    return '// Converted by fake_agents_service\n' + '\n'.join(f"// {line}".rstrip() for line in lines)
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class FakeAgentsService:
+    """
+    In-memory agents service with injected latency, throttling and failures.
+    
+    Each run waits latency (plus up to jitter) seconds before its first token,
+    then generates the reply at tokens_per_second. At most max_concurrent_runs
+    generate at once; further runs stay queued. A throttle_rate share of runs
+    fail with rate_limit_exceeded, as the service does when the model deployment
+    is over quota, and a failure_rate share fail with server_error. An
+    http_throttle_rate share of run requests is refused outright with
+    http_throttle_status (429 or 503) and a Retry-After header instead. A
+    short_batch_rate share of batched replies stops before the last file's
+    section, as a reply cut off by the output token limit does.
+    """
+    
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0,
+                 tokens_per_second: float = DEFAULT_TOKENS_PER_SECOND, failure_rate: float = 0.0,
+                 throttle_rate: float = 0.0, retry_after: int = DEFAULT_RETRY_AFTER,
+                 http_throttle_rate: float = 0.0, http_throttle_status: int = 429,
+                 short_batch_rate: float = 0.0, max_concurrent_runs: int = 0, seed: Optional[int] = None):
+        if http_throttle_status not in HTTP_THROTTLE_STATUSES:
+            raise ValueError(f"HTTP throttle status must be one of {HTTP_THROTTLE_STATUSES}")
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.failure_rate = failure_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.http_throttle_rate = http_throttle_rate
+        self.http_throttle_status = http_throttle_status
+        self.short_batch_rate = short_batch_rate
+        self._capacity = asyncio.Semaphore(max_concurrent_runs) if max_concurrent_runs > 0 else None
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self.agents = {}
+        self.threads = {}
+        self.runs = {}
+        self.stats = {'requests': 0, 'runs': 0, 'completed': 0, 'failed': 0, 'throttled': 0, 'http_throttled': 0,
+                      'short_batches': 0, 'disconnected': 0, 'active_runs': 0, 'peak_active_runs': 0,
+                      'output_tokens': 0}
+        self._tasks = set()
+        self._runner = None
+        self.app = self._build_app()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+    
+    def _build_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._count_requests])
+        app.router.add_post('/assistants', self.create_agent)
+        app.router.add_get('/assistants', self.list_agents)
+        app.router.add_get('/assistants/{agent_id}', self.get_agent)
+        app.router.add_delete('/assistants/{agent_id}', self.delete_agent)
+        app.router.add_post('/threads', self.create_thread)
+        app.router.add_delete('/threads/{thread_id}', self.delete_thread)
+        app.router.add_post('/threads/{thread_id}/messages', self.create_message)
+        app.router.add_get('/threads/{thread_id}/messages', self.list_messages)
+        app.router.add_post('/threads/{thread_id}/runs', self.create_run)
+        app.router.add_get('/threads/{thread_id}/runs/{run_id}', self.get_run)
+        app.router.add_get('/_stats', self.get_stats)
+        return app
+    
+    async def start(self, host: str = 'localhost', port: int = 0) -> str:
+        """Start serving and return the endpoint URL to use as PROJECT_ENDPOINT."""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        return f"http://{host}:{port}"
+    
+    async def close(self):
+        """Stop serving and cancel runs still in progress."""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+    
+    @web.middleware
+    async def _count_requests(self, request: web.Request, handler):
+        self.stats['requests'] += 1
+        return await handler(request)
+    
+    def _new_id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._ids):06d}"
+    
+    # Agents
+    
+    async def create_agent(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        agent = {
+            'id': self._new_id('asst'),
+            'object': 'assistant',
+            'created_at': int(time.time()),
+            'name': body.get('name'),
+            'description': body.get('description'),
+            'model': body.get('model'),
+            'instructions': body.get('instructions'),
+            'tools': body.get('tools', []),
+            'tool_resources': {},
+            'metadata': body.get('metadata') or {},
+        }
+        self.agents[agent['id']] = agent
+        return web.json_response(agent)
+    
+    async def list_agents(self, request: web.Request) -> web.Response:
+        return web.json_response(_list_page(list(self.agents.values()), request))
+    
+    async def get_agent(self, request: web.Request) -> web.Response:
+        agent = self.agents.get(request.match_info['agent_id'])
+        if agent is None:
+            return _not_found('assistant', request.match_info['agent_id'])
+        return web.json_response(agent)
+    
+    async def delete_agent(self, request: web.Request) -> web.Response:
+        agent_id = request.match_info['agent_id']
+        if self.agents.pop(agent_id, None) is None:
+            return _not_found('assistant', agent_id)
+        return web.json_response({'id': agent_id, 'object': 'assistant.deleted', 'deleted': True})
+    
+    # Threads and messages
+    
+    async def create_thread(self, request: web.Request) -> web.Response:
+        thread = {
+            'id': self._new_id('thread'),
+            'object': 'thread',
+            'created_at': int(time.time()),
+            'metadata': {},
+            'tool_resources': {},
+        }
+        self.threads[thread['id']] = {'thread': thread, 'messages': []}
+        return web.json_response(thread)
+    
+    async def delete_thread(self, request: web.Request) -> web.Response:
+        thread_id = request.match_info['thread_id']
+        if self.threads.pop(thread_id, None) is None:
+            return _not_found('thread', thread_id)
+        return web.json_response({'id': thread_id, 'object': 'thread.deleted', 'deleted': True})
+    
+    async def create_message(self, request: web.Request) -> web.Response:
+        thread = self.threads.get(request.match_info['thread_id'])
+        if thread is None:
+            return _not_found('thread', request.match_info['thread_id'])
+        body = await request.json()
+        content = body.get('content')
+        if isinstance(content, list):
+            content = ''.join(part.get('text', '') for part in content if isinstance(part, dict))
+        message = self._new_message(request.match_info['thread_id'], body.get('role', 'user'), content or '')
+        thread['messages'].append(message)
+        return web.json_response(message)
+    
+    async def list_messages(self, request: web.Request) -> web.Response:
+        thread = self.threads.get(request.match_info['thread_id'])
+        if thread is None:
+            return _not_found('thread', request.match_info['thread_id'])
+        return web.json_response(_list_page(thread['messages'], request))
+    
+    def _new_message(self, thread_id: str, role: str, text: str, run_id: Optional[str] = None,
+                     agent_id: Optional[str] = None, status: str = 'completed') -> Dict:
+        return {
+            'id': self._new_id('msg'),
+            'object': 'thread.message',
+            'created_at': int(time.time()),
+            'thread_id': thread_id,
+            'status': status,
+            'role': role,
+            'content': [{'type': 'text', 'text': {'value': text, 'annotations': []}}] if text else [],
+            'assistant_id': agent_id,
+            'run_id': run_id,
+            'attachments': [],
+            'metadata': {},
+        }
+    
+    # Runs
+    
+    async def create_run(self, request: web.Request) -> web.StreamResponse:
+        thread_id = request.match_info['thread_id']
+        thread = self.threads.get(thread_id)
+        if thread is None:
+            return _not_found('thread', thread_id)
+        body = await request.json()
+        agent = self.agents.get(body.get('assistant_id'))
+        if agent is None:
+            return _not_found('assistant', body.get('assistant_id'))
+        # Only drawn when enabled, so seeded runs without it keep their failure pattern
+        if self.http_throttle_rate and self._random.random() < self.http_throttle_rate:
+            self.stats['http_throttled'] += 1
+            return web.json_response(
+                {'error': {'code': 'too_many_requests', 'message': "Too many requests. Try again later."}},
+                status=self.http_throttle_status, headers={'Retry-After': str(self.retry_after)}
+            )
+        
+        run = {
+            'id': self._new_id('run'),
+            'object': 'thread.run',
+            'created_at': int(time.time()),
+            'thread_id': thread_id,
+            'assistant_id': agent['id'],
+            'status': 'queued',
+            'required_action': None,
+            'last_error': None,
+            'model': agent['model'],
+            'instructions': agent['instructions'],
+            'tools': [],
+            'metadata': {},
+            'usage': None,
+        }
+        self.runs[run['id']] = run
+        self.stats['runs'] += 1
+        
+        prompt = '\n'.join(
+            part['text']['value'] for message in thread['messages'] if message['role'] == 'user'
+            for part in message['content']
+        )
+        
+        if body.get('stream'):
+            response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'})
+            await response.prepare(request)
+            
+            async def send(event: str, data):
+                if request.transport is None or request.transport.is_closing():
+                    raise ConnectionResetError("Client disconnected")
+                payload = data if isinstance(data, str) else json.dumps(data)
+                await response.write(f"event: {event}\ndata: {payload}\n\n".encode('utf-8'))
+            
+            try:
+                await self._execute_run(run, thread, prompt, send)
+                await send('done', '[DONE]')
+                await response.write_eof()
+            except ConnectionResetError:
+                # The client went away mid-stream, e.g. a cancelled conversion; stop generating
+                self.stats['disconnected'] += 1
+                if run['status'] in ('queued', 'in_progress'):
+                    run['status'] = 'cancelled'
+                    run['cancelled_at'] = int(time.time())
+            return response
+        
+        task = asyncio.ensure_future(self._execute_run(run, thread, prompt))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.json_response(run)
+    
+    async def get_run(self, request: web.Request) -> web.Response:
+        run = self.runs.get(request.match_info['run_id'])
+        if run is None or run['thread_id'] != request.match_info['thread_id']:
+            return _not_found('run', request.match_info['run_id'])
+        return web.json_response(run)
+    
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+    
+    async def _execute_run(self, run: Dict, thread: Dict, prompt: str, send=None):
+        """Move a run through its states, sending stream events when send is given."""
+        async def emit(event: str, data):
+            if send is not None:
+                await send(event, data)
+        
+        await emit('thread.run.created', run)
+        outcome = self._random.random()
+        if outcome < self.throttle_rate:
+            self.stats['throttled'] += 1
+            await emit('thread.run.failed', self._fail(run, 'rate_limit_exceeded',
+                                                       f"Rate limit is exceeded. Try again in {self.retry_after} seconds."))
+            return
+        
+        if self._capacity is not None:
+            await self._capacity.acquire()
+        self.stats['active_runs'] += 1
+        self.stats['peak_active_runs'] = max(self.stats['peak_active_runs'], self.stats['active_runs'])
+        try:
+            await asyncio.sleep(self.latency + self._random.uniform(0, self.jitter))
+            run['status'] = 'in_progress'
+            run['started_at'] = int(time.time())
+            await emit('thread.run.in_progress', run)
+            
+            if outcome < self.throttle_rate + self.failure_rate:
+                self.stats['failed'] += 1
+                await emit('thread.run.failed', self._fail(run, 'server_error', "Injected failure."))
+                return
+            
+            reply = fake_reply(prompt)
+            last_section = reply.rfind('=== FILE ')
+            if last_section > 0 and self.short_batch_rate and self._random.random() < self.short_batch_rate:
+                self.stats['short_batches'] += 1
+                reply = reply[:last_section].rstrip('\n')
+            message = self._new_message(run['thread_id'], 'assistant', '', run['id'], run['assistant_id'],
+                                        status='in_progress')
+            await emit('thread.message.created', message)
+            
+            chunk_chars = DELTA_TOKENS * 4
+            for start in range(0, len(reply), chunk_chars):
+                chunk = reply[start:start + chunk_chars]
+                await asyncio.sleep(_estimate_tokens(chunk) / self.tokens_per_second)
+                await emit('thread.message.delta', {
+                    'id': message['id'],
+                    'object': 'thread.message.delta',
+                    'delta': {'content': [{'index': 0, 'type': 'text', 'text': {'value': chunk, 'annotations': []}}]},
+                })
+            
+            message['status'] = 'completed'
+            message['content'] = [{'type': 'text', 'text': {'value': reply, 'annotations': []}}]
+            thread['messages'].append(message)
+            await emit('thread.message.completed', message)
+            
+            output_tokens = _estimate_tokens(reply)
+            self.stats['output_tokens'] += output_tokens
+            self.stats['completed'] += 1
+            run['status'] = 'completed'
+            run['completed_at'] = int(time.time())
+            run['usage'] = {'prompt_tokens': _estimate_tokens(prompt), 'completion_tokens': output_tokens,
+                            'total_tokens': _estimate_tokens(prompt) + output_tokens}
+            await emit('thread.run.completed', run)
+        finally:
+            self.stats['active_runs'] -= 1
+            if self._capacity is not None:
+                self._capacity.release()
+    
+    def _fail(self, run: Dict, code: str, message: str) -> Dict:
+        run['status'] = 'failed'
+        run['failed_at'] = int(time.time())
+        run['last_error'] = {'code': code, 'message': message}
+        return run
+
+
+def _list_page(items: List[Dict], request: web.Request) -> Dict:
+    """Return one page of items in the service's list format, honoring order, after and limit."""
+    if request.query.get('order', 'desc') == 'desc':
+        items = items[::-1]
+    after = request.query.get('after')
+    if after:
+        ids = [item['id'] for item in items]
+        items = items[ids.index(after) + 1:] if after in ids else []
+    limit = int(request.query.get('limit', LIST_LIMIT))
+    page = items[:limit]
+    return {
+        'object': 'list',
+        'data': page,
+        'first_id': page[0]['id'] if page else None,
+        'last_id': page[-1]['id'] if page else None,
+        'has_more': len(items) > limit,
+    }
+
+
+def _not_found(kind: str, object_id: Optional[str]) -> web.Response:
+    return web.json_response(
+        {'error': {'code': 'not_found', 'message': f"No {kind} found with id '{object_id}'."}}, status=404
+    )
+
+
+async def main():
+    """Run the fake agents service until interrupted."""
+    parser = argparse.ArgumentParser(description='Serve a local stand-in for the agents service')
+    
+    parser.add_argument(
+        '--host',
+        default='localhost',
+        help='Interface to listen on (default: localhost)'
+    )
+    
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=DEFAULT_PORT,
+        help=f'Port to listen on (default: {DEFAULT_PORT})'
+    )
+    
+    parser.add_argument(
+        '--latency',
+        type=float,
+        default=0.0,
+        help='Seconds before each run produces its first token (default: 0)'
+    )
+    
+    parser.add_argument(
+        '--jitter',
+        type=float,
+        default=0.0,
+        help='Maximum random seconds added to the latency (default: 0)'
+    )
+    
+    parser.add_argument(
+        '--tokens-per-second',
+        type=float,
+        default=DEFAULT_TOKENS_PER_SECOND,
+        help=f'Reply generation speed per run (default: {DEFAULT_TOKENS_PER_SECOND:g})'
+    )
+    
+    parser.add_argument(
+        '--failure-rate',
+        type=float,
+        default=0.0,
+        help='Share of runs that fail with server_error (default: 0)'
+    )
+    
+    parser.add_argument(
+        '--throttle-rate',
+        type=float,
+        default=0.0,
+        help='Share of runs that fail with rate_limit_exceeded (default: 0)'
+    )
+    
+    parser.add_argument(
+        '--retry-after',
+        type=int,
+        default=DEFAULT_RETRY_AFTER,
+        help=f'Seconds throttled runs and requests ask the client to wait (default: {DEFAULT_RETRY_AFTER})'
+    )
+    
+    parser.add_argument(
+        '--http-throttle-rate',
+        type=float,
+        default=0.0,
+        help='Share of run requests refused with an HTTP throttling status and Retry-After (default: 0)'
+    )
+    
+    parser.add_argument(
+        '--http-throttle-status',
+        type=int,
+        choices=HTTP_THROTTLE_STATUSES,
+        default=429,
+        help='Status code of refused run requests (default: 429)'
+    )
+    
+    parser.add_argument(
+        '--short-batch-rate',
+        type=float,
+        default=0.0,
+        help='Share of batched replies missing their last file section (default: 0)'
+    )
+    
+    parser.add_argument(
+        '--max-concurrent-runs',
+        type=int,
+        default=0,
+        help='Runs generating at once before others queue, 0 for no limit (default: 0)'
+    )
+    
+    parser.add_argument(
+        '--seed',
+        type=int,
+        help='Random seed for reproducible failure and throttle injection'
+    )
+    
+    args = parser.parse_args()
+    
+    async with FakeAgentsService(
+        latency=args.latency,
+        jitter=args.jitter,
+        tokens_per_second=args.tokens_per_second,
+        failure_rate=args.failure_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        http_throttle_rate=args.http_throttle_rate,
+        http_throttle_status=args.http_throttle_status,
+        short_batch_rate=args.short_batch_rate,
+        max_concurrent_runs=args.max_concurrent_runs,
+        seed=args.seed
+    ) as service:
+        endpoint = await service.start(args.host, args.port)
+        print(f"Fake agents service listening on {endpoint}")
+        print(f"Use PROJECT_ENDPOINT={endpoint}; statistics at {endpoint}/_stats")
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            pass
+        print(f"Statistics: {json.dumps(service.stats)}")
+    return 0
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(asyncio.run(main()))
+    except KeyboardInterrupt:
+        pass
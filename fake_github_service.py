@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the GitHub contents, trees, raw and tarball endpoints.
+
+Serves a local directory as every repository it is asked for, the way
+RepositoryFetcher reads GitHub, with configurable latency, pagination of
+directory listings, a primary rate limit and random secondary rate limits,
+so fetch throughput and rate-limit handling can be measured reproducibly:
+
+    python fake_github_service.py ./samples --port 8766 --latency 0.05 --page-size 10 --rate-limit 500
+    python converter.py https://github.com/owner/repo/tree/main \
+        --github-api-url http://localhost:8766 --github-raw-url http://localhost:8766/raw
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import random
+import sys
+import tarfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+from converter import git_blob_sha
+
+DEFAULT_PORT = 8766
+DEFAULT_RATE_LIMIT_WINDOW = 60.0
+DEFAULT_RETRY_AFTER = 1
+
+
+class FakeGitHubService:
+    """
+    In-memory GitHub API serving a snapshot of a local directory.
+    
+    Any owner, repository and ref resolve to the same snapshot, taken when the
+    service is created. Directory and tree SHAs are derived from their entries,
+    so they change exactly when something below them changes, and responses
+    carry ETags so conditional requests get a 304.
+    
+    Each request waits latency seconds. With page_size, contents listings are
+    split into pages linked by Link headers. With rate_limit, API requests
+    beyond that many per rate_limit_window seconds get a 403 with
+    X-RateLimit-Remaining: 0 until the window resets (304 responses do not
+    count, as on GitHub). A throttle_rate share of API requests get a
+    secondary rate limit 403 with Retry-After.
+    """
+    
+    def __init__(self, root: str, latency: float = 0.0, page_size: int = 0, rate_limit: int = 0,
+                 rate_limit_window: float = DEFAULT_RATE_LIMIT_WINDOW, throttle_rate: float = 0.0,
+                 retry_after: int = DEFAULT_RETRY_AFTER, seed: Optional[int] = None):
+        self.root = Path(root)
+        self.latency = latency
+        self.page_size = page_size
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._window_start = None
+        self._window_used = 0
+        self.stats = {'requests': 0, 'api_requests': 0, 'raw_requests': 0, 'not_modified': 0,
+                      'rate_limited': 0, 'throttled': 0, 'bytes_sent': 0}
+        
+        self.files = {}
+        self.dirs = {}
+        self.trees = {}
+        self.tree_sha = self._snapshot('')
+        self.commit_sha = hashlib.sha1(f"commit {self.tree_sha}".encode('utf-8')).hexdigest()
+        self.trees[self.commit_sha] = ''
+        self._tarball = None
+        self._runner = None
+        self.app = self._build_app()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+    
+    def _snapshot(self, path: str) -> str:
+        """Record the files and directories under path and return its tree SHA."""
+        entries = []
+        # Git orders tree entries as if directory names ended with '/'
+        for child in sorted((self.root / path).iterdir(), key=lambda p: p.name + '/' if p.is_dir() else p.name):
+            child_path = f"{path}/{child.name}" if path else child.name
+            if child.is_dir():
+                if child.name.startswith('.'):
+                    continue
+                entries.append({'name': child.name, 'path': child_path, 'type': 'dir',
+                                'sha': self._snapshot(child_path), 'size': 0})
+            elif child.is_file():
+                data = child.read_bytes()
+                sha = git_blob_sha(data)
+                self.files[child_path] = {'data': data, 'sha': sha}
+                entries.append({'name': child.name, 'path': child_path, 'type': 'file', 'sha': sha,
+                                'size': len(data)})
+        
+        tree_sha = hashlib.sha1(
+            ''.join(f"{entry['type']} {entry['name']} {entry['sha']}\n" for entry in entries).encode('utf-8')
+        ).hexdigest()
+        self.dirs[path] = entries
+        self.trees[tree_sha] = path
+        return tree_sha
+    
+    def _build_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._simulate])
+        app.router.add_get('/repos/{owner}/{repo}/commits/{ref}', self.get_commit)
+        app.router.add_get('/repos/{owner}/{repo}/contents', self.get_contents)
+        app.router.add_get('/repos/{owner}/{repo}/contents/{path:.*}', self.get_contents)
+        app.router.add_get('/repos/{owner}/{repo}/git/trees/{sha:.*}', self.get_tree)
+        app.router.add_get('/repos/{owner}/{repo}/tarball', self.get_tarball)
+        app.router.add_get('/repos/{owner}/{repo}/tarball/{ref:.*}', self.get_tarball)
+        app.router.add_get('/raw/{owner}/{repo}/{ref}/{path:.*}', self.get_raw)
+        app.router.add_get('/_stats', self.get_stats)
+        return app
+    
+    async def start(self, host: str = 'localhost', port: int = 0) -> str:
+        """Start serving and return the base URL; raw files are served under {base}/raw."""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        return f"http://{host}:{port}"
+    
+    async def close(self):
+        """Stop serving."""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+    
+    @web.middleware
+    async def _simulate(self, request: web.Request, handler):
+        """Apply latency, rate limits and conditional requests around every handler."""
+        if request.path == '/_stats':
+            return await handler(request)
+        
+        self.stats['requests'] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        
+        is_api = request.path.startswith('/repos/')
+        if not is_api:
+            self.stats['raw_requests'] += 1
+            response = await handler(request)
+            self.stats['bytes_sent'] += response.content_length or 0
+            return response
+        
+        self.stats['api_requests'] += 1
+        if self.throttle_rate and self._random.random() < self.throttle_rate:
+            self.stats['throttled'] += 1
+            return web.json_response(
+                {'message': 'You have exceeded a secondary rate limit.'},
+                status=403, headers={'Retry-After': str(self.retry_after)}
+            )
+        
+        if self.rate_limit:
+            now = time.time()
+            if self._window_start is None or now >= self._window_start + self.rate_limit_window:
+                self._window_start, self._window_used = now, 0
+            rate_headers = {
+                'X-RateLimit-Limit': str(self.rate_limit),
+                'X-RateLimit-Reset': str(int(self._window_start + self.rate_limit_window + 0.999)),
+            }
+            if self._window_used >= self.rate_limit:
+                self.stats['rate_limited'] += 1
+                return web.json_response(
+                    {'message': 'API rate limit exceeded.'},
+                    status=403, headers={**rate_headers, 'X-RateLimit-Remaining': '0'}
+                )
+            self._window_used += 1
+        
+        response = await handler(request)
+        
+        if isinstance(response, web.Response) and response.status == 200 and response.body is not None:
+            etag = f'"{hashlib.sha1(response.body).hexdigest()}"'
+            if request.headers.get('If-None-Match') == etag:
+                self.stats['not_modified'] += 1
+                if self.rate_limit:
+                    self._window_used -= 1
+                response = web.Response(status=304)
+            response.headers['ETag'] = etag
+        if self.rate_limit:
+            response.headers.update(rate_headers)
+            response.headers['X-RateLimit-Remaining'] = str(max(0, self.rate_limit - self._window_used))
+        self.stats['bytes_sent'] += response.content_length or 0
+        return response
+    
+    # Endpoints
+    
+    async def get_commit(self, request: web.Request) -> web.Response:
+        if 'application/vnd.github.sha' in request.headers.get('Accept', ''):
+            return web.Response(text=self.commit_sha)
+        return web.json_response({'sha': self.commit_sha, 'commit': {'tree': {'sha': self.tree_sha}}})
+    
+    async def get_contents(self, request: web.Request) -> web.Response:
+        path = request.match_info.get('path', '').strip('/')
+        if path in self.files:
+            entry = self._contents_entry(request, self._file_entry(path))
+            entry['content'] = base64.b64encode(self.files[path]['data']).decode('ascii')
+            entry['encoding'] = 'base64'
+            return web.json_response(entry)
+        if path not in self.dirs:
+            return _not_found()
+        
+        listing = [self._contents_entry(request, entry) for entry in self.dirs[path]]
+        page_size = int(request.query.get('per_page', self.page_size))
+        if not page_size:
+            return web.json_response(listing)
+        
+        page = int(request.query.get('page', 1))
+        last_page = max(1, -(-len(listing) // page_size))
+        links = []
+        if page < last_page:
+            links.append(f'<{request.url.update_query(page=page + 1)}>; rel="next"')
+            links.append(f'<{request.url.update_query(page=last_page)}>; rel="last"')
+        if page > 1:
+            links.append(f'<{request.url.update_query(page=page - 1)}>; rel="prev"')
+            links.append(f'<{request.url.update_query(page=1)}>; rel="first"')
+        headers = {'Link': ', '.join(links)} if links else None
+        return web.json_response(listing[(page - 1) * page_size:page * page_size], headers=headers)
+    
+    def _file_entry(self, path: str) -> Dict:
+        data = self.files[path]
+        return {'name': path.rsplit('/', 1)[-1], 'path': path, 'type': 'file', 'sha': data['sha'],
+                'size': len(data['data'])}
+    
+    def _contents_entry(self, request: web.Request, entry: Dict) -> Dict:
+        """Add the API and download URLs of a contents entry."""
+        owner, repo = request.match_info['owner'], request.match_info['repo']
+        ref = request.query.get('ref', 'main')
+        base = f"{request.scheme}://{request.host}"
+        return {
+            **entry,
+            'url': f"{base}/repos/{owner}/{repo}/contents/{entry['path']}?ref={ref}",
+            'download_url': f"{base}/raw/{owner}/{repo}/{ref}/{entry['path']}" if entry['type'] == 'file' else None,
+        }
+    
+    async def get_tree(self, request: web.Request) -> web.Response:
+        sha, has_path, tree_path = request.match_info['sha'].partition(':')
+        path = self.trees.get(sha)
+        if has_path and path is not None:
+            # A "<commit>:<path>" tree-ish names a directory below the commit's tree
+            path = '/'.join(part for part in (path, tree_path.strip('/')) if part)
+            sha = next((entry['sha'] for entry in self.dirs.get(path.rpartition('/')[0], [])
+                        if entry['path'] == path and entry['type'] == 'dir'), None)
+            path = path if sha else None
+        if path is None:
+            return _not_found()
+        
+        recursive = request.query.get('recursive') not in (None, '', '0', 'false')
+        base = f"{request.scheme}://{request.host}"
+        return web.json_response({
+            'sha': sha,
+            'url': f"{base}{request.path}",
+            'tree': self._tree_entries(path, '', recursive),
+            'truncated': False,
+        })
+    
+    def _tree_entries(self, path: str, prefix: str, recursive: bool) -> List[Dict]:
+        entries = []
+        for entry in self.dirs[path]:
+            tree_path = prefix + entry['name']
+            if entry['type'] == 'dir':
+                entries.append({'path': tree_path, 'mode': '040000', 'type': 'tree', 'sha': entry['sha']})
+                if recursive:
+                    entries.extend(self._tree_entries(entry['path'], tree_path + '/', recursive))
+            else:
+                entries.append({'path': tree_path, 'mode': '100644', 'type': 'blob', 'sha': entry['sha'],
+                                'size': entry['size']})
+        return entries
+    
+    async def get_tarball(self, request: web.Request) -> web.Response:
+        if self._tarball is None:
+            self._tarball = self._build_tarball(f"{request.match_info['owner']}-{request.match_info['repo']}")
+        return web.Response(body=self._tarball, content_type='application/x-gzip')
+    
+    def _build_tarball(self, name: str) -> bytes:
+        """Archive the snapshot in path order under a "{owner}-{repo}-{sha}/" root, as GitHub does."""
+        root = f"{name}-{self.commit_sha[:7]}"
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+            for path in sorted(set(self.dirs) | set(self.files)):
+                info = tarfile.TarInfo(f"{root}/{path}" if path else root)
+                if path in self.files:
+                    data = self.files[path]['data']
+                    info.size = len(data)
+                    archive.addfile(info, io.BytesIO(data))
+                else:
+                    info.type = tarfile.DIRTYPE
+                    info.mode = 0o755
+                    archive.addfile(info)
+        return buffer.getvalue()
+    
+    async def get_raw(self, request: web.Request) -> web.Response:
+        data = self.files.get(request.match_info['path'])
+        if data is None:
+            return web.Response(status=404, text='404: Not Found')
+        return web.Response(body=data['data'], content_type='text/plain')
+    
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+
+def _not_found() -> web.Response:
+    return web.json_response({'message': 'Not Found'}, status=404)
+
+
+async def main():
+    """Run the fake GitHub service until interrupted."""
+    parser = argparse.ArgumentParser(description='Serve a local directory through a GitHub API stand-in')
+    
+    parser.add_argument(
+        'root',
+        help='Directory to serve as the repository contents'
+    )
+    
+    parser.add_argument(
+        '--host',
+        default='localhost',
+        help='Interface to listen on (default: localhost)'
+    )
+    
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=DEFAULT_PORT,
+        help=f'Port to listen on (default: {DEFAULT_PORT})'
+    )
+    
+    parser.add_argument(
+        '--latency',
+        type=float,
+        default=0.0,
+        help='Seconds added to every request (default: 0)'
+    )
+    
+    parser.add_argument(
+        '--page-size',
+        type=int,
+        default=0,
+        help='Entries per contents listing page, 0 for no pagination (default: 0)'
+    )
+    
+    parser.add_argument(
+        '--rate-limit',
+        type=int,
+        default=0,
+        help='API requests allowed per rate limit window, 0 for no limit (default: 0)'
+    )
+    
+    parser.add_argument(
+        '--rate-limit-window',
+        type=float,
+        default=DEFAULT_RATE_LIMIT_WINDOW,
+        help=f'Length of the rate limit window in seconds (default: {DEFAULT_RATE_LIMIT_WINDOW:g})'
+    )
+    
+    parser.add_argument(
+        '--throttle-rate',
+        type=float,
+        default=0.0,
+        help='Share of API requests rejected by a secondary rate limit (default: 0)'
+    )
+    
+    parser.add_argument(
+        '--retry-after',
+        type=int,
+        default=DEFAULT_RETRY_AFTER,
+        help=f'Retry-After seconds of secondary rate limits (default: {DEFAULT_RETRY_AFTER})'
+    )
+    
+    parser.add_argument(
+        '--seed',
+        type=int,
+        help='Random seed for reproducible secondary rate limits'
+    )
+    
+    args = parser.parse_args()
+    
+    async with FakeGitHubService(
+        args.root,
+        latency=args.latency,
+        page_size=args.page_size,
+        rate_limit=args.rate_limit,
+        rate_limit_window=args.rate_limit_window,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        seed=args.seed
+    ) as service:
+        base_url = await service.start(args.host, args.port)
+        print(f"Fake GitHub service for {args.root} listening on {base_url}")
+        print(f"Use --github-api-url {base_url} --github-raw-url {base_url}/raw; statistics at {base_url}/_stats")
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            pass
+        print(f"Statistics: {json.dumps(service.stats)}")
+    return 0
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(asyncio.run(main()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,751 @@
+#!/usr/bin/env python3
+"""
+Offline checks for the converter's helpers.
+
+Unlike test_converter.py, these need no agents service or network access:
+they cover the pure functions and on-disk stores the pipeline is built from.
+
+    python -m pytest test_converter_helpers.py
+"""
+
+import asyncio
+import os
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+from azure.core.exceptions import HttpResponseError
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.core.rest import HttpRequest
+
+import converter as converter_module
+from converter import (AdaptiveLimiter, ApiIndex, BlobCache, ConversionCache, ConversionThrottledError,
+                       GitRepositorySource, HttpCache, LocalDirectorySource, OutputManifest, ProjectClientHolder,
+                       PythonToJsConverter, RepositoryFetcher, SampleSource, ZipSampleWriter, _build_prompt,
+                       _check_run_failure, _split_batch_reply, apply_search_replace, build_conversion_preamble,
+                       compact_python_source, convert_text, convert_text_rules, git_blob_sha,
+                       project_client_options, rules_confidence, sample_output_name, split_python_source)
+from benchmark import generate_sample
+from fake_agents_service import FakeAgentsService
+from fake_github_service import FakeGitHubService
+
+
+def test_split_batch_reply():
+    """Sections are split on their markers; missing, reordered or empty sections reject the reply."""
+    reply = "=== FILE 1 ===\nconst a = 1;\n\n=== FILE 2 ===\nconst b = 2;\n"
+    assert _split_batch_reply(reply, 2) == ["const a = 1;", "const b = 2;"]
+    assert _split_batch_reply(reply, 3) is None
+    assert _split_batch_reply("=== FILE 2 ===\nb\n=== FILE 1 ===\na\n", 2) is None
+    assert _split_batch_reply("=== FILE 1 ===\n\n=== FILE 2 ===\nb\n", 2) is None
+    assert _split_batch_reply("const a = 1;", 1) is None
+
+
+def test_apply_search_replace():
+    """Blocks apply in order; a SEARCH text that is missing or ambiguous rejects the whole reply."""
+    draft = "import os\nprint(x)\nconsole.log(y);\n"
+    reply = (
+        "Here are the edits:\n"
+        "<<<<<<< SEARCH\nprint(x)\n=======\nconsole.log(x);\n>>>>>>> REPLACE\n"
+        "<<<<<<< SEARCH\nimport os\n=======\n>>>>>>> REPLACE\n"
+    )
+    assert apply_search_replace(draft, reply) == "\nconsole.log(x);\nconsole.log(y);\n"
+    assert apply_search_replace(draft, "NO CHANGES") == draft
+    assert apply_search_replace(draft, "Looks good to me") is None
+    assert apply_search_replace(draft, "<<<<<<< SEARCH\nmissing\n=======\nx\n>>>>>>> REPLACE") is None
+    assert apply_search_replace("a\na\n", "<<<<<<< SEARCH\na\n=======\nb\n>>>>>>> REPLACE") is None
+
+
+def test_compact_python_source():
+    """Shebang, encoding line, license header, blank line runs and shared indentation are removed."""
+    source = (
+        "#!/usr/bin/env python\n"
+        "# -*- coding: utf-8 -*-\n"
+        "# Copyright (c) Example Corp.\n"
+        "# Licensed under the MIT License.\n"
+        "    import os   \n"
+        "\n"
+        "\n"
+        "\n"
+        "    print(os.name)\n"
+    )
+    assert compact_python_source(source) == "import os\n\nprint(os.name)\n"
+    # Comments that are not a license header are kept
+    assert compact_python_source("# Sample\nx = 1\n") == "# Sample\nx = 1\n"
+
+
+def test_compact_python_source_keeps_multiline_strings():
+    """Blank lines, trailing spaces and indentation inside triple-quoted strings are part of the value."""
+    source = (
+        "    def show():\n"
+        "        text = \"\"\"First  \n"
+        "\n"
+        "\n"
+        "\n"
+        "  indented\n"
+        "\"\"\"\n"
+        "\n"
+        "\n"
+        "        return text   \n"
+    )
+    compacted = compact_python_source(source)
+    assert compacted == (
+        "def show():\n"
+        "    text = \"\"\"First  \n"
+        "\n"
+        "\n"
+        "\n"
+        "  indented\n"
+        "\"\"\"\n"
+        "\n"
+        "    return text\n"
+    )
+    namespace = {}
+    exec(compacted, namespace)
+    assert namespace['show']() == "First  \n\n\n\n  indented\n"
+
+
+def test_split_python_source():
+    """Oversized sources split at top-level definitions; later parts list the file's imports."""
+    functions = [f"def step_{n}():\n    return {n}\n" for n in range(6)]
+    source = "import os\n\n" + "\n".join(functions)
+    assert split_python_source(source, 10000) == [source]
+    
+    parts = split_python_source(source, 30)
+    assert len(parts) > 1
+    assert parts[0].startswith("import os")
+    for number, part in enumerate(parts[1:], 2):
+        assert part.startswith(f"# Part {number} of {len(parts)}")
+        assert "# import os" in part
+    # Every definition appears in exactly one part
+    for n in range(6):
+        assert sum(f"def step_{n}():" in part for part in parts) == 1
+    
+    assert split_python_source("def broken(:\n" * 50, 5) == ["def broken(:\n" * 50]
+
+
+def test_output_manifest_carry_forward(tmp_path):
+    """Only unchanged samples whose output still matches its recorded hash are carried forward."""
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    settings = {'js_library': '@azure/ai-agents'}
+    
+    manifest = OutputManifest(str(output_dir), settings)
+    (output_dir / "a.js").write_text("const a = 1;", encoding='utf-8')
+    (output_dir / "b.js").write_text("const b = 2;", encoding='utf-8')
+    (output_dir / "c.js").write_text("// Error converting c.py", encoding='utf-8')
+    manifest.record("a.py", "sha-a", "a.js", "const a = 1;")
+    manifest.record("b.py", "sha-b", "b.js", "const b = 2;")
+    manifest.record("c.py", "sha-c", "c.js", None)
+    manifest.save()
+    
+    manifest = OutputManifest(str(output_dir), settings)
+    manifest.load()
+    (output_dir / "b.js").write_text("edited", encoding='utf-8')
+    assert manifest.carry_forward("a.py", "sha-a") == "const a = 1;"
+    assert manifest.carry_forward("a.py", "sha-changed") is None
+    assert manifest.carry_forward("b.py", "sha-b") is None
+    assert manifest.carry_forward("c.py", "sha-c") is None
+    assert manifest.carry_forward("new.py", "sha-new") is None
+    
+    changed = OutputManifest(str(output_dir), {'js_library': 'other'})
+    changed.load()
+    assert changed.carry_forward("a.py", "sha-a") is None
+
+
+def test_blob_cache_evicts_least_recently_used(tmp_path):
+    """Reading a blob marks it as used, so the blob read least recently is evicted first."""
+    cache = BlobCache(str(tmp_path), max_bytes=250)
+    first = cache.put(b"1" * 100)
+    second = cache.put(b"2" * 100)
+    os.utime(cache._blob_path(first), (1, 1))
+    os.utime(cache._blob_path(second), (2, 2))
+    assert cache.get(first) == b"1" * 100
+    
+    third = cache.put(b"3" * 100)
+    assert cache.get(second) is None
+    assert cache.get(first) == b"1" * 100
+    assert cache.get(third) == b"3" * 100
+    assert cache.total_bytes == 200
+    assert first == git_blob_sha(b"1" * 100)
+
+
+def test_http_cache_evicts_least_recently_used(tmp_path):
+    """The response cache stays under its size cap, dropping the entries used least recently."""
+    cache = HttpCache(str(tmp_path), max_bytes=1000)
+    for n in range(10):
+        cache.store(f"https://api.github.com/{n}", None, {'ETag': f'"{n}"'}, b"x" * 200)
+        os.utime(cache._entry_path(f"https://api.github.com/{n}", None).with_suffix('.json'), (n, n))
+    
+    assert cache.total_bytes <= 1000
+    assert sum(path.stat().st_size for path in tmp_path.iterdir()) == cache.total_bytes
+    assert cache.load("https://api.github.com/0") is None
+    validators, body, _ = cache.load("https://api.github.com/9")
+    assert validators == {'If-None-Match': '"9"'} and body == b"x" * 200
+
+
+def test_shared_blob_download_survives_a_cancelled_waiter():
+    """Cancelling one request for a blob leaves the shared download running for the others."""
+    fetcher = RepositoryFetcher()
+    calls = []
+    
+    async def run():
+        release = asyncio.Event()
+        
+        async def get_bytes(url, use_http_cache=True):
+            calls.append(url)
+            await release.wait()
+            return b"print('shared')"
+        
+        fetcher._get_bytes = get_bytes
+        first = asyncio.ensure_future(fetcher._download_blob("https://raw.example.com/a.py", "abc"))
+        second = asyncio.ensure_future(fetcher._download_blob("https://raw.example.com/a.py", "abc"))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return await second, first.cancelled()
+    
+    assert asyncio.run(run()) == (b"print('shared')", True)
+    assert calls == ["https://raw.example.com/a.py"]
+    assert fetcher.blob_hit_count == 1
+
+
+def test_check_run_failure():
+    """Every run that did not complete raises, with throttling reported separately."""
+    def run(status, code=None, message=None):
+        return SimpleNamespace(status=status, last_error=SimpleNamespace(code=code, message=message) if code else None)
+    
+    _check_run_failure(run("completed"))
+    with pytest.raises(ConversionThrottledError) as error:
+        _check_run_failure(run("failed", 'rate_limit_exceeded', "Rate limit is exceeded. Try again in 20 seconds."))
+    assert error.value.retry_after == 20.0
+    with pytest.raises(RuntimeError):
+        _check_run_failure(run("failed", 'server_error', "Injected failure."))
+    with pytest.raises(RuntimeError):
+        _check_run_failure(run("expired"))
+
+
+def test_failed_conversions_are_not_cached(tmp_path):
+    """Failures and empty replies stay out of the result cache and manifest."""
+    converter = PythonToJsConverter()
+    converter._result_cache = ConversionCache(str(tmp_path / "conversions.sqlite3"))
+    converter._manifest = OutputManifest(str(tmp_path / "out"), {})
+    sample = {'name': 'a.py', 'path': 'a.py', 'content': "print('a')\n"}
+    
+    try:
+        converter._finish_sample(sample, "sha", "// Error", cache_key="failed", failed=True)
+        converter._finish_sample(sample, "sha", "  \n", cache_key="empty")
+        assert converter._result_cache.get("failed") is None
+        assert converter._result_cache.get("empty") is None
+        assert converter._manifest.entries['a.py']['output_sha256'] is None
+    finally:
+        converter._result_cache.close()
+
+
+def test_patched_conversions_are_not_cached(tmp_path):
+    """Hybrid patch results are not stored in the result cache."""
+    converter = PythonToJsConverter(engine='hybrid', min_confidence=2.0)
+    converter._result_cache = ConversionCache(str(tmp_path / "conversions.sqlite3"))
+    sample = {'name': 'a.py', 'path': 'a.py', 'content': "print('a')\n"}
+    
+    async def patch_backend(python_code, js_library, api_docs_url, api_methods):
+        return "// patched rules draft"
+    
+    try:
+        converter._backends['patch'] = patch_backend
+        converted = asyncio.run(converter._convert_individually(sample, "sha", "patched", "lib", None, []))
+        assert converted['js_code'] == "// patched rules draft"
+        assert converter._result_cache.get("patched") is None
+    finally:
+        converter._result_cache.close()
+
+
+def test_zip_writer_keeps_previous_output_on_error(tmp_path):
+    """A failed run leaves the previous ZIP untouched and removes its temporary archive; an empty run empties it."""
+    output_path = str(tmp_path / "js-samples.zip")
+    with ZipSampleWriter(output_path) as writer:
+        writer.write({'js_name': 'a.js', 'js_code': "const a = 1;"})
+        writer.write({'js_name': 'b.js', 'js_code': "const b = 2;"})
+    
+    with pytest.raises(KeyboardInterrupt):
+        with ZipSampleWriter(output_path) as writer:
+            writer.write({'js_name': 'a.js', 'js_code': "const a = 3;"})
+            raise KeyboardInterrupt
+    
+    with zipfile.ZipFile(output_path) as zipf:
+        assert sorted(zipf.namelist()) == ['a.js', 'b.js']
+        assert zipf.read('a.js') == b"const a = 1;"
+    assert not os.path.exists(output_path + '.tmp')
+    
+    with ZipSampleWriter(output_path):
+        pass
+    with zipfile.ZipFile(output_path) as zipf:
+        assert zipf.namelist() == []
+    assert not os.path.exists(output_path + '.tmp')
+
+
+def test_git_source_ignores_urls_and_working_directory(tmp_path, monkeypatch):
+    """Only paths naming a git directory are read as one, not URLs run from inside it."""
+    (tmp_path / "HEAD").write_text("ref: refs/heads/main\n")
+    (tmp_path / "objects").mkdir()
+    (tmp_path / "refs").mkdir()
+    monkeypatch.chdir(tmp_path)
+    
+    assert GitRepositorySource.split_path("https://github.com/owner/repo/tree/main/samples") is None
+    assert GitRepositorySource.split_path("samples") is None
+    assert GitRepositorySource.split_path(".") == (".", "HEAD", "")
+    assert GitRepositorySource.split_path(str(tmp_path / "tree" / "main" / "samples")) == (
+        str(tmp_path), "main", "samples"
+    )
+
+
+def test_parse_github_url_on_enterprise_server():
+    """Repository URLs on the configured server are accepted; raw files default to its /raw."""
+    fetcher = RepositoryFetcher(api_url='https://ghe.example.com/api/v3')
+    assert fetcher.raw_url == 'https://ghe.example.com/raw'
+    assert fetcher._parse_github_url('https://ghe.example.com/owner/repo/tree/main/samples') == (
+        'owner', 'repo', 'main', 'samples'
+    )
+    assert fetcher._convert_to_api_url('https://ghe.example.com/owner/repo/tree/main/samples') == (
+        'https://ghe.example.com/api/v3/repos/owner/repo/contents/samples?ref=main'
+    )
+    with pytest.raises(ValueError):
+        RepositoryFetcher()._parse_github_url('https://ghe.example.com/owner/repo')
+
+
+def test_project_client_options_only_for_loopback():
+    """Azure authentication is only replaced for plain http endpoints on this machine."""
+    assert project_client_options('http://localhost:8765')
+    assert project_client_options('http://127.0.0.1:8765')
+    assert project_client_options('http://[::1]:8765')
+    assert project_client_options('http://agents.example.com') == {}
+    assert project_client_options('https://example.services.ai.azure.com/api/projects/demo') == {}
+
+
+def test_local_directory_source(tmp_path):
+    """Python files are read in path order, skipping hidden directories and caches; the base class is abstract."""
+    (tmp_path / "b.py").write_text("print('b')\n", encoding='utf-8')
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "a.py").write_text("print('a')\n", encoding='utf-8')
+    (tmp_path / "sub" / "notes.txt").write_text("not a sample", encoding='utf-8')
+    (tmp_path / "__pycache__").mkdir()
+    (tmp_path / "__pycache__" / "c.py").write_text("", encoding='utf-8')
+    (tmp_path / ".hidden").mkdir()
+    (tmp_path / ".hidden" / "d.py").write_text("", encoding='utf-8')
+    
+    samples = asyncio.run(LocalDirectorySource().fetch_python_samples(str(tmp_path)))
+    assert [(sample['name'], sample['path']) for sample in samples] == [('b.py', 'b.py'), ('a.py', 'sub/a.py')]
+    assert samples[1]['content'] == "print('a')\n"
+    
+    with pytest.raises(TypeError):
+        SampleSource()
+
+
+def test_local_directory_source_skips_directory_symlinks(tmp_path):
+    """A directory symlink pointing back up the tree is not followed."""
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "a.py").write_text("print('a')\n", encoding='utf-8')
+    try:
+        (tmp_path / "sub" / "loop").symlink_to(tmp_path, target_is_directory=True)
+    except OSError:
+        pytest.skip("symlinks are not available")
+    
+    samples = asyncio.run(LocalDirectorySource().fetch_python_samples(str(tmp_path)))
+    assert [sample['path'] for sample in samples] == ['sub/a.py']
+
+
+def test_converter_closes_only_its_own_client_holder(monkeypatch):
+    """A converter closes the client holder it opened, but never one it was given."""
+    monkeypatch.setenv("PROJECT_ENDPOINT", "http://localhost:9")
+    
+    async def run():
+        async with PythonToJsConverter() as converter:
+            await converter.client_holder.get_agents_client()
+            session = converter.client_holder._session
+        assert session.closed
+        
+        async with ProjectClientHolder() as holder:
+            await holder.get_agents_client()
+            await PythonToJsConverter(client_holder=holder).close()
+            assert not holder._session.closed
+    
+    asyncio.run(run())
+
+
+def test_convert_text_runs_the_async_conversion(monkeypatch):
+    """The synchronous entry point returns what the async conversion returns and raises what it raises."""
+    monkeypatch.setenv("PROJECT_ENDPOINT", "http://localhost:9")
+    
+    async def convert(text, lib_name, ref_url, agents_client=None):
+        assert agents_client is not None
+        if text == "fail":
+            raise RuntimeError("Run failed")
+        return f"// {lib_name}: {text}"
+    
+    monkeypatch.setattr(converter_module, 'convert_text_async', convert)
+    assert convert_text("x = 1", "lib", "") == "// lib: x = 1"
+    with pytest.raises(RuntimeError):
+        convert_text("fail", "lib", "")
+
+
+def test_same_named_samples_keep_separate_outputs(tmp_path):
+    """Samples are written under their folder, and an unchanged rerun carries every one of them forward."""
+    samples_dir = tmp_path / "samples"
+    for folder in ("basic", "async"):
+        (samples_dir / folder).mkdir(parents=True)
+        (samples_dir / folder / "sample.py").write_text(f"print('{folder}')\n", encoding='utf-8')
+    output_dir = tmp_path / "out"
+    
+    def run(**options):
+        converter = PythonToJsConverter(engine='rules', **options)
+        asyncio.run(converter.convert_samples_to_path(str(samples_dir), "lib", None, str(output_dir)))
+        return converter
+    
+    run()
+    assert sorted(path.relative_to(output_dir).as_posix() for path in output_dir.rglob("*.js")) == [
+        "async/sample.js", "basic/sample.js"
+    ]
+    assert "async" in (output_dir / "async" / "sample.js").read_text(encoding='utf-8')
+    assert run().unchanged_count == 2
+    # Settings that change the requests or the splitting invalidate the previous outputs
+    assert run(max_sample_tokens=100).unchanged_count == 0
+    
+    # Outputs of removed samples go away even when the settings changed too
+    (samples_dir / "async" / "sample.py").unlink()
+    run(max_sample_tokens=200)
+    assert [path.relative_to(output_dir).as_posix() for path in output_dir.rglob("*.js")] == ["basic/sample.js"]
+
+
+def test_sample_output_name():
+    """Output names keep the sample's path below the requested folder."""
+    assert sample_output_name("samples/basic/sample.py", "samples") == "basic/sample.js"
+    assert sample_output_name("samples/sample.py", "samples/") == "sample.js"
+    assert sample_output_name("other/sample.py", "samples") == "other/sample.js"
+    assert sample_output_name("sample.py") == "sample.js"
+
+
+def test_rules_confidence():
+    """Only code made of constructs the rules translate scores 1.0, the default hybrid threshold."""
+    assert rules_confidence("x = 1\nif x:\n    print(x)\n") == 1.0
+    assert rules_confidence("import os\nprint(os.name)\n") == 0.5
+    assert rules_confidence("class A:\n    def f(self):\n        return 1\n") < 1.0
+    assert rules_confidence("data = b'raw'\n") == 0.0
+    assert rules_confidence("def broken(:\n") == 0.0
+
+
+def test_rules_engine_closes_function_blocks():
+    """Function bodies, nested blocks and else branches get their closing braces; blank lines do not end them."""
+    python_code = (
+        "def f(a, b):\n    if a:\n        if b:\n            print(1)\n    else:\n        print(2)\n\n"
+        "    return a\n\n# Run it\nf(1, 2)\n"
+    )
+    js_code = convert_text_rules(python_code, "lib", "")
+    body = js_code.split('\n\n', 1)[1]
+    assert body == (
+        "function f(a, b) {\n    if (a) {\n        if (b) {\n            console.log(1)\n        }\n"
+        "    } else {\n        console.log(2)\n\n    }\n    return a\n\n}\n// Run it\nf(1, 2)"
+    )
+
+
+def test_failed_conversions_are_counted(tmp_path):
+    """Samples whose conversion raises are written as error comments and counted in failed_count."""
+    samples_dir = tmp_path / "samples"
+    samples_dir.mkdir()
+    (samples_dir / "good.py").write_text("print('good')\n", encoding='utf-8')
+    (samples_dir / "bad.py").write_text("print('bad')\n", encoding='utf-8')
+    
+    async def agent_backend(python_code, js_library, api_docs_url, api_methods):
+        if 'bad' in python_code:
+            raise RuntimeError("Run failed")
+        return "console.log('good');"
+    
+    converter = PythonToJsConverter(incremental=False)
+    converter._backends['agent'] = agent_backend
+    written = asyncio.run(converter.convert_samples_to_path(str(samples_dir), "lib", None, str(tmp_path / "out")))
+    assert written == 2
+    assert converter.failed_count == 1
+    assert (tmp_path / "out" / "bad.js").read_text(encoding='utf-8').startswith("// Error converting bad.py")
+
+
+def test_fetch_modes_return_the_same_samples(tmp_path):
+    """Tree, contents and archive fetches of a folder yield the same samples in the same order."""
+    samples_dir = tmp_path / "repo" / "samples"
+    (samples_dir / "a").mkdir(parents=True)
+    (samples_dir / "a" / "b.py").write_text("print('a/b')\n", encoding='utf-8')
+    (samples_dir / "a.py").write_text("print('a')\n", encoding='utf-8')
+    (samples_dir / "z.py").write_text("print('z')\n", encoding='utf-8')
+    (samples_dir / "notes.txt").write_text("not a sample", encoding='utf-8')
+    (tmp_path / "repo" / "other.py").write_text("print('outside')\n", encoding='utf-8')
+    
+    async def fetch_all():
+        results = {}
+        async with FakeGitHubService(str(tmp_path / "repo")) as github:
+            api_url = await github.start()
+            for mode in ('tree', 'contents', 'archive'):
+                async with RepositoryFetcher(mode, api_url=api_url, raw_url=f"{api_url}/raw") as fetcher:
+                    samples = await fetcher.fetch_python_samples("https://github.com/owner/repo/tree/main/samples")
+                results[mode] = [(sample['path'], sample['content']) for sample in samples]
+        return results
+    
+    results = asyncio.run(fetch_all())
+    assert results['tree'] == [
+        ('samples/a.py', "print('a')\n"), ('samples/a/b.py', "print('a/b')\n"), ('samples/z.py', "print('z')\n")
+    ]
+    assert results['contents'] == results['tree']
+    assert results['archive'] == results['tree']
+
+
+class ListSource(SampleSource):
+    """In-memory samples s0.py, s1.py, ...; raises after fail_after of them when given."""
+    
+    def __init__(self, count, fail_after=None):
+        self.count = count
+        self.fail_after = fail_after
+        self.yielded = 0
+    
+    async def iter_python_samples(self, repo_url):
+        for n in range(self.count):
+            if n == self.fail_after:
+                raise ValueError("Listing failed")
+            self.yielded += 1
+            yield {'name': f"s{n}.py", 'path': f"s{n}.py", 'content': f"print({n})\n"}
+
+
+def run_pipeline(monkeypatch, converter, source, timeout=10):
+    """Run converter._run_pipeline over source and return what reached the sink."""
+    monkeypatch.setattr(converter_module, 'open_sample_source', lambda repo_url, **options: source)
+    written = []
+    asyncio.run(asyncio.wait_for(converter._run_pipeline("samples", "lib", None, written.append), timeout))
+    return written
+
+
+def test_pipeline_keeps_input_order_with_several_workers(monkeypatch):
+    """Samples converted out of order by several workers reach the sink in input order, each with its own code."""
+    async def agent_backend(python_code, js_library, api_docs_url, api_methods):
+        n = int(python_code[len("print("):-len(")\n")])
+        await asyncio.sleep((10 - n) * 0.005)
+        return f"console.log({n});"
+    
+    converter = PythonToJsConverter(convert_workers=4, batch_tokens=0, incremental=False)
+    converter._backends['agent'] = agent_backend
+    written = run_pipeline(monkeypatch, converter, ListSource(10))
+    assert [(c['original_path'], c['js_code']) for c in written] == [
+        (f"s{n}.py", f"console.log({n});") for n in range(10)
+    ]
+
+
+def test_pipeline_bounds_samples_behind_a_slow_one(monkeypatch):
+    """While the first sample is still converting, fetching stops once the pipeline's buffers are full."""
+    source = ListSource(30)
+    converter = PythonToJsConverter(convert_workers=2, queue_size=2, batch_tokens=0, incremental=False)
+    
+    async def run():
+        release = asyncio.Event()
+        
+        async def agent_backend(python_code, js_library, api_docs_url, api_methods):
+            if python_code == "print(0)\n":
+                await release.wait()
+            return "// converted"
+        
+        converter._backends['agent'] = agent_backend
+        written = []
+        pipeline = asyncio.ensure_future(converter._run_pipeline("samples", "lib", None, written.append))
+        await asyncio.sleep(0.2)
+        # queue_size * 2 + convert_workers samples in flight, plus one read from the source waiting for room
+        fetched_while_blocked = source.yielded
+        release.set()
+        await asyncio.wait_for(pipeline, 10)
+        return fetched_while_blocked, written
+    
+    monkeypatch.setattr(converter_module, 'open_sample_source', lambda repo_url, **options: source)
+    fetched_while_blocked, written = asyncio.run(run())
+    assert fetched_while_blocked == 2 * 2 + 2 + 1
+    assert [c['original_path'] for c in written] == [f"s{n}.py" for n in range(30)]
+
+
+def test_pipeline_fetch_error_cancels_conversions(monkeypatch):
+    """A source that fails part way through stops the run with its error, cancelling conversions in progress."""
+    cancelled = []
+    
+    async def agent_backend(python_code, js_library, api_docs_url, api_methods):
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.append(python_code)
+            raise
+    
+    converter = PythonToJsConverter(convert_workers=2, batch_tokens=0, incremental=False)
+    converter._backends['agent'] = agent_backend
+    with pytest.raises(ValueError, match="Listing failed"):
+        run_pipeline(monkeypatch, converter, ListSource(10, fail_after=3))
+    assert sorted(cancelled) == ["print(0)\n", "print(1)\n"]
+
+
+def test_adaptive_limiter_grows_and_shrinks_within_bounds():
+    """Throttling halves the limit down to 1; a limit's worth of successes adds one, up to max_limit."""
+    async def run():
+        limiter = AdaptiveLimiter(4, adaptive=True)
+        limits = []
+        for throttled in (True, True, True, False, False, False, False, False, False, False, False, False):
+            await limiter.acquire()
+            await limiter.release(throttled)
+            limits.append(limiter.limit)
+        
+        fixed = AdaptiveLimiter(2)
+        await fixed.acquire()
+        await fixed.acquire()
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(fixed.acquire(), 0.05)
+        await fixed.release(throttled=True)
+        return limits, fixed.limit, fixed.active
+    
+    limits, fixed_limit, fixed_active = asyncio.run(run())
+    assert limits == [2, 1, 1, 2, 2, 3, 3, 3, 4, 4, 4, 4]
+    assert (fixed_limit, fixed_active) == (2, 1)
+
+
+async def throttled_response_error(status, retry_after):
+    """Return the HttpResponseError for a run request the fake agents service refuses with status."""
+    service = FakeAgentsService(http_throttle_rate=1.0, http_throttle_status=status, retry_after=retry_after)
+    async with service:
+        endpoint = await service.start()
+        async with AioHttpTransport() as transport:
+            agent = await transport.send(HttpRequest('POST', f"{endpoint}/assistants", json={'model': 'fake'}))
+            thread = await transport.send(HttpRequest('POST', f"{endpoint}/threads", json={}))
+            await agent.load_body()
+            await thread.load_body()
+            response = await transport.send(HttpRequest(
+                'POST', f"{endpoint}/threads/{thread.json()['id']}/runs", json={'assistant_id': agent.json()['id']}
+            ))
+            await response.load_body()
+    return HttpResponseError(response=response)
+
+
+def test_call_with_retries_backs_off_while_throttled(monkeypatch):
+    """Throttled conversions are retried after Retry-After or a backoff; other errors are raised at once."""
+    delays = []
+    
+    async def record_sleep(delay, result=None):
+        delays.append(delay)
+        return result
+    
+    async def run():
+        errors = [
+            ConversionThrottledError("Rate limit is exceeded.", retry_after=20.0),
+            await throttled_response_error(429, 3),
+            await throttled_response_error(503, 0),
+        ]
+        
+        async def convert():
+            if errors:
+                raise errors.pop(0)
+            return "// converted"
+        
+        async def fail():
+            raise RuntimeError("Run failed")
+        
+        converter = PythonToJsConverter()
+        converter._limiter = AdaptiveLimiter(4, adaptive=True)
+        monkeypatch.setattr(converter_module.asyncio, 'sleep', record_sleep)
+        result = await converter._call_with_retries(convert)
+        with pytest.raises(RuntimeError):
+            await converter._call_with_retries(fail)
+        
+        # Without adaptive mode throttling is not retried
+        converter._limiter = AdaptiveLimiter(4)
+        errors.append(ConversionThrottledError("Rate limit is exceeded.", retry_after=20.0))
+        with pytest.raises(ConversionThrottledError):
+            await converter._call_with_retries(convert)
+        return result
+    
+    assert asyncio.run(run()) == "// converted"
+    # The 503 without a usable Retry-After waits 2 ** attempt seconds plus jitter
+    assert delays[:2] == [20.0, 3.0] and 4 <= delays[2] < 5 and len(delays) == 3
+
+
+def test_adaptive_conversion_retries_throttled_runs(monkeypatch):
+    """Runs that fail with rate_limit_exceeded are retried until every sample converts."""
+    real_sleep = asyncio.sleep
+    
+    async def skip_backoff(delay, result=None):
+        # The service's Retry-After is whole seconds; the test does not wait for them
+        return await real_sleep(0 if delay >= 1 else delay, result)
+    
+    async def run():
+        async with FakeAgentsService(throttle_rate=0.5, retry_after=1, seed=3) as service:
+            monkeypatch.setenv("PROJECT_ENDPOINT", await service.start())
+            monkeypatch.setenv("MODEL_DEPLOYMENT_NAME", "fake")
+            monkeypatch.setattr(converter_module.asyncio, 'sleep', skip_backoff)
+            converter = PythonToJsConverter(convert_workers=2, adaptive_jobs=True, batch_tokens=0, incremental=False)
+            written = []
+            monkeypatch.setattr(converter_module, 'open_sample_source', lambda repo_url, **options: ListSource(6))
+            await converter._run_pipeline("samples", "lib", None, written.append)
+            return converter, written, dict(service.stats)
+    
+    converter, written, stats = asyncio.run(run())
+    assert stats['throttled'] > 0
+    assert converter.failed_count == 0
+    assert [c['js_code'].splitlines()[-1] for c in written] == [f"// print({n})" for n in range(6)]
+
+
+def test_batched_samples_reach_their_own_outputs(tmp_path, monkeypatch):
+    """Batched replies are split back per sample; a reply missing a section falls back to one run per sample."""
+    samples_dir = tmp_path / "samples"
+    samples_dir.mkdir()
+    for n in range(8):
+        (samples_dir / f"sample_{n}.py").write_text(generate_sample(n, 20), encoding='utf-8')
+    
+    async def run(short_batch_rate):
+        async with FakeAgentsService(tokens_per_second=1e6, short_batch_rate=short_batch_rate, seed=1) as service:
+            monkeypatch.setenv("PROJECT_ENDPOINT", await service.start())
+            monkeypatch.setenv("MODEL_DEPLOYMENT_NAME", "fake")
+            converter = PythonToJsConverter(batch_tokens=1200, incremental=False)
+            written = []
+            await converter._run_pipeline(str(samples_dir), "lib", None, written.append)
+            return converter, written, dict(service.stats)
+    
+    for short_batch_rate in (0.0, 1.0):
+        converter, written, stats = asyncio.run(run(short_batch_rate))
+        assert [c['original_path'] for c in written] == [f"sample_{n}.py" for n in range(8)]
+        for n, converted in enumerate(written):
+            assert f"Synthetic sample {n} generated" in converted['js_code']
+            assert converted['js_code'].count("Synthetic sample") == 1
+        assert converter.failed_count == 0
+        if short_batch_rate:
+            assert stats['short_batches'] > 0 and converter.batched_count == 0
+        else:
+            assert converter.batched_count > 0 and stats['runs'] < 8
+
+
+def test_build_conversion_preamble():
+    """The preamble is the same however the mappings were built, and every request of a run starts with it."""
+    mappings = {'requests.post': 'client.post', 'requests.get': 'client.get'}
+    preamble = build_conversion_preamble("lib", "https://docs.example.com", mappings)
+    assert preamble == (
+        "Convert python code to JavaScript using the lib library and the reference documentation at "
+        "https://docs.example.com.\n"
+        "\n"
+        "Python to JavaScript mappings:\n"
+        "- requests.get -> client.get\n"
+        "- requests.post -> client.post\n"
+        "\n"
+    )
+    assert build_conversion_preamble("lib", "https://docs.example.com", dict(reversed(mappings.items()))) == preamble
+    assert build_conversion_preamble("lib", "") == "Convert python code to JavaScript using the lib library.\n\n"
+    
+    methods = [{'name': 'createAgent', 'signature': 'createAgent(options)'}]
+    for source in ("x = 1\n", "agent = create_agent()\n"):
+        assert _build_prompt(source, "lib", "https://docs.example.com", preamble, methods).startswith(preamble)
+
+
+def test_api_index_select():
+    """Methods named in the sample come first, then those sharing its rarer words, at most top_k of them."""
+    names = ["listVectorStores", "createThread", "deleteAgent", "createAgent", "getRun", "createVectorStore"]
+    index = ApiIndex([{'name': name, 'signature': f"{name}()"} for name in names])
+    source = "agent = client.create_agent(model=model)\nclient.delete_agent(agent.id)\nthread = create()\n"
+    
+    selected = [method['name'] for method in index.select(source, top_k=10)]
+    assert selected == ["deleteAgent", "createAgent", "createThread", "createVectorStore"]
+    assert [method['name'] for method in index.select(source, top_k=3)] == selected[:3]
+    assert index.select(source, top_k=10) == index.select(source, top_k=10)
+    assert index.select("print('hello')\n") == []